@@ -0,0 +1,320 @@
+"""
+Inference Benchmark - Workly Public Edition
+
+Measures how fast GGUF models load and generate with different settings.
+Every combination of model, n_threads, n_ctx and max_tokens is run a few
+times; each model/n_threads/n_ctx combination is loaded in a fresh
+process so load time and peak memory aren't skewed by earlier runs (the
+OS file cache still is: the first load of a model is usually slowest).
+
+Reported per combination:
+    load_seconds        - Llama(...) construction
+    prompt_tps          - prompt tokens evaluated per second
+    gen_tps             - generated tokens per second (after the first)
+    ttft_seconds        - time to first token (p50)
+    p50/p95_seconds     - total latency of one request
+    peak_rss_mb         - peak resident memory of the benchmark process
+
+Requirements:
+    - llama-cpp-python (not needed with --mock)
+
+Usage:
+    python benchmark_inference.py [--models A.gguf B.gguf] [--threads 2 4 8]
+        [--ctx 512 2048] [--max-tokens 64 256] [--runs 3] [--prompt-tokens 256]
+        [--json results.json] [--csv results.csv] [--mock]
+
+Without --models, the models from config.json are used. --mock swaps
+llama.cpp for a fake model with made-up speeds, to try the harness
+without a model file.
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+from main import load_config
+from model_manager import ModelManager, detect_threads
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS isn't reported
+    resource = None
+
+
+PROMPT_TEXT = (
+    "Workly is a friendly assistant that helps people plan their day, "
+    "answer questions and keep track of their notes. "
+)
+
+
+class MockLlama:
+    """
+    Stands in for llama_cpp.Llama with predictable speeds
+
+    Prompt evaluation and generation take a fixed time per token, divided
+    over the threads, and the "KV cache" takes real memory so peak RSS
+    grows with n_ctx.
+    """
+
+    PROMPT_SECONDS_PER_TOKEN = 0.0004
+    GEN_SECONDS_PER_TOKEN = 0.004
+
+    def __init__(self, model_path, n_ctx=2048, n_threads=4, verbose=False):
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        time.sleep(0.05)
+        self._kv_cache = bytearray(n_ctx * 16 * 1024)
+
+    def tokenize(self, text, add_bos=True):
+        return [1] * add_bos + [hash(word) for word in text.split()]
+
+    def reset(self):
+        pass
+
+    def __call__(self, prompt, max_tokens=16, stream=False, **kwargs):
+        speedup = min(self.n_threads, 8)
+        time.sleep(
+            len(self.tokenize(prompt.encode("utf-8")))
+            * self.PROMPT_SECONDS_PER_TOKEN
+            / speedup
+        )
+        for i in range(max_tokens):
+            time.sleep(self.GEN_SECONDS_PER_TOKEN / speedup)
+            yield {"choices": [{"text": f" token{i}"}]}
+
+
+def make_prompt(llm, prompt_tokens):
+    """Repeat the sample text until it is about prompt_tokens long"""
+    per_copy = len(llm.tokenize(PROMPT_TEXT.encode("utf-8"), add_bos=False))
+    copies = max(1, prompt_tokens // max(per_copy, 1))
+    return PROMPT_TEXT * copies + "\nUser: Tell me a story.\nAssistant:"
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list"""
+    values = sorted(values)
+    position = (len(values) - 1) * pct / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def time_request(llm, prompt, max_tokens):
+    """Stream one completion; return prompt/ttft/total timings and token count"""
+    # Start from an empty KV cache so every run evaluates the whole prompt
+    llm.reset()
+
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    for _ in llm(prompt, max_tokens=max_tokens, temperature=0.0, stream=True):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        tokens += 1
+    end = time.perf_counter()
+
+    return {
+        "ttft": (first_token_at or end) - start,
+        "total": end - start,
+        "gen_seconds": end - (first_token_at or end),
+        "tokens": tokens,
+    }
+
+
+def run_model(model_path, n_threads, n_ctx, max_tokens_list, runs, prompt_tokens, mock):
+    """
+    Load one model with one n_threads/n_ctx and time every max_tokens
+
+    Runs in a child process; returns one result dict per max_tokens.
+    """
+    if mock:
+        loader = MockLlama
+    else:
+        from llama_cpp import Llama
+
+        loader = Llama
+
+    start = time.perf_counter()
+    llm = loader(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+    load_seconds = time.perf_counter() - start
+
+    prompt = make_prompt(llm, min(prompt_tokens, n_ctx // 2))
+    prompt_len = len(llm.tokenize(prompt.encode("utf-8")))
+
+    results = []
+    for max_tokens in max_tokens_list:
+        # Don't run past the context window
+        max_tokens = min(max_tokens, n_ctx - prompt_len)
+        # Warm-up run: first-call allocations aren't part of steady state
+        time_request(llm, prompt, 1)
+        samples = [time_request(llm, prompt, max_tokens) for _ in range(runs)]
+
+        ttfts = [s["ttft"] for s in samples]
+        totals = [s["total"] for s in samples]
+        gen_tokens = sum(max(s["tokens"] - 1, 0) for s in samples)
+        gen_seconds = sum(s["gen_seconds"] for s in samples)
+
+        results.append(
+            {
+                "model": os.path.basename(model_path),
+                "n_threads": n_threads,
+                "n_ctx": n_ctx,
+                "max_tokens": max_tokens,
+                "runs": runs,
+                "prompt_tokens": prompt_len,
+                "generated_tokens": round(sum(s["tokens"] for s in samples) / runs, 1),
+                "load_seconds": round(load_seconds, 3),
+                "prompt_tps": round(prompt_len / percentile(ttfts, 50), 1),
+                "gen_tps": round(gen_tokens / gen_seconds, 1) if gen_seconds else 0.0,
+                "ttft_seconds": round(percentile(ttfts, 50), 3),
+                "p50_seconds": round(percentile(totals, 50), 3),
+                "p95_seconds": round(percentile(totals, 95), 3),
+                "peak_rss_mb": (
+                    round(peak_rss_mb(), 1) if resource is not None else None
+                ),
+            }
+        )
+    return results
+
+
+def run_isolated(*args):
+    """run_model() in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_model, *args).result()
+
+
+def print_header(title):
+    """Print section header"""
+    print(f"\n{'=' * 60}")
+    print(f"  {title}")
+    print("=" * 60)
+
+
+COLUMNS = [
+    ("n_threads", "thr", 4),
+    ("n_ctx", "ctx", 6),
+    ("max_tokens", "max", 5),
+    ("load_seconds", "load s", 7),
+    ("prompt_tps", "prompt t/s", 11),
+    ("gen_tps", "gen t/s", 8),
+    ("ttft_seconds", "ttft s", 7),
+    ("p50_seconds", "p50 s", 7),
+    ("p95_seconds", "p95 s", 7),
+    ("peak_rss_mb", "rss MB", 8),
+]
+
+
+def print_row(result):
+    print("  " + "".join(f"{result[key]!s:>{width}}" for key, _, width in COLUMNS))
+
+
+def write_results(results, args):
+    """Save results (with machine details) as JSON and/or CSV"""
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "machine": {
+                        "platform": platform.platform(),
+                        "python": platform.python_version(),
+                        "cpu_count": os.cpu_count(),
+                        "physical_threads": detect_threads(),
+                        "mock": args.mock,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"💾 Wrote {args.json}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"💾 Wrote {args.csv}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GGUF inference benchmark")
+    parser.add_argument("--models", nargs="+", help="GGUF files (default: config)")
+    parser.add_argument("--threads", nargs="+", type=int, default=[detect_threads()])
+    parser.add_argument("--ctx", nargs="+", type=int, default=[2048])
+    parser.add_argument("--max-tokens", nargs="+", type=int, default=[128])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--prompt-tokens", type=int, default=256)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--csv", help="Write results to this CSV file")
+    parser.add_argument(
+        "--mock", action="store_true", help="Use a fake model instead of llama.cpp"
+    )
+    args = parser.parse_args()
+
+    if args.mock:
+        models = args.models or ["mock.gguf"]
+    else:
+        models = args.models or [
+            spec["model_path"]
+            for spec in ModelManager.from_config(load_config()).registry.values()
+        ]
+        missing = [path for path in models if not os.path.exists(path)]
+        if missing:
+            print(f"❌ Model not found: {', '.join(missing)}")
+            return 1
+
+    results = []
+    for model_path in models:
+        print_header(f"📦 {os.path.basename(model_path)}")
+        print("  " + "".join(f"{label:>{width}}" for _, label, width in COLUMNS))
+
+        for n_threads in args.threads:
+            for n_ctx in args.ctx:
+                try:
+                    rows = run_isolated(
+                        model_path,
+                        n_threads,
+                        n_ctx,
+                        args.max_tokens,
+                        args.runs,
+                        args.prompt_tokens,
+                        args.mock,
+                    )
+                except Exception as e:
+                    print(f"  ❌ n_threads={n_threads} n_ctx={n_ctx}: {e}")
+                    continue
+                for row in rows:
+                    print_row(row)
+                results.extend(rows)
+
+    if not results:
+        print("\n❌ No successful runs")
+        return 1
+
+    print()
+    write_results(results, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Conversation Context - Workly Public Edition
+
+Multi-turn prompt building within the model's context window.
+The prompt is a fixed persona followed by the conversation so far, and it
+only ever grows at the end. llama.cpp keeps the tokens of the previous
+prompt in its KV cache and re-evaluates only what comes after the longest
+shared prefix, so each turn costs just the new question instead of the
+whole history.
+
+When the history no longer fits, the oldest turns are dropped (or folded
+into a short summary) in one go, down to a fraction of the budget. The
+prefix then stays stable again for many turns, instead of shifting (and
+invalidating the cache) on every turn.
+
+Usage:
+    context = ConversationContext(llm, n_ctx=2048, max_tokens=256)
+    prompt = context.prepare(user_input)
+    answer = llm(prompt, ...)["choices"][0]["text"]
+    context.add_turn(user_input, answer)
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are Workly, a friendly and helpful AI assistant created by WorklyHQ. "
+    "Answer clearly and concisely."
+)
+
+SUMMARY_PROMPT = """Summarize the conversation below in two or three sentences.
+Keep names, facts and preferences.
+
+{previous}{turns}
+
+Summary:"""
+
+
+class ConversationContext:
+    """Rolling, token-budgeted history for one conversation"""
+
+    def __init__(
+        self,
+        llm,
+        n_ctx=2048,
+        max_tokens=256,
+        system_prompt=DEFAULT_SYSTEM_PROMPT,
+        keep_ratio=0.5,
+        summarize=False,
+        summary_tokens=128,
+    ):
+        """
+        max_tokens are reserved for the answer. When the history overflows,
+        it is cut down to keep_ratio of the space left for it. With
+        summarize=True, removed turns are folded into a summary by the llm
+        instead of being forgotten.
+        """
+        self.llm = llm
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        self.keep_ratio = keep_ratio
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+
+        self.turns = []
+        self.summary = ""
+        self.evicted_turns = 0
+
+        # Prompt-eval measurements, for the last turn and in total
+        self.last_prompt_tokens = 0
+        self.last_reused_tokens = 0
+        self.last_saved_seconds = 0.0
+        self.total_saved_seconds = 0.0
+
+        self._token_counts = {}
+
+    def count_tokens(self, text):
+        """Count tokens with the model's tokenizer (estimate if unavailable)"""
+        if text not in self._token_counts:
+            if hasattr(self.llm, "tokenize"):
+                count = len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+            else:
+                count = len(text) // 4 + 1
+            self._token_counts[text] = count
+        return self._token_counts[text]
+
+    def _header(self):
+        """Persona and summary: the stable start of every prompt"""
+        header = f"{self.system_prompt}\n\n" if self.system_prompt else ""
+        if self.summary:
+            header += f"Summary of earlier conversation: {self.summary}\n\n"
+        return header
+
+    @staticmethod
+    def _format_turn(question, answer):
+        return f"User: {question}\nAssistant: {answer}\n"
+
+    def build_prompt(self, question):
+        """Build the prompt for question, evicting old turns if needed"""
+        question_text = f"User: {question}\nAssistant:"
+        fixed = self.count_tokens(question_text) + self.max_tokens
+
+        budget = self.n_ctx - fixed - self.count_tokens(self._header())
+        history = sum(self.count_tokens(turn) for turn in self.turns)
+
+        if history > budget:
+            self._evict(int(max(budget, 0) * self.keep_ratio))
+
+        return self._header() + "".join(self.turns) + question_text
+
+    def _evict(self, target):
+        """Drop the oldest turns until the history fits in target tokens"""
+        history = sum(self.count_tokens(turn) for turn in self.turns)
+        evicted = []
+
+        while self.turns and history > target:
+            turn = self.turns.pop(0)
+            history -= self.count_tokens(turn)
+            evicted.append(turn)
+
+        self.evicted_turns += len(evicted)
+        self._token_counts = {turn: self.count_tokens(turn) for turn in self.turns}
+
+        if self.summarize and evicted:
+            self.summary = self._summarize(evicted)
+
+    def _summarize(self, turns):
+        """Fold removed turns into the running summary"""
+        previous = f"Earlier summary: {self.summary}\n\n" if self.summary else ""
+        try:
+            response = self.llm(
+                SUMMARY_PROMPT.format(previous=previous, turns="".join(turns)),
+                max_tokens=self.summary_tokens,
+                temperature=0.2,
+                stop=["\n\n"],
+                echo=False,
+            )
+            return response["choices"][0]["text"].strip()
+        except Exception as e:
+            print(f"⚠️ Could not summarize old turns: {e}")
+            return self.summary
+
+    def prepare(self, question):
+        """
+        Build the prompt for question and measure how much of it is cached
+
+        Call record_prompt_eval() with the time to first token afterwards
+        to estimate the prompt-eval time saved by the cache.
+        """
+        prompt = self.build_prompt(question)
+
+        if hasattr(self.llm, "tokenize"):
+            tokens = self.llm.tokenize(prompt.encode("utf-8"))
+            self.last_prompt_tokens = len(tokens)
+            self.last_reused_tokens = self._cached_prefix(tokens)
+        return prompt
+
+    def _cached_prefix(self, tokens):
+        """Number of leading tokens already evaluated in the llm's KV cache"""
+        cached = getattr(self.llm, "input_ids", None)
+        n_cached = getattr(self.llm, "n_tokens", 0)
+        if cached is None or not n_cached:
+            return 0
+
+        reused = 0
+        for cached_token, token in zip(cached[:n_cached], tokens):
+            if cached_token != token:
+                break
+            reused += 1
+        return reused
+
+    def record_prompt_eval(self, seconds):
+        """
+        Estimate the time saved by reused tokens from the measured eval time
+
+        seconds is the time spent evaluating the non-cached part of the
+        prompt (roughly the time to first token).
+        """
+        evaluated = max(self.last_prompt_tokens - self.last_reused_tokens, 1)
+        self.last_saved_seconds = self.last_reused_tokens * seconds / evaluated
+        self.total_saved_seconds += self.last_saved_seconds
+        return self.last_saved_seconds
+
+    def add_turn(self, question, answer):
+        """Append a finished question and answer to the history"""
+        self.turns.append(self._format_turn(question, answer.strip()))
+
+    def prefix(self):
+        """Text every next prompt starts with: persona, summary and turns"""
+        return self._header() + "".join(self.turns)
+
+    def export(self):
+        """Get the conversation as JSON-serializable data"""
+        return {"turns": list(self.turns), "summary": self.summary}
+
+    def restore(self, data):
+        """Continue a conversation saved with export()"""
+        self.turns = list(data.get("turns", []))
+        self.summary = data.get("summary", "")
+        self._token_counts = {}
+
+    def clear(self):
+        """Forget the conversation (the persona is kept)"""
+        self.turns = []
+        self.summary = ""
+        self._token_counts = {}
@@ -10,14 +10,13 @@ License: See LICENSE file
 
 import json
 import os
+import time
 from pathlib import Path
 
-try:
-    from llama_cpp import Llama
-except ImportError:
-    print("❌ Error: llama-cpp-python not installed")
-    print("📦 Install with: pip install llama-cpp-python")
-    exit(1)
+from conversation_context import DEFAULT_SYSTEM_PROMPT, ConversationContext
+from model_manager import shared_manager
+from response_cache import ResponseCache
+from state_cache import StateCache, model_fingerprint
 
 
 def load_config():
@@ -34,13 +33,24 @@ def load_config():
         "max_tokens": 256,
         "temperature": 0.7,
         "n_ctx": 2048,
-        "n_threads": 4,
+        "show_stats": True,
+        "system_prompt": DEFAULT_SYSTEM_PROMPT,
+        "summarize_history": False,
+        "state_cache": True,
+        "state_cache_dir": "state_cache",
+        "state_cache_mb": 1024,
+        "resume_session": False,
+        "session_file": "chat_session.json",
+        "response_cache": False,
+        "response_cache_ttl": 3600,
+        "response_cache_db": None,
     }
 
 
-def load_model(config):
-    """Load the LLM model"""
-    model_path = config["model_path"]
+def find_model(config):
+    """Settings of the model to use, or None (with help) if its file is missing"""
+    settings = shared_manager(config).spec()
+    model_path = settings["model_path"]
 
     if not os.path.exists(model_path):
         print(f"❌ Model not found: {model_path}")
@@ -50,60 +60,301 @@ def load_model(config):
         print("- Mistral 7B: https://huggingface.co/models?search=mistral-7b-gguf")
         return None
 
-    print(f"📦 Loading model: {model_path}")
+    # The rest of the demo reads the active model's settings from config
+    config["model_path"] = model_path
+    config["n_ctx"] = settings["n_ctx"]
+    return settings
+
+
+def start_model(config, context, state_cache):
+    """
+    Load the model in the background (shared through the model manager)
+
+    Returns a Future that completes with (llm, startup timings) once the
+    model is loaded, warmed up with one tiny eval, and the persona and
+    resumed history are evaluated (or restored from the state cache).
+    """
+    manager = shared_manager(config)
+
+    def prepare(llm):
+        startup = manager.timings()
+        context.llm = llm
+
+        if state_cache is not None:
+            # Loaded if a previous run already evaluated the same prompt
+            start = time.perf_counter()
+            startup["prompt_from_disk"] = state_cache.warm(llm, context.prefix())
+            startup["prompt_seconds"] = time.perf_counter() - start
+
+        startup["ready_at"] = time.perf_counter()
+        return llm, startup
+
+    return manager.load_in_background(then=prepare)
+
+
+def wait_for_model(loading, started, config):
+    """Wait for the background load; return the model, or None if it failed"""
+    if not loading.done():
+        print("⏳ Model still loading, answering as soon as it's ready...")
+
+    try:
+        llm, startup = loading.result()
+    except ImportError:
+        print("❌ Error: llama-cpp-python not installed")
+        print("📦 Install with: pip install llama-cpp-python")
+        return None
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        return None
+
+    if "prompt_seconds" in startup:
+        if startup["prompt_from_disk"]:
+            print(
+                f"⚡ Restored prompt state from disk in {startup['prompt_seconds']:.2f}s"
+            )
+        else:
+            print(
+                f"💾 Evaluated prompt in {startup['prompt_seconds']:.2f}s "
+                "(cached for next time)"
+            )
+
+    if config.get("show_stats", True):
+        steps = [
+            f"{label} {startup[key]:.2f}s"
+            for label, key in (
+                ("import", "import_seconds"),
+                ("load", "load_seconds"),
+                ("warm-up", "warmup_seconds"),
+                ("prompt", "prompt_seconds"),
+            )
+            if startup.get(key) is not None
+        ]
+        print(
+            f"   ⏱️ Model ready {startup['ready_at'] - started:.2f}s after start "
+            f"({', '.join(steps)})"
+        )
+    print()
+    return llm
+
+
+def load_state_cache(config):
+    """Open the on-disk prompt state cache if enabled"""
+    if not config.get("state_cache", True):
+        return None
 
     try:
-        llm = Llama(
-            model_path=model_path,
+        return StateCache(
+            config.get("state_cache_dir", "state_cache"),
+            config["model_path"],
             n_ctx=config["n_ctx"],
-            n_threads=config["n_threads"],
-            verbose=False,
+            max_bytes=config.get("state_cache_mb", 1024) * 1024 * 1024,
         )
-        print("✅ Model loaded successfully!\n")
-        return llm
+    except OSError as e:
+        print(f"⚠️ State cache disabled: {e}")
+        return None
 
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
+
+def load_response_cache(config):
+    """
+    Open the response cache if answers are reusable
+
+    With temperature 0 a prompt always gets the same answer, so caching is
+    on automatically; otherwise only if response_cache is set.
+    """
+    if config["temperature"] != 0 and not config.get("response_cache", False):
         return None
 
+    return ResponseCache(
+        ttl=config.get("response_cache_ttl", 3600),
+        db_path=config.get("response_cache_db"),
+        faq=config.get("response_cache_faq"),
+    )
+
+
+def response_cache_key(response_cache, model_id, context, user_input, config):
+    """
+    Key for an answer: the prompt, the model and sampling settings
+
+    Common questions ("help", "who are you") are keyed on the persona alone,
+    so they hit in any conversation, not only as its first question.
+    """
+    if response_cache.is_faq(user_input):
+        history = context.system_prompt
+    else:
+        history = context.prefix()
+    return response_cache.make_key(
+        f"{history}User: {user_input}\nAssistant:",
+        model_id,
+        temperature=config["temperature"],
+        max_tokens=config["max_tokens"],
+    )
+
+
+def resume_session(context, config):
+    """Continue the last conversation if resume_session is enabled"""
+    session_path = Path(config.get("session_file", "chat_session.json"))
+
+    if config.get("resume_session", False) and session_path.exists():
+        with open(session_path, "r") as f:
+            context.restore(json.load(f))
+        print(f"🔁 Resumed previous conversation ({len(context.turns)} turns)")
+
+
+def end_session(llm, context, config, state_cache):
+    """Save the conversation and its evaluated state for resume_session"""
+    if not config.get("resume_session", False) or not context.turns:
+        return
 
-def generate_response(llm, user_input, config):
-    """Generate AI response"""
-    prompt = f"User: {user_input}\nAssistant:"
+    with open(config.get("session_file", "chat_session.json"), "w") as f:
+        json.dump(context.export(), f, indent=2)
+
+    # The model may never have finished loading
+    if state_cache is not None and llm is not None:
+        state_cache.save(llm, context.prefix())
+
+
+def stream_response(llm, user_input, config, stats=None, context=None):
+    """
+    Generate an AI response, yielding text as each token arrives
+
+    Stop sequences are applied by llama.cpp while streaming: it only holds
+    back the few characters that could be the start of one, never the
+    whole response. If stats is a dict, it is filled with this turn's
+    time to first token, token count and tokens/sec. With a
+    ConversationContext, the prompt includes earlier turns and the
+    finished turn is added to it.
+    """
+    if context is not None:
+        prompt = context.prepare(user_input)
+    else:
+        prompt = f"User: {user_input}\nAssistant:"
+    start = time.perf_counter()
+    first_token_at = None
+    pieces = []
 
     try:
-        response = llm(
+        for chunk in llm(
             prompt,
             max_tokens=config["max_tokens"],
             temperature=config["temperature"],
             stop=["User:", "\n\n"],
             echo=False,
-        )
+            stream=True,
+        ):
+            text = chunk["choices"][0]["text"]
+            if not pieces:
+                # Drop the space the model puts after "Assistant:"
+                text = text.lstrip()
+            if not text:
+                continue
 
-        return response["choices"][0]["text"].strip()
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            pieces.append(text)
+            yield text
 
     except Exception as e:
-        return f"Error generating response: {e}"
+        yield f"Error generating response: {e}"
+        return
+
+    end = time.perf_counter()
+    if context is not None:
+        context.add_turn(user_input, "".join(pieces))
+        # Time to first token is (almost all) prompt evaluation
+        context.record_prompt_eval((first_token_at or end) - start)
+
+    if stats is not None:
+        tokens = len(llm.tokenize("".join(pieces).encode("utf-8"), add_bos=False))
+        stats["first_token_seconds"] = (first_token_at or end) - start
+        stats["total_seconds"] = end - start
+        stats["tokens"] = tokens
+        # Decode speed: tokens after the first, over the time they took
+        decode_time = end - (first_token_at or end)
+        stats["tokens_per_second"] = (
+            (tokens - 1) / decode_time if tokens > 1 and decode_time > 0 else 0.0
+        )
+        if context is not None:
+            stats["prompt_tokens"] = context.last_prompt_tokens
+            stats["reused_tokens"] = context.last_reused_tokens
+            stats["saved_seconds"] = context.last_saved_seconds
+
+
+def generate_response(llm, user_input, config):
+    """Generate AI response"""
+    return "".join(stream_response(llm, user_input, config)).strip()
+
+
+def print_turn_stats(stats):
+    """Print timing for one response"""
+    print(
+        f"   ⚡ First token {stats['first_token_seconds']:.2f}s • "
+        f"{stats['tokens']} tokens • {stats['tokens_per_second']:.1f} tokens/s"
+    )
+    if stats.get("prompt_tokens"):
+        print(
+            f"   ♻️  {stats['reused_tokens']}/{stats['prompt_tokens']} prompt tokens "
+            f"reused from cache (~{stats['saved_seconds']:.2f}s saved)"
+        )
+    print()
+
+
+def print_session_stats(turns):
+    """Print average timing over all responses"""
+    if not turns:
+        return
+    first_token = sum(t["first_token_seconds"] for t in turns) / len(turns)
+    speed = sum(t["tokens_per_second"] for t in turns) / len(turns)
+    saved = sum(t.get("saved_seconds", 0.0) for t in turns)
+    print(
+        f"📊 {len(turns)} responses • avg first token {first_token:.2f}s • "
+        f"avg {speed:.1f} tokens/s • ~{saved:.1f}s prompt eval saved"
+    )
 
 
 def main():
     """Main chatbot loop"""
+    started = time.perf_counter()
     print("=" * 60)
     print("🤖 Workly Chatbot Demo")
     print("=" * 60)
     print("\nThis is a simplified demo of Workly's AI capabilities.")
-    print("Type 'quit' to exit\n")
+    print("Type 'reset' to start over, 'quit' to exit\n")
 
     # Load configuration
     config = load_config()
 
-    # Load model
-    llm = load_model(config)
-    if llm is None:
+    # Find the model; it loads in the background while you type
+    if find_model(config) is None:
         return
 
+    # Conversation history, kept within the context window. Until the
+    # model is loaded, nothing needs its tokenizer.
+    context = ConversationContext(
+        None,
+        n_ctx=config["n_ctx"],
+        max_tokens=config["max_tokens"],
+        system_prompt=config.get("system_prompt", DEFAULT_SYSTEM_PROMPT),
+        summarize=config.get("summarize_history", False),
+    )
+    resume_session(context, config)
+
+    # Skip re-evaluating the persona (and resumed history) on restarts
+    state_cache = load_state_cache(config)
+    loading = start_model(config, context, state_cache)
+    llm = None
+
+    # Reuse answers to prompts seen before (deterministic settings only);
+    # cached answers don't need the model, even while it is loading
+    response_cache = load_response_cache(config)
+    model_id = model_fingerprint(config["model_path"]) if response_cache else None
+
     # Chat loop
-    print("🎉 Ready! Start chatting:\n")
+    print(f"📦 Loading model in the background: {config['model_path']}")
+    print("🎉 Ready! Start chatting:")
+    if config.get("show_stats", True):
+        print(f"   ⏱️ Prompt shown {time.perf_counter() - started:.2f}s after start")
+    print()
+    turns = []
 
     while True:
         try:
@@ -115,21 +366,68 @@ def main():
 
             # Check for quit command
             if user_input.lower() in ["quit", "exit", "bye"]:
+                print_session_stats(turns)
                 print("\n👋 Goodbye!")
                 break
 
-            # Generate response
+            if user_input.lower() == "reset":
+                context.clear()
+                print("🧹 Conversation cleared\n")
+                continue
+
+            cache_key = None
+            if response_cache:
+                cache_key = response_cache_key(
+                    response_cache, model_id, context, user_input, config
+                )
+                cached = response_cache.get(cache_key)
+                if cached:
+                    print(f"Workly: {cached}\n")
+                    context.add_turn(user_input, cached)
+                    if config.get("show_stats", True):
+                        print("   💨 Answered from the response cache\n")
+                    continue
+
+            if llm is None:
+                # The question waits for the model to finish loading
+                llm = wait_for_model(loading, started, config)
+                if llm is None:
+                    break
+
             print("Workly: ", end="", flush=True)
-            response = generate_response(llm, user_input, config)
-            print(response + "\n")
+
+            # Stream the response as it is generated
+            stats = {}
+            pieces = []
+            for text in stream_response(llm, user_input, config, stats, context):
+                print(text, end="", flush=True)
+                pieces.append(text)
+            print("\n")
+
+            if stats:
+                turns.append(stats)
+                if cache_key:
+                    response_cache.put(cache_key, "".join(pieces).strip())
+                if config.get("show_stats", True):
+                    print_turn_stats(stats)
 
         except KeyboardInterrupt:
+            print_session_stats(turns)
             print("\n\n👋 Interrupted by user. Goodbye!")
             break
 
         except Exception as e:
             print(f"\n❌ Error: {e}\n")
 
+    end_session(llm, context, config, state_cache)
+    if response_cache:
+        cache = response_cache.get_stats()
+        print(
+            f"💨 Response cache: {cache['hits']} hits, {cache['misses']} misses "
+            f"({cache['hit_rate']:.0%})"
+        )
+        response_cache.close()
+
 
 if __name__ == "__main__":
     main()
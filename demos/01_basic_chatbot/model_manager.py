@@ -0,0 +1,404 @@
+"""
+Model Manager - Workly Public Edition
+
+Loads GGUF models on first use and keeps them within a RAM budget.
+Models are listed in a registry in config.json; a model is only loaded
+when something asks for it, and every caller in the process gets the same
+instance instead of loading its own copy. When loading another model
+would go over the budget, the least recently used ones are unloaded first.
+
+A model is never closed under a running generation. Models borrowed with
+lease() are not unloaded until returned. A model fetched with get() and
+still referenced by a caller is only released by the manager; it keeps
+counting against the budget until llama.cpp frees it, when the last
+reference goes. If everything is still in use, the next model is loaded
+anyway with a warning, so the budget is a target rather than a hard cap.
+
+Thread counts default to the number of physical CPU cores available to
+the process (llama.cpp gets slower, not faster, on hyper-threads).
+
+Loading can also happen in the background, followed by one tiny warm-up
+evaluation, so a UI can come up while the model is still loading.
+
+Usage:
+    manager = shared_manager(config)
+    llm = manager.get()          # default model
+    small = manager.get("tiny")  # another registry entry
+    with manager.lease("big") as big:   # not unloaded while in use
+        big("Hello")
+    future = manager.load_in_background()  # concurrent.futures.Future
+
+Config:
+    "models": {
+        "tiny": {"model_path": "tiny.gguf", "n_ctx": 2048},
+        "big": {"model_path": "big.gguf", "n_ctx": 4096, "n_threads": 8}
+    },
+    "default_model": "tiny",
+    "model_ram_mb": 8192
+
+Without "models", the single model_path / n_ctx / n_threads settings are
+used as a registry of one.
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def detect_threads():
+    """Threads for llama.cpp: physical cores this process may run on"""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+
+    physical = psutil.cpu_count(logical=False) if psutil else None
+    if physical:
+        return max(1, min(physical, available))
+    return available
+
+
+def estimate_model_bytes(model_path, n_ctx=2048):
+    """
+    Rough RAM needed by a loaded model
+
+    The weights take about the file size. The KV cache and scratch buffers
+    grow with the context; ~0.25 MiB per context token is a generous guess
+    for small and mid-sized models. Set "ram_mb" on a model to override.
+    """
+    return os.path.getsize(model_path) + n_ctx * 256 * 1024
+
+
+class ModelManager:
+    """Lazy model loading with LRU unloading under a RAM budget"""
+
+    def __init__(self, registry, default_model=None, ram_budget_mb=None, loader=None):
+        """
+        registry maps model names to settings (model_path, n_ctx, optional
+        n_threads and ram_mb). ram_budget_mb=None means no limit. loader
+        builds a model from those settings (llama_cpp.Llama by default).
+        """
+        if not registry:
+            raise ValueError("Model registry is empty")
+
+        self.registry = {
+            name: self._with_defaults(spec) for name, spec in registry.items()
+        }
+        self.default_model = default_model or next(iter(registry))
+        if self.default_model not in self.registry:
+            raise KeyError(f"Unknown default model: {self.default_model}")
+
+        self.ram_budget = ram_budget_mb * 1024 * 1024 if ram_budget_mb else None
+        self.loader = loader
+
+        # name -> (llm, bytes); order is least to most recently used
+        self._loaded = OrderedDict()
+        # id(llm) -> (name, bytes) of unloaded models callers still hold
+        self._released = {}
+        # id(llm) -> number of open leases
+        self._leases = {}
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.unloads = 0
+        self.import_seconds = None
+        self.load_seconds = {}
+        self.warmup_seconds = {}
+
+    @classmethod
+    def from_config(cls, config, loader=None):
+        """Build a manager from the "models" registry or the single model_path"""
+        registry = config.get("models")
+        if not registry:
+            registry = {
+                "default": {
+                    "model_path": config.get("model_path", "model.gguf"),
+                    "n_ctx": config.get("n_ctx", 2048),
+                    "n_threads": config.get("n_threads"),
+                }
+            }
+
+        return cls(
+            registry,
+            default_model=config.get("default_model"),
+            ram_budget_mb=config.get("model_ram_mb"),
+            loader=loader,
+        )
+
+    @staticmethod
+    def _with_defaults(spec):
+        spec = dict(spec)
+        spec.setdefault("n_ctx", 2048)
+        if not spec.get("n_threads"):
+            spec["n_threads"] = detect_threads()
+        return spec
+
+    def register(self, model_path, **settings):
+        """
+        Registry name of a model file, adding an entry for it if it has none
+
+        Lets code that only knows a path share the manager's loaded models
+        and RAM budget. settings (n_ctx, n_threads, ram_mb) apply to a new
+        entry only.
+        """
+        path = os.path.abspath(model_path)
+        with self._lock:
+            for name, spec in self.registry.items():
+                if os.path.abspath(spec["model_path"]) == path:
+                    return name
+            self.registry[model_path] = self._with_defaults(
+                {"model_path": model_path, **settings}
+            )
+            return model_path
+
+    def spec(self, name=None):
+        """Settings of a registry entry (the default model if name is None)"""
+        return self.registry[name or self.default_model]
+
+    def _model_bytes(self, spec):
+        if spec.get("ram_mb"):
+            return spec["ram_mb"] * 1024 * 1024
+        return estimate_model_bytes(spec["model_path"], spec["n_ctx"])
+
+    def _load(self, spec):
+        loader = self.loader
+        if loader is None:
+            # Imported on first load: it takes a while and isn't needed before
+            start = time.perf_counter()
+            from llama_cpp import Llama
+
+            if self.import_seconds is None:
+                self.import_seconds = time.perf_counter() - start
+            loader = Llama
+
+        return loader(
+            model_path=spec["model_path"],
+            n_ctx=spec["n_ctx"],
+            n_threads=spec["n_threads"],
+            verbose=False,
+        )
+
+    def get(self, name=None):
+        """
+        Get a loaded model, loading it (and unloading others) if needed
+
+        Raises FileNotFoundError if the model file is missing, ImportError
+        if llama-cpp-python isn't installed, and whatever the loader raises.
+        """
+        with self._lock:
+            return self._get(name or self.default_model)
+
+    @contextmanager
+    def lease(self, name=None):
+        """
+        Borrow a model: it isn't unloaded while the lease is open
+
+        Leased models are skipped when making room for another one. If
+        unload() is called on a leased model, it is closed when its last
+        lease ends instead.
+        """
+        with self._lock:
+            llm = self._get(name or self.default_model)
+            key = id(llm)
+            self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield llm
+        finally:
+            with self._lock:
+                self._leases[key] -= 1
+                if self._leases[key] == 0:
+                    del self._leases[key]
+                    if key in self._released:
+                        # Unloaded meanwhile; free it now that it is idle
+                        del self._released[key]
+                        self._close(llm)
+
+    def _get(self, name):
+        """get() with the lock held"""
+        spec = self.registry[name]
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+            return self._loaded[name][0]
+
+        if not os.path.exists(spec["model_path"]):
+            raise FileNotFoundError(spec["model_path"])
+
+        size = self._model_bytes(spec)
+        self._make_room(size)
+
+        start = time.perf_counter()
+        llm = self._load(spec)
+        self.load_seconds[name] = time.perf_counter() - start
+
+        self._loaded[name] = (llm, size)
+        self.loads += 1
+        return llm
+
+    def warm_up(self, name=None):
+        """
+        Run one tiny evaluation so the first real request is fast
+
+        The first eval allocates compute buffers and pages the weights in;
+        better to pay for that before anyone is waiting.
+        """
+        name = name or self.default_model
+        llm = self.get(name)
+
+        start = time.perf_counter()
+        if hasattr(llm, "eval"):
+            llm.eval(llm.tokenize(b"Hello"))
+            llm.reset()
+        self.warmup_seconds[name] = time.perf_counter() - start
+        return llm
+
+    def load_in_background(self, name=None, warm_up=True, then=None):
+        """
+        Load (and warm up) a model on a daemon thread
+
+        Returns a concurrent.futures.Future with the model, or with
+        then(model) if given; then runs on the loading thread, so it can
+        do more slow setup before the future completes.
+        """
+        future = concurrent.futures.Future()
+
+        def load():
+            try:
+                llm = self.warm_up(name) if warm_up else self.get(name)
+                future.set_result(then(llm) if then else llm)
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=load, name="model-loader", daemon=True).start()
+        return future
+
+    def timings(self, name=None):
+        """Import, load and warm-up seconds of a model (None if not done)"""
+        name = name or self.default_model
+        return {
+            "import_seconds": self.import_seconds,
+            "load_seconds": self.load_seconds.get(name),
+            "warmup_seconds": self.warmup_seconds.get(name),
+        }
+
+    def _used_bytes(self):
+        """Loaded models plus unloaded ones that callers still hold"""
+        return sum(bytes_ for _, bytes_ in self._loaded.values()) + sum(
+            bytes_ for _, bytes_ in self._released.values()
+        )
+
+    def _make_room(self, size):
+        """Unload least recently used idle models until size fits the budget"""
+        if self.ram_budget is None:
+            return
+
+        used = self._used_bytes()
+        for name in list(self._loaded):
+            if used + size <= self.ram_budget:
+                break
+            if id(self._loaded[name][0]) in self._leases:
+                continue
+
+            self._release(name, self._loaded.pop(name))
+            self.unloads += 1
+            print(f"♻️ Unloaded model '{name}' to stay within the RAM budget")
+            # Freed already unless a caller still holds it
+            used = self._used_bytes()
+
+        if used + size > self.ram_budget:
+            held = [name for name, _ in self._released.values()]
+            print(
+                f"⚠️ Model needs ~{size / 1024**2:.0f} MB, more than the "
+                f"{self.ram_budget / 1024**2:.0f} MB budget allows"
+                + (f" ({', '.join(held)} still in use)" if held else "")
+                + "; loading anyway"
+            )
+
+    def _release(self, name, entry):
+        """
+        Drop the manager's reference to an unloaded model
+
+        Not closed: a caller (an inference worker, a chat loop) may still be
+        generating with it. Its memory counts as used until llama.cpp frees
+        it with the last reference.
+        """
+        llm, size = entry
+        key = id(llm)
+        try:
+            weakref.finalize(llm, self._released.pop, key, None)
+        except TypeError:
+            # Can't be tracked (no weak references): assume it is freed
+            return
+        self._released[key] = (name, size)
+
+    @staticmethod
+    def _close(llm):
+        # Frees the weights now instead of whenever the last reference goes
+        close = getattr(llm, "close", None)
+        if close is not None:
+            close()
+
+    def unload(self, name=None):
+        """
+        Unload and close a model if it is loaded
+
+        Its memory is freed right away (after open leases end), so only
+        call this once nothing else is using the model (e.g. on shutdown).
+        """
+        name = name or self.default_model
+        with self._lock:
+            entry = self._loaded.pop(name, None)
+            if entry is None:
+                return
+            self.unloads += 1
+            if id(entry[0]) in self._leases:
+                # Closed when its last lease ends
+                self._released[id(entry[0])] = (name, entry[1])
+            else:
+                self._close(entry[0])
+
+    def is_loaded(self, name=None):
+        return (name or self.default_model) in self._loaded
+
+    def stats(self):
+        """Loaded models (least recently used first), RAM use and counters"""
+        with self._lock:
+            return {
+                "loaded": list(self._loaded),
+                # Unloaded, but not freed yet because callers still hold them
+                "released": [name for name, _ in self._released.values()],
+                "ram_mb": round(self._used_bytes() / 1024**2, 1),
+                "ram_budget_mb": (
+                    round(self.ram_budget / 1024**2, 1) if self.ram_budget else None
+                ),
+                "loads": self.loads,
+                "unloads": self.unloads,
+                "load_seconds": {
+                    name: round(seconds, 2)
+                    for name, seconds in self.load_seconds.items()
+                },
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_manager(config):
+    """The process-wide manager, created from config on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ModelManager.from_config(config)
+        return _shared
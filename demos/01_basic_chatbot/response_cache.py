@@ -0,0 +1,219 @@
+"""
+Response Cache - Workly Public Edition
+
+Answers repeated prompts without running the model again.
+With temperature 0 the model's answer to a prompt is deterministic, so
+it can be reused: "who are you" asked for the hundredth time costs a
+dictionary lookup instead of seconds of generation.
+
+Entries are keyed by the normalized prompt, the model and the sampling
+parameters. Callers include the conversation so far in the prompt, except
+for common questions (is_faq) whose answer doesn't depend on it. Recent
+answers are kept in an in-memory LRU with a TTL; an optional SQLite file
+keeps them across restarts.
+
+Usage:
+    cache = ResponseCache(max_entries=256, ttl=3600, db_path="responses.db")
+    key = cache.make_key(prompt, model_id, temperature=0, max_tokens=256)
+    answer = cache.get(key)
+    if answer is None:
+        answer = generate(prompt)
+        cache.put(key, answer)
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Questions answered the same way whatever was said before
+DEFAULT_FAQ = (
+    "help",
+    "who are you",
+    "what are you",
+    "what can you do",
+    "what is your name",
+)
+
+
+class ResponseCache:
+    """In-memory LRU + optional SQLite cache of model responses"""
+
+    def __init__(
+        self,
+        max_entries=256,
+        ttl=3600,
+        db_path=None,
+        max_db_entries=10000,
+        faq=None,
+    ):
+        """
+        Entries expire ttl seconds after they were generated (None keeps
+        them forever). The SQLite tier keeps up to max_db_entries, least
+        recently used deleted first. faq lists the questions is_faq()
+        accepts (DEFAULT_FAQ if None).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self.faq = {self.normalize(q) for q in (DEFAULT_FAQ if faq is None else faq)}
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if db_path:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+            """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)"
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def normalize(prompt):
+        """Ignore case, extra whitespace and punctuation at the end of lines"""
+        lines = (
+            re.sub(r"\s+", " ", line).strip().rstrip(" ?!.")
+            for line in prompt.lower().splitlines()
+        )
+        return "\n".join(line for line in lines if line)
+
+    def is_faq(self, question):
+        """
+        True for common questions whose answer doesn't depend on the
+        conversation, so callers can key them without the history
+        """
+        return self.normalize(question) in self.faq
+
+    def make_key(self, prompt, model_id, **params):
+        """Cache key for a prompt, a model and its sampling parameters"""
+        data = json.dumps(
+            [self.normalize(prompt), model_id, params], sort_keys=True, default=str
+        )
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key):
+        """Get a cached response, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._entries[key]
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and not self._expired(row[1]):
+                    self.conn.execute(
+                        "UPDATE responses SET last_used = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self.conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self.db_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def _remember(self, key, response, created_at):
+        """Add to the in-memory LRU, dropping the oldest entries"""
+        self._entries[key] = (response, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key, response):
+        """Cache a response"""
+        if not response:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                self._trim_db()
+                self.conn.commit()
+
+    def _trim_db(self):
+        """Delete expired rows and keep at most max_db_entries"""
+        if self.ttl is not None:
+            self.conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        self.conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_db_entries,),
+        )
+
+    def get_stats(self):
+        """Get hit/miss counters and sizes"""
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            stats = {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "db_entries": None,
+            }
+            if self.conn is not None:
+                stats["db_entries"] = self.conn.execute(
+                    "SELECT COUNT(*) FROM responses"
+                ).fetchone()[0]
+            return stats
+
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM responses")
+                self.conn.commit()
+
+    def close(self):
+        """Close the SQLite tier"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,209 @@
+"""
+State Cache - Workly Public Edition
+
+Saves llama.cpp's evaluated prompt state (the KV cache) to disk.
+Evaluating the persona and conversation history is the slow part of the
+first answer on a CPU-only machine. With the state saved, a restart (or a
+conversation coming back) loads it from disk in a fraction of a second
+and only the new question has to be evaluated.
+
+Entries are keyed by a fingerprint of the model file plus a hash of the
+prompt text, so a different model, context size or prompt never loads a
+wrong state. The least recently used entries are deleted when the cache
+grows past its disk budget.
+
+Usage:
+    cache = StateCache("state_cache", model_path, n_ctx=2048)
+    cache.warm(llm, persona_prompt)     # Load from disk, or evaluate + save
+    ...
+    cache.save(llm, context.prefix())   # After a turn
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+
+FORMAT_VERSION = 1
+SAMPLE_BYTES = 1024 * 1024
+
+
+def model_fingerprint(model_path):
+    """
+    Identify a model file without reading all of it
+
+    Hashes the size plus the first, middle and last megabyte, which is
+    enough to tell models (and re-quantized files) apart. Hashing the
+    whole file would cost seconds per start for multi-GB models.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(model_path)
+    digest.update(str(size).encode())
+
+    with open(model_path, "rb") as f:
+        for offset in (0, size // 2, max(size - SAMPLE_BYTES, 0)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_BYTES))
+
+    return digest.hexdigest()
+
+
+class StateCache:
+    """Disk cache of llama.cpp states, keyed by model and prompt"""
+
+    def __init__(self, cache_dir, model_path, n_ctx=2048, max_bytes=1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        try:
+            import llama_cpp
+
+            version = getattr(llama_cpp, "__version__", "")
+        except ImportError:
+            version = ""
+
+        # A state only fits the same model, context size and library version
+        self._model_key = f"{model_fingerprint(model_path)}:{n_ctx}:{version}"
+
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def key(self, prompt):
+        """Cache key for a prompt: model fingerprint + prompt hash"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self._model_key.encode())
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, prompt):
+        return self.cache_dir / f"{self.key(prompt)}.llstate"
+
+    def save(self, llm, prompt, eval_seconds=None):
+        """
+        Save the llm's current state as the state for prompt
+
+        The llm must have just evaluated prompt (possibly followed by a
+        generated answer). eval_seconds, if known, is how long evaluating
+        it took; it is reported as time saved when the state is loaded.
+        """
+        path = self._path(prompt)
+        entry = {
+            "version": FORMAT_VERSION,
+            "n_tokens": llm.n_tokens,
+            "eval_seconds": eval_seconds,
+            "state": llm.save_state(),
+        }
+
+        # Write to a temporary file first so a crash never leaves half a state
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+        self.saves += 1
+        self._evict()
+
+    def load(self, llm, prompt, min_new_tokens=0):
+        """
+        Load the saved state for prompt into llm; return True on success
+
+        With min_new_tokens, the state is only loaded if it covers at least
+        that many more tokens than the llm already has cached for prompt.
+        """
+        path = self._path(prompt)
+        if not path.exists():
+            self.misses += 1
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+
+            if entry.get("version") != FORMAT_VERSION:
+                raise ValueError("old cache format")
+
+            if min_new_tokens:
+                cached = self._cached_prefix(llm, prompt)
+                if entry["n_tokens"] < cached + min_new_tokens:
+                    return False
+
+            llm.load_state(entry["state"])
+
+        except Exception as e:
+            print(f"⚠️ Discarding unusable cached state: {e}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return False
+
+        # Touch the file: modification time is the LRU order
+        os.utime(path)
+        self.hits += 1
+        if entry.get("eval_seconds"):
+            self.saved_seconds += entry["eval_seconds"]
+        return True
+
+    @staticmethod
+    def _cached_prefix(llm, prompt):
+        """Number of prompt tokens already in the llm's KV cache"""
+        tokens = llm.tokenize(prompt.encode("utf-8"))
+        reused = 0
+        for cached_token, token in zip(llm.input_ids[: llm.n_tokens], tokens):
+            if cached_token != token:
+                break
+            reused += 1
+        return reused
+
+    def warm(self, llm, prompt):
+        """
+        Make sure the llm has prompt evaluated
+
+        Loads the state from disk if it is cached; otherwise evaluates the
+        prompt and saves the result. Returns True if it came from disk.
+        """
+        if self.load(llm, prompt):
+            return True
+
+        start = time.perf_counter()
+        llm.reset()
+        llm.eval(llm.tokenize(prompt.encode("utf-8")))
+        self.save(llm, prompt, eval_seconds=time.perf_counter() - start)
+        return False
+
+    def _evict(self):
+        """Delete least recently used states until the cache fits max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob("*.llstate"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def get_stats(self):
+        """Get hit/miss counters and disk usage"""
+        files = list(self.cache_dir.glob("*.llstate"))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "saves": self.saves,
+            "evictions": self.evictions,
+            "saved_seconds": round(self.saved_seconds, 2),
+            "entries": len(files),
+            "size_mb": round(sum(f.stat().st_size for f in files) / 1024**2, 1),
+        }
@@ -0,0 +1,274 @@
+"""
+GLB Reader - Workly Public Edition
+
+Reads binary glTF (.glb / .vrm) files without loading them into memory.
+A GLB file is a 12-byte header followed by chunks: one JSON chunk (the
+scene description and VRM metadata) and usually one BIN chunk (geometry,
+skinning data and textures, often 10-100 MB).
+
+Opening a file only reads the header and the chunk headers. The JSON is
+read when first asked for, and the BIN chunk is memory-mapped: accessors,
+bufferViews and images are zero-copy views into the mapping, decoded only
+when touched. Reading an avatar's metadata costs the JSON chunk alone.
+
+Usage:
+    with GLBFile("avatar.vrm") as glb:
+        meta = glb.json["extensions"]["VRM"]["meta"]
+        positions = glb.accessor(0)      # NumPy array view (N, 3)
+        mime, data = glb.image(0)        # memoryview of a PNG/JPEG
+
+Requirements:
+    - NumPy (optional): accessors as arrays; without it, tightly packed
+      accessors are returned as typed memoryviews
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import json
+import mmap
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+CHUNK_NAMES = {CHUNK_JSON: "JSON", CHUNK_BIN: "BIN"}
+
+# componentType -> struct format (little-endian sizes match glTF)
+COMPONENT_FORMATS = {
+    5120: "b",
+    5121: "B",
+    5122: "h",
+    5123: "H",
+    5125: "I",
+    5126: "f",
+}
+
+TYPE_COMPONENTS = {
+    "SCALAR": 1,
+    "VEC2": 2,
+    "VEC3": 3,
+    "VEC4": 4,
+    "MAT2": 4,
+    "MAT3": 9,
+    "MAT4": 16,
+}
+
+
+class GLBError(ValueError):
+    """Raised for files that aren't valid GLB or use unsupported features"""
+
+
+class Chunk:
+    """Position of one chunk's data in the file"""
+
+    __slots__ = ("type", "offset", "length")
+
+    def __init__(self, chunk_type, offset, length):
+        self.type = chunk_type
+        self.offset = offset
+        self.length = length
+
+    @property
+    def name(self):
+        return CHUNK_NAMES.get(self.type, f"0x{self.type:08X}")
+
+    def __repr__(self):
+        return f"Chunk({self.name}, offset={self.offset}, length={self.length})"
+
+
+class GLBFile:
+    """Lazy, memory-mapped view of a GLB file"""
+
+    def __init__(self, path):
+        """Read the file header and index every chunk (no chunk data is read)"""
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = None
+        self._json = None
+        self._accessors = {}
+
+        try:
+            self._index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _index(self):
+        header = self._file.read(12)
+        if len(header) < 12 or header[:4] != GLB_MAGIC:
+            raise GLBError("Not a GLB file (invalid magic header)")
+
+        self.version, self.length = struct.unpack_from("<II", header, 4)
+        if self.version != 2:
+            raise GLBError(f"Unsupported glTF version {self.version}")
+
+        # Walk the chunk headers, seeking over the data
+        self.chunks = []
+        offset = 12
+        while offset + 8 <= self.length:
+            self._file.seek(offset)
+            chunk_header = self._file.read(8)
+            if len(chunk_header) < 8:
+                break
+            length, chunk_type = struct.unpack("<II", chunk_header)
+            if offset + 8 + length > self.length:
+                raise GLBError(f"Chunk at byte {offset} runs past the end of file")
+            self.chunks.append(Chunk(chunk_type, offset + 8, length))
+            offset += 8 + length
+
+        if not self.chunks or self.chunks[0].type != CHUNK_JSON:
+            raise GLBError("First chunk must be JSON")
+
+    def chunk(self, chunk_type):
+        """First chunk of a type, or None"""
+        for chunk in self.chunks:
+            if chunk.type == chunk_type:
+                return chunk
+        return None
+
+    def json_bytes(self):
+        """Raw bytes of the JSON chunk (read from the file, not mapped)"""
+        chunk = self.chunks[0]
+        self._file.seek(chunk.offset)
+        return self._file.read(chunk.length)
+
+    @property
+    def json(self):
+        """The glTF JSON, parsed on first access"""
+        if self._json is None:
+            # Chunks are padded with spaces, which json ignores
+            self._json = json.loads(self.json_bytes())
+        return self._json
+
+    @property
+    def bin(self):
+        """memoryview of the BIN chunk (empty if there is none)"""
+        chunk = self.chunk(CHUNK_BIN)
+        if chunk is None:
+            return memoryview(b"")
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)[chunk.offset : chunk.offset + chunk.length]
+
+    def buffer_view(self, index):
+        """memoryview of a bufferView's bytes"""
+        view = self.json["bufferViews"][index]
+        if view.get("buffer", 0) != 0 or "uri" in self.json["buffers"][0]:
+            raise GLBError("Only the GLB's own BIN buffer is supported")
+
+        start = view.get("byteOffset", 0)
+        end = start + view["byteLength"]
+        data = self.bin
+        if end > len(data):
+            raise GLBError(f"bufferView {index} runs past the BIN chunk")
+        return data[start:end]
+
+    def accessor(self, index):
+        """
+        Data of an accessor, as a zero-copy view where possible
+
+        With NumPy: a read-only array of shape (count,) or (count, n),
+        honouring byteStride. Sparse accessors and accessors without a
+        bufferView are materialized as new arrays. Without NumPy: a typed
+        memoryview, for tightly packed, non-sparse accessors only.
+        """
+        if index not in self._accessors:
+            self._accessors[index] = self._decode_accessor(index)
+        return self._accessors[index]
+
+    def _decode_accessor(self, index):
+        accessor = self.json["accessors"][index]
+        fmt = COMPONENT_FORMATS[accessor["componentType"]]
+        components = TYPE_COMPONENTS[accessor["type"]]
+        count = accessor["count"]
+        item_size = struct.calcsize(fmt)
+
+        if np is None:
+            if "sparse" in accessor or "bufferView" not in accessor:
+                raise GLBError("Sparse accessors need NumPy")
+            stride = self.json["bufferViews"][accessor["bufferView"]].get("byteStride")
+            if stride and stride != components * item_size:
+                raise GLBError("Interleaved accessors need NumPy")
+            start = accessor.get("byteOffset", 0)
+            data = self.buffer_view(accessor["bufferView"])
+            data = data[start : start + count * components * item_size]
+            if components == 1:
+                return data.cast(fmt)
+            return data.cast("B").cast(fmt, shape=[count, components])
+
+        dtype = np.dtype("<" + fmt)
+        shape = (count,) if components == 1 else (count, components)
+
+        if "bufferView" in accessor:
+            view = self.json["bufferViews"][accessor["bufferView"]]
+            stride = view.get("byteStride") or components * item_size
+            data = self.buffer_view(accessor["bufferView"])
+            strides = (stride,) if components == 1 else (stride, item_size)
+            array = np.ndarray(
+                shape,
+                dtype=dtype,
+                buffer=data,
+                offset=accessor.get("byteOffset", 0),
+                strides=strides,
+            )
+        else:
+            array = np.zeros(shape, dtype=dtype)
+
+        sparse = accessor.get("sparse")
+        if sparse:
+            array = self._apply_sparse(array, sparse, dtype, components)
+        return array
+
+    def _apply_sparse(self, array, sparse, dtype, components):
+        """Copy the array and overwrite the sparse entries"""
+        array = array.copy()
+        indices_info = sparse["indices"]
+        values_info = sparse["values"]
+
+        index_dtype = np.dtype("<" + COMPONENT_FORMATS[indices_info["componentType"]])
+        indices = np.frombuffer(
+            self.buffer_view(indices_info["bufferView"]),
+            dtype=index_dtype,
+            count=sparse["count"],
+            offset=indices_info.get("byteOffset", 0),
+        )
+        values = np.frombuffer(
+            self.buffer_view(values_info["bufferView"]),
+            dtype=dtype,
+            count=sparse["count"] * components,
+            offset=values_info.get("byteOffset", 0),
+        )
+        array[indices] = values.reshape((sparse["count"],) + array.shape[1:])
+        return array
+
+    def image(self, index):
+        """(mimeType, memoryview) of an image stored in a bufferView"""
+        image = self.json["images"][index]
+        if "bufferView" not in image:
+            raise GLBError(f"Image {index} is external ({image.get('uri', '?')})")
+        return image.get("mimeType", ""), self.buffer_view(image["bufferView"])
+
+    def close(self):
+        """Close the file and the mapping"""
+        self._accessors.clear()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A view is still in use; the mapping closes when it is freed
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -6,15 +6,31 @@ This is a simplified educational example.
 
 In the full Workly Desktop, VRM loading is handled by Unity + UniVRM.
 
+Usage:
+    python load_vrm.py                       # Interactive menu
+    python load_vrm.py path/to/model.vrm     # Load one avatar
+    python load_vrm.py scan ~/Avatars        # Index a folder of avatars
+    python load_vrm.py search blink --commercial
+
 Author: WorklyHQ
 License: See LICENSE file
 """
 
-import sys
+import argparse
 import json
-import zipfile
+import sqlite3
+import sys
+import time
 from pathlib import Path
 
+from glb_reader import GLBError, GLBFile
+from vrm_cache import VRMCache
+from vrm_library import FLAG_COLUMNS, VRMLibrary
+from vrm_model import VRMError, read_vrm
+
+CACHE_PATH = Path(__file__).with_name("vrm_cache.db")
+LIBRARY_PATH = Path(__file__).with_name("vrm_library.db")
+
 
 # Simulated VRM data (in reality, this would be parsed from the .vrm file)
 SAMPLE_VRM_DATA = {
@@ -28,6 +44,8 @@ SAMPLE_VRM_DATA = {
     "violent_usage": "Disallow",
     "sexual_usage": "Disallow",
     "commercial_usage": "Allow",
+    "redistribution": "Disallow",
+    "modification": "Unknown",
     "license_type": "Redistribution_Prohibited",
     "blendshapes": [
         "Neutral",
@@ -70,15 +88,49 @@ def print_header():
     print()
 
 
-def parse_real_vrm(vrm_path):
+def read_glb(vrm_path, cache=None):
+    """Open a VRM file and read its model (through the cache if given)"""
+    # VRM files are glTF binary format. Only the chunk headers and the
+    # JSON chunk are read; the BIN chunk (meshes, textures) is left alone
+    try:
+        glb = GLBFile(vrm_path)
+    except GLBError as e:
+        print(f"⚠️  Not a valid glTF/VRM file ({e})")
+        print(f"   Using sample data instead.")
+        print()
+        return None
+
+    with glb:
+        print(f"   glTF version: {glb.version}")
+        print(f"   File size: {glb.length} bytes")
+        print(
+            "   Chunks: "
+            + ", ".join(
+                f"{chunk.name} {chunk.length / 1024:.1f} KB" for chunk in glb.chunks
+            )
+        )
+
+        # VRM 0.x or 1.0; only the VRM extension and the nodes are decoded
+        try:
+            return cache.read(glb) if cache is not None else read_vrm(glb)
+        except VRMError:
+            print(f"⚠️  No VRM extension found in file")
+            print(f"   Using sample data instead.")
+            print()
+            return None
+
+
+def parse_real_vrm(vrm_path, cache=None):
     """
     Try to parse a real VRM file
 
-    VRM files are glTF 2.0 files with VRM extensions, stored as .glb (binary glTF)
-    They are essentially ZIP archives containing:
-    - JSON scene data
+    VRM files are glTF 2.0 files with VRM extensions, stored as .glb (binary glTF):
+    a header followed by chunks containing
+    - JSON scene data and VRM-specific metadata
+      (extensions.VRM in VRM 0.x, extensions.VRMC_vrm in VRM 1.0)
     - Binary buffers (geometry, textures)
-    - VRM-specific metadata
+
+    With a VRMCache, files seen before are read from the cache instead.
     """
     try:
         vrm_file = Path(vrm_path)
@@ -93,77 +145,30 @@ def parse_real_vrm(vrm_path):
             f"📂 Found VRM file: {vrm_file.name} ({vrm_file.stat().st_size / 1024:.1f} KB)"
         )
 
-        # VRM files are glTF binary format
-        # We'll do a simple extraction of the JSON data
-        with open(vrm_path, "rb") as f:
-            # Read glTF header (12 bytes)
-            magic = f.read(4)
-            if magic != b"glTF":
-                print(f"⚠️  Not a valid glTF/VRM file (invalid magic header)")
-                print(f"   Using sample data instead.")
-                print()
-                return None
-
-            version = int.from_bytes(f.read(4), "little")
-            length = int.from_bytes(f.read(4), "little")
-
-            print(f"   glTF version: {version}")
-            print(f"   File size: {length} bytes")
-
-            # Read JSON chunk (next 8 bytes = chunk header)
-            chunk_length = int.from_bytes(f.read(4), "little")
-            chunk_type = f.read(4)
-
-            if chunk_type != b"JSON":
-                print(f"⚠️  Expected JSON chunk, got {chunk_type}")
+        # Unchanged since the last run: no need to open the file at all
+        start = time.perf_counter()
+        model = cache.get(vrm_path) if cache is not None else None
+        if model is not None:
+            print(
+                f"⚡ Loaded metadata from cache in "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+        else:
+            model = read_glb(vrm_path, cache)
+            if model is None:
                 return None
 
-            # Read JSON data
-            json_data = f.read(chunk_length).decode("utf-8")
-            gltf_data = json.loads(json_data)
-
-            # Extract VRM metadata
-            vrm_extension = gltf_data.get("extensions", {}).get("VRM", {})
-
-            if not vrm_extension:
-                print(f"⚠️  No VRM extension found in file")
-                print(f"   Using sample data instead.")
-                print()
-                return None
+        print(f"   VRM version: {model.spec_version}")
+        vrm_data = model.to_dict()
+        if not vrm_data["blendshapes"]:
+            vrm_data["blendshapes"] = SAMPLE_VRM_DATA["blendshapes"]
+        if not model.skeleton.bone_names:
+            vrm_data["bones"] = SAMPLE_VRM_DATA["bones"]
+            vrm_data["skeleton"] = None
 
-            # Extract metadata
-            meta = vrm_extension.get("meta", {})
-            blendshape_master = vrm_extension.get("blendShapeMaster", {})
-
-            # Get blendshape names
-            blendshapes = []
-            for group in blendshape_master.get("blendShapeGroups", []):
-                blendshapes.append(group.get("name", "Unknown"))
-
-            # Build VRM data structure
-            vrm_data = {
-                "name": meta.get("title", "Unknown"),
-                "version": meta.get("version", "0.0"),
-                "author": meta.get("author", "Unknown"),
-                "contact_information": meta.get("contactInformation", ""),
-                "reference": meta.get("reference", ""),
-                "title": meta.get("title", "Unknown"),
-                "allowed_user_name": meta.get("allowedUserName", "Unknown"),
-                "violent_usage": meta.get("violentUssageName", "Unknown"),
-                "sexual_usage": meta.get("sexualUssageName", "Unknown"),
-                "commercial_usage": meta.get("commercialUssageName", "Unknown"),
-                "license_type": meta.get("licenseName", "Unknown"),
-                "blendshapes": (
-                    blendshapes if blendshapes else SAMPLE_VRM_DATA["blendshapes"]
-                ),
-                "bones": SAMPLE_VRM_DATA[
-                    "bones"
-                ],  # Would need to parse nodes for real bone data
-            }
-
-            print(f"✅ Successfully parsed VRM metadata!")
-            print()
-            return vrm_data
+        print(f"✅ Successfully parsed VRM metadata!")
+        print()
+        return vrm_data
 
     except Exception as e:
         print(f"⚠️  Error parsing VRM file: {e}")
@@ -172,6 +177,15 @@ def parse_real_vrm(vrm_path):
         return None
 
 
+def open_cache():
+    """The metadata cache next to this script, or None if it can't be opened"""
+    try:
+        return VRMCache(CACHE_PATH)
+    except sqlite3.Error as e:
+        print(f"⚠️  Metadata cache unavailable ({e})")
+        return None
+
+
 def load_vrm_info(vrm_path):
     """
     Extract VRM metadata (hybrid approach)
@@ -182,8 +196,13 @@ def load_vrm_info(vrm_path):
     print(f"📦 Loading VRM from: {vrm_path}")
     print()
 
-    # Try to parse real VRM file
-    vrm_data = parse_real_vrm(vrm_path)
+    # Try to parse real VRM file (or read it from the metadata cache)
+    cache = open_cache()
+    try:
+        vrm_data = parse_real_vrm(vrm_path, cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
     # Fall back to sample data if parsing failed
     if vrm_data is None:
@@ -205,6 +224,7 @@ def display_model_info(vrm_data):
     print("━" * 60)
     print(f"  Name:    {vrm_data['name']}")
     print(f"  Version: {vrm_data['version']}")
+    print(f"  VRM:     {vrm_data.get('spec_version', '0.0')}")
     print(f"  Author:  {vrm_data['author']}")
     print(f"  Title:   {vrm_data['title']}")
     print()
@@ -224,6 +244,14 @@ def display_blendshapes(vrm_data):
             "Fun": "😆",
             "Blink": "😑",
             "Neutral": "😐",
+            # VRM 1.0 preset names
+            "happy": "😊",
+            "angry": "😠",
+            "sad": "😢",
+            "relaxed": "😌",
+            "surprised": "😮",
+            "blink": "😑",
+            "neutral": "😐",
         }.get(blendshape, "🎭")
 
         print(f"  {i}. {emoji} {blendshape}")
@@ -238,6 +266,8 @@ def display_license_info(vrm_data):
     print(f"  Commercial Use:  {vrm_data['commercial_usage']}")
     print(f"  Violent Content: {vrm_data['violent_usage']}")
     print(f"  Sexual Content:  {vrm_data['sexual_usage']}")
+    print(f"  Redistribution:  {vrm_data['redistribution']}")
+    print(f"  Modification:    {vrm_data['modification']}")
     print(f"  License Type:    {vrm_data['license_type']}")
     print()
 
@@ -250,9 +280,25 @@ def display_technical_info(vrm_data):
     print(f"  Bones:        {len(vrm_data['bones'])} bones")
     print()
 
+    skeleton = vrm_data.get("skeleton")
+    if skeleton is not None:
+        print(f"  Nodes:        {len(skeleton)} nodes")
+        head = skeleton.world_position("head")
+        if head is not None:
+            print(f"  Head height:  {head[1]:.2f} m")
+        print()
+
     print("  Bone Hierarchy Sample:")
     for bone in vrm_data["bones"][:10]:
-        print(f"    - {bone}")
+        if skeleton is None:
+            print(f"    - {bone}")
+            continue
+        parent = skeleton.bone_parent(bone)
+        line = f"    - {bone}" + (f" (child of {parent})" if parent else "")
+        position = skeleton.world_position(bone)
+        if position is not None:
+            line += f" at ({position[0]:.2f}, {position[1]:.2f}, {position[2]:.2f})"
+        print(line)
     if len(vrm_data["bones"]) > 10:
         print(f"    ... and {len(vrm_data['bones']) - 10} more")
     print()
@@ -283,8 +329,100 @@ def simulate_expression_change():
     print()
 
 
+def scan_main(argv):
+    """Index folders of avatars (python load_vrm.py scan DIR [DIR ...])"""
+    parser = argparse.ArgumentParser(
+        prog="load_vrm.py scan", description="Index folders of VRM avatars"
+    )
+    parser.add_argument("folders", nargs="+", help="folders to scan (recursively)")
+    parser.add_argument("--index", default=str(LIBRARY_PATH), help="index database")
+    parser.add_argument(
+        "--workers", type=int, help="worker processes (default: CPU count)"
+    )
+    args = parser.parse_args(argv)
+
+    print(f"🔍 Scanning {', '.join(args.folders)}")
+
+    def progress(done, total, failed):
+        if done % 100 == 0 or done == total:
+            print(
+                f"   {done}/{total} files parsed, {failed} failed", end="\r", flush=True
+            )
+
+    library = VRMLibrary(args.index)
+    try:
+        stats = library.scan(args.folders, workers=args.workers, progress=progress)
+        failures = library.failures()
+    finally:
+        library.close()
+
+    parsed = stats["indexed"] + stats["failed"]
+    if parsed:
+        print()
+    print(
+        f"✅ {stats['files']} VRM files: {stats['indexed']} indexed, "
+        f"{stats['unchanged']} unchanged, {stats['removed']} removed, "
+        f"{stats['failed']} failed"
+    )
+    if parsed:
+        print(
+            f"📊 {stats['parsed_mb']:.1f} MB in {stats['seconds']:.2f}s "
+            f"({stats['files_per_second']:.1f} files/s, "
+            f"{stats['mb_per_second']:.1f} MB/s; walk {stats['walk_seconds']:.2f}s)"
+        )
+    for path, error in failures[:5]:
+        print(f"⚠️  {path}: {error}")
+    print(f"💾 Index: {args.index}")
+
+
+def search_main(argv):
+    """Search the index (python load_vrm.py search [WORDS] [--commercial])"""
+    parser = argparse.ArgumentParser(
+        prog="load_vrm.py search", description="Search indexed VRM avatars"
+    )
+    parser.add_argument("words", nargs="*", help="name, author or expression")
+    parser.add_argument("--index", default=str(LIBRARY_PATH), help="index database")
+    parser.add_argument("--limit", type=int, default=50)
+    for flag in FLAG_COLUMNS:
+        parser.add_argument(
+            f"--{flag}",
+            action=argparse.BooleanOptionalAction,
+            help=f"only avatars that allow (--{flag}) or disallow (--no-{flag}) it",
+        )
+    args = parser.parse_args(argv)
+
+    library = VRMLibrary(args.index)
+    try:
+        rows = library.search(
+            " ".join(args.words),
+            limit=args.limit,
+            **{flag: getattr(args, flag) for flag in FLAG_COLUMNS},
+        )
+    finally:
+        library.close()
+
+    if not rows:
+        print("🔍 No matching avatars")
+        return
+
+    for row in rows:
+        allowed = [flag for flag in FLAG_COLUMNS if row[flag]]
+        print(f"🎭 {row['name']} by {row['author']} (VRM {row['spec_version']})")
+        print(f"   {row['path']} ({row['size'] / 1024**2:.1f} MB)")
+        print(
+            f"   {row['license_name']} • allows: {', '.join(allowed) or 'none'} • "
+            f"{row['bone_count']} bones • "
+            f"{len(json.loads(row['expressions'] or '[]'))} expressions"
+        )
+
+
 def main():
     """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] == "scan":
+        return scan_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        return search_main(sys.argv[2:])
+
     print_header()
 
     # Get VRM path from command line or use default
@@ -334,6 +472,8 @@ def main():
     print("  Usage:")
     print("    python load_vrm.py                    # Interactive menu")
     print("    python load_vrm.py path/to/model.vrm  # Direct load")
+    print("    python load_vrm.py scan path/to/folder # Index many avatars")
+    print("    python load_vrm.py search blink       # Search the index")
     print()
     print("  The full Workly Desktop uses Unity + UniVRM for:")
     print("    - Real-time 3D rendering")
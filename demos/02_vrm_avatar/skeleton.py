@@ -0,0 +1,209 @@
+"""
+Avatar Skeleton - Workly Public Edition
+
+The node hierarchy of a VRM avatar, with its humanoid bones.
+glTF stores a tree of nodes, each with a local transform (translation /
+rotation / scale or a 4x4 matrix) and a list of children; VRM maps
+humanoid bone names ("hips", "leftUpperArm", ...) to node indices.
+
+Everything is kept in flat arrays indexed by node: a parent index per
+node and (N, 4, 4) stacks of local and world matrices. World transforms
+are computed level by level with batched matrix products (one product
+per tree depth), so hundreds of nodes take well under a millisecond.
+
+Usage:
+    skeleton = Skeleton.from_gltf(gltf, {"hips": 3, "head": 7, ...})
+    skeleton.bone_names            # humanoid bones, parents first
+    skeleton.world_position("head")
+
+Requirements:
+    - NumPy (optional): transforms; without it only names and the
+      hierarchy are available (local and world are None)
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+IDENTITY_TRANSLATION = (0.0, 0.0, 0.0)
+IDENTITY_ROTATION = (0.0, 0.0, 0.0, 1.0)
+IDENTITY_SCALE = (1.0, 1.0, 1.0)
+
+
+def _local_matrices(nodes):
+    """(N, 4, 4) local transforms from glTF TRS properties or matrices"""
+    count = len(nodes)
+
+    # One flat list converts much faster than a list of lists
+    flat = []
+    for node in nodes:
+        flat += node.get("translation", IDENTITY_TRANSLATION)
+        flat += node.get("rotation", IDENTITY_ROTATION)
+        flat += node.get("scale", IDENTITY_SCALE)
+    trs = np.array(flat, dtype=float).reshape(count, 10)
+    translation, rotation, scale = trs[:, :3], trs[:, 3:7], trs[:, 7:]
+
+    # Unit quaternions (x, y, z, w) to rotation matrices, all at once
+    x, y, z, w = rotation.T
+    local = np.zeros((count, 4, 4))
+    local[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    local[:, 0, 1] = 2 * (x * y - z * w)
+    local[:, 0, 2] = 2 * (x * z + y * w)
+    local[:, 1, 0] = 2 * (x * y + z * w)
+    local[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    local[:, 1, 2] = 2 * (y * z - x * w)
+    local[:, 2, 0] = 2 * (x * z - y * w)
+    local[:, 2, 1] = 2 * (y * z + x * w)
+    local[:, 2, 2] = 1 - 2 * (x * x + y * y)
+
+    # M = T * R * S: scale the rotation's columns, then translate
+    local[:, :3, :3] *= scale[:, None, :]
+    local[:, :3, 3] = translation
+    local[:, 3, 3] = 1.0
+
+    matrices = [i for i, node in enumerate(nodes) if "matrix" in node]
+    if matrices:
+        # glTF matrices are column-major
+        local[matrices] = (
+            np.array([nodes[i]["matrix"] for i in matrices], dtype=float)
+            .reshape(-1, 4, 4)
+            .transpose(0, 2, 1)
+        )
+    return local
+
+
+class Skeleton:
+    """Array-backed node hierarchy with humanoid bone lookup"""
+
+    __slots__ = (
+        "names",
+        "parents",
+        "depths",
+        "local",
+        "world",
+        "bone_names",
+        "bone_nodes",
+        "_bone_index",
+    )
+
+    def __init__(self, names, parents, depths, local, world, bone_names, bone_nodes):
+        self.names = names
+        self.parents = parents
+        self.depths = depths
+        self.local = local
+        self.world = world
+        self.bone_names = bone_names
+        self.bone_nodes = bone_nodes
+        self._bone_index = {name: i for i, name in enumerate(bone_names)}
+
+    @classmethod
+    def from_gltf(cls, gltf, human_bones):
+        """
+        Build from the glTF JSON and a humanoid bone name -> node mapping
+
+        Bones pointing at missing nodes are skipped. Humanoid bones are
+        ordered parents first (by depth, then node index).
+        """
+        nodes = gltf.get("nodes", [])
+        count = len(nodes)
+        names = [node.get("name") or f"node{i}" for i, node in enumerate(nodes)]
+
+        parents = [-1] * count
+        for i, node in enumerate(nodes):
+            for child in node.get("children", ()):
+                if 0 <= child < count:
+                    parents[child] = i
+
+        # Nodes grouped by depth, roots first, following the children lists
+        levels = [[i for i, parent in enumerate(parents) if parent == -1]]
+        while len(levels) <= count:
+            level = [
+                child
+                for i in levels[-1]
+                for child in nodes[i].get("children", ())
+                if 0 <= child < count and parents[child] == i
+            ]
+            if not level:
+                break
+            levels.append(level)
+
+        depths = array("i", [0]) * count
+        for depth, level in enumerate(levels):
+            for i in level:
+                depths[i] = depth
+
+        local = world = None
+        if np is not None:
+            parents = np.array(parents, dtype=np.int32)
+            depths = np.frombuffer(depths, dtype=np.int32)
+            if count:
+                local = _local_matrices(nodes)
+                world = cls._world_matrices(parents, levels, local)
+        else:
+            parents = array("i", parents)
+
+        bone_names, bone_nodes = cls._order_bones(human_bones, depths, count)
+        return cls(names, parents, depths, local, world, bone_names, bone_nodes)
+
+    @classmethod
+    def from_arrays(cls, names, parents, depths, local, world, human_bones):
+        """Rebuild from saved arrays, as produced by from_gltf"""
+        bone_names, bone_nodes = cls._order_bones(human_bones, depths, len(names))
+        return cls(names, parents, depths, local, world, bone_names, bone_nodes)
+
+    @staticmethod
+    def _order_bones(human_bones, depths, count):
+        """Humanoid bone names and nodes, parents first"""
+        bones = sorted(
+            (depths[node], node, name)
+            for name, node in human_bones.items()
+            if isinstance(node, int) and 0 <= node < count
+        )
+        bone_names = tuple(name for _, _, name in bones)
+        bone_nodes = array("i", (node for _, node, _ in bones))
+        return bone_names, bone_nodes
+
+    @staticmethod
+    def _world_matrices(parents, levels, local):
+        """World = parent's world x local, one batched product per depth"""
+        world = local.copy()
+
+        # Roots keep their local transform
+        for level in levels[1:]:
+            world[level] = world[parents[level]] @ local[level]
+        return world
+
+    def __len__(self):
+        return len(self.names)
+
+    def node(self, bone):
+        """Node index of a humanoid bone, or None"""
+        i = self._bone_index.get(bone)
+        return None if i is None else self.bone_nodes[i]
+
+    def bone_parent(self, bone):
+        """Closest ancestor that is also a humanoid bone, or None"""
+        node = self.node(bone)
+        if node is None:
+            return None
+        humanoid = {n: name for name, n in zip(self.bone_names, self.bone_nodes)}
+        node = self.parents[node]
+        while node >= 0:
+            if node in humanoid:
+                return humanoid[node]
+            node = self.parents[node]
+        return None
+
+    def world_position(self, bone):
+        """World-space position of a humanoid bone (None without NumPy)"""
+        node = self.node(bone)
+        if node is None or self.world is None:
+            return None
+        return self.world[node, :3, 3]
@@ -0,0 +1,299 @@
+"""
+VRM Cache - Workly Public Edition
+
+Remembers parsed avatars so they don't have to be read again.
+Parsing an avatar means reading its JSON chunk (up to several MB for
+detailed models) and building the skeleton; a library of hundreds of
+avatars takes seconds to list that way. With the cache, an unchanged file
+costs a stat call and one small SQLite read.
+
+Two keys find an entry:
+    - (path, size, mtime): an unchanged file is found without opening it
+    - a hash of the JSON chunk: a copied, moved or touched file whose
+      metadata didn't change is found after reading only that chunk
+
+Everything the demo shows comes from the JSON chunk, so entries are
+content-addressed by its hash. Each entry is a compact binary record
+(normalized metadata, expressions and skeleton arrays, zlib-compressed).
+The least recently used entries are deleted when the cache grows past
+its size limit.
+
+Usage:
+    cache = VRMCache("vrm_cache.db", max_mb=64)
+    model = cache.load("avatar.vrm")   # VRMModel, parsed only on a miss
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+from glb_reader import GLBFile
+from skeleton import Skeleton
+from vrm_model import VRMMeta, VRMModel, parse_vrm
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bump when the record layout or what the parser extracts changes
+FORMAT_VERSION = 2
+RECORD_MAGIC = b"WVRM"
+
+# last_used is only written back when older than this, so hits stay reads
+TOUCH_INTERVAL = 3600
+
+
+def json_digest(json_bytes):
+    """Content key of an avatar: hash of its JSON chunk"""
+    return hashlib.blake2b(json_bytes, digest_size=16).hexdigest()
+
+
+def _int32_bytes(values):
+    if np is not None:
+        return np.asarray(values, dtype="<i4").tobytes()
+    return array("i", values).tobytes()
+
+
+def encode_model(model):
+    """
+    VRMModel -> bytes
+
+    A small JSON header (meta, expressions, bones, node names) followed by
+    the raw skeleton arrays: parents and depths (int32), then local and
+    world matrices (float64), so decoding is a few frombuffer calls.
+    """
+    skeleton = model.skeleton
+    header = {
+        "spec_version": model.spec_version,
+        "meta": model.meta.to_dict(),
+        "expressions": model.expressions,
+        "human_bones": model.human_bones,
+        "names": skeleton.names if skeleton is not None else None,
+        "transforms": skeleton is not None and skeleton.local is not None,
+    }
+    header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    parts = [RECORD_MAGIC, struct.pack("<II", FORMAT_VERSION, len(header)), header]
+    if skeleton is not None:
+        parts.append(_int32_bytes(skeleton.parents))
+        parts.append(_int32_bytes(skeleton.depths))
+        if skeleton.local is not None:
+            parts.append(np.ascontiguousarray(skeleton.local, dtype="<f8").tobytes())
+            parts.append(np.ascontiguousarray(skeleton.world, dtype="<f8").tobytes())
+    return zlib.compress(b"".join(parts))
+
+
+def decode_model(data):
+    """bytes -> VRMModel, or None if the record is from another format"""
+    data = zlib.decompress(data)
+    if data[:4] != RECORD_MAGIC:
+        return None
+    version, header_length = struct.unpack_from("<II", data, 4)
+    if version != FORMAT_VERSION:
+        return None
+
+    offset = 12 + header_length
+    header = json.loads(data[12:offset])
+    model = VRMModel(
+        header["spec_version"],
+        VRMMeta.from_dict(header["meta"]),
+        header["expressions"],
+        header["human_bones"],
+    )
+
+    names = header["names"]
+    if names is None:
+        return model
+
+    count = len(names)
+    if header["transforms"] != (np is not None):
+        # Saved with(out) NumPy, read without (with) it: parse again
+        return None
+
+    if np is not None:
+        parents = np.frombuffer(data, dtype="<i4", count=count, offset=offset)
+        depths = np.frombuffer(
+            data, dtype="<i4", count=count, offset=offset + 4 * count
+        )
+        local = world = None
+        if header["transforms"]:
+            matrices = np.frombuffer(
+                data, dtype="<f8", count=count * 32, offset=offset + 8 * count
+            ).reshape(2, count, 4, 4)
+            local, world = matrices
+    else:
+        parents = array("i", data[offset : offset + 4 * count])
+        depths = array("i", data[offset + 4 * count : offset + 8 * count])
+        local = world = None
+
+    model.skeleton = Skeleton.from_arrays(
+        names, parents, depths, local, world, model.human_bones
+    )
+    return model
+
+
+class VRMCache:
+    """SQLite cache of parsed avatars, keyed by file stat and content hash"""
+
+    def __init__(self, db_path="vrm_cache.db", max_mb=64):
+        """Entries are deleted least recently used first past max_mb"""
+        self.db_path = db_path
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+        self.stat_hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS models (
+                digest TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_models_last_used ON models(last_used);
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _stat_key(path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, path):
+        """Cached model of an unchanged file (stat only, no file read), or None"""
+        path, size, mtime_ns = self._stat_key(path)
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT models.digest, models.data, models.last_used
+                FROM files JOIN models ON files.digest = models.digest
+                WHERE files.path = ? AND files.size = ? AND files.mtime_ns = ?
+                """,
+                (path, size, mtime_ns),
+            ).fetchone()
+            if row is None:
+                return None
+
+            model = decode_model(row[1])
+            if model is None:
+                return None
+            self._touch(row[0], row[2])
+            self.stat_hits += 1
+            return model
+
+    def read(self, glb):
+        """
+        Model of an open GLBFile: found by content hash, or parsed and stored
+
+        Also records the file's stat key, so the next get() is a hit.
+        """
+        json_bytes = glb.json_bytes()
+        digest = json_digest(json_bytes)
+        key = self._stat_key(glb.path)
+
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data, last_used FROM models WHERE digest = ?", (digest,)
+            ).fetchone()
+            model = decode_model(row[0]) if row else None
+            if model is not None:
+                self._touch(digest, row[1])
+                self._remember_file(key, digest)
+                self.hash_hits += 1
+                return model
+
+        model = parse_vrm(json_bytes)
+        data = encode_model(model)
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)",
+                (digest, data, len(data), time.time()),
+            )
+            self._remember_file(key, digest)
+            self._evict()
+            self.misses += 1
+        return model
+
+    def load(self, path):
+        """Model of a .vrm file, from the cache or parsed (and cached)"""
+        model = self.get(path)
+        if model is None:
+            with GLBFile(path) as glb:
+                model = self.read(glb)
+        return model
+
+    def _touch(self, digest, last_used):
+        now = time.time()
+        if now - last_used > TOUCH_INTERVAL:
+            self.conn.execute(
+                "UPDATE models SET last_used = ? WHERE digest = ?", (now, digest)
+            )
+            self.conn.commit()
+
+    def _remember_file(self, key, digest):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", key + (digest,)
+        )
+        self.conn.commit()
+
+    def _evict(self):
+        """Delete least recently used models past the size limit"""
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM models"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            self.conn.commit()
+            return
+
+        for digest, size in self.conn.execute(
+            "SELECT digest, bytes FROM models ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM models WHERE digest = ?", (digest,))
+            total -= size
+
+        self.conn.execute(
+            "DELETE FROM files WHERE digest NOT IN (SELECT digest FROM models)"
+        )
+        self.conn.commit()
+
+    def get_stats(self):
+        """Hit/miss counters and the cache's size"""
+        with self._lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM models"
+            ).fetchone()
+        return {
+            "stat_hits": self.stat_hits,
+            "hash_hits": self.hash_hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_mb": round(size / 1024**2, 2),
+        }
+
+    def close(self):
+        self.conn.close()
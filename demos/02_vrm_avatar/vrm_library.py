@@ -0,0 +1,355 @@
+"""
+VRM Library - Workly Public Edition
+
+Indexes folders of VRM avatars into a searchable SQLite database.
+Each avatar's name, author, license flags, expressions, bone count and
+file size are stored, so a library of hundreds of avatars can be searched
+("who made this?", "which ones allow commercial use?") without opening
+any file.
+
+Scanning walks the folders, compares each file's size and modification
+time with the index and parses only new or changed files, spread over a
+pool of processes. Files that disappeared are removed from the index.
+Only the JSON chunk of each file is read.
+
+Usage:
+    library = VRMLibrary("vrm_library.db")
+    stats = library.scan(["~/Avatars"])       # incremental
+    library.search("blink", commercial=True)  # name, author or expression
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import concurrent.futures
+import json
+import os
+import re
+import sqlite3
+import time
+
+from glb_reader import GLBFile
+from vrm_model import parse_vrm
+
+VRM_EXTENSIONS = (".vrm",)
+
+# Below this many files a process pool costs more than it saves
+MIN_PARALLEL_FILES = 16
+
+# Bump when what is stored per avatar changes; older indexes are emptied
+# and rebuilt by the next scan
+INDEX_VERSION = 2
+
+# Columns that search() can filter on with True/False
+FLAG_COLUMNS = ("commercial", "violent", "sexual", "redistribution")
+
+
+def index_file(path):
+    """
+    Index row of one avatar (runs in a worker process)
+
+    Returns (path, size, mtime_ns, fields, error); fields is None if the
+    file couldn't be parsed, and size is None if it no longer exists.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError as e:
+        # Deleted or renamed since the folder walk
+        return path, None, None, None, str(e)
+    except OSError as e:
+        # Stored as failed with an impossible stat, so the next scan retries
+        return path, 0, 0, None, str(e) or type(e).__name__
+
+    try:
+        with GLBFile(path) as glb:
+            model = parse_vrm(glb.json_bytes(), skeleton=False)
+    except Exception as e:
+        return path, stat.st_size, stat.st_mtime_ns, None, str(e) or type(e).__name__
+
+    meta = model.meta
+    fields = {
+        "spec_version": model.spec_version,
+        "name": meta.name,
+        "author": meta.author,
+        "license_name": meta.license_name,
+        "allowed_users": meta.allowed_users,
+        "commercial": meta.commercial_usage,
+        "violent": meta.violent_usage,
+        "sexual": meta.sexual_usage,
+        "redistribution": meta.redistribution,
+        "modification": meta.modification,
+        # A JSON array: custom expression names can contain spaces
+        "expressions": json.dumps(model.expressions, ensure_ascii=False),
+        "bone_count": len(model.human_bones),
+    }
+    return path, stat.st_size, stat.st_mtime_ns, fields, None
+
+
+def find_vrm_files(roots):
+    """(path, size, mtime_ns) of every VRM file under the roots"""
+    stack = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(VRM_EXTENSIONS):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime_ns
+            except OSError:
+                continue
+
+
+class VRMLibrary:
+    """SQLite index of VRM avatars with incremental scanning and search"""
+
+    FIELDS = (
+        "spec_version",
+        "name",
+        "author",
+        "license_name",
+        "allowed_users",
+        "commercial",
+        "violent",
+        "sexual",
+        "redistribution",
+        "modification",
+        "expressions",
+        "bone_count",
+    )
+
+    def __init__(self, db_path="vrm_library.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS avatars (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                spec_version TEXT,
+                name TEXT,
+                author TEXT,
+                license_name TEXT,
+                allowed_users TEXT,
+                commercial INTEGER,
+                violent INTEGER,
+                sexual INTEGER,
+                redistribution INTEGER,
+                modification TEXT,
+                expressions TEXT,
+                bone_count INTEGER,
+                error TEXT
+            );
+            """
+        )
+        self.has_fts = self._create_search_index()
+        self._check_version()
+        self.conn.commit()
+
+    def _check_version(self):
+        """Empty an index written by an older version, so it is rebuilt"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < INDEX_VERSION:
+            self.conn.execute("DELETE FROM avatars")
+            self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _create_search_index(self):
+        """FTS5 index over name, author and expressions (False without FTS5)"""
+        try:
+            self.conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS avatars_fts
+                USING fts5(name, author, expressions,
+                           content='avatars', content_rowid='id')
+            """
+            )
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            return False
+
+        self.conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS avatars_fts_insert
+            AFTER INSERT ON avatars BEGIN
+                INSERT INTO avatars_fts (rowid, name, author, expressions)
+                VALUES (new.id, new.name, new.author, new.expressions);
+            END;
+            CREATE TRIGGER IF NOT EXISTS avatars_fts_delete
+            AFTER DELETE ON avatars BEGIN
+                INSERT INTO avatars_fts (avatars_fts, rowid, name, author, expressions)
+                VALUES ('delete', old.id, old.name, old.author, old.expressions);
+            END;
+            CREATE TRIGGER IF NOT EXISTS avatars_fts_update
+            AFTER UPDATE ON avatars BEGIN
+                INSERT INTO avatars_fts (avatars_fts, rowid, name, author, expressions)
+                VALUES ('delete', old.id, old.name, old.author, old.expressions);
+                INSERT INTO avatars_fts (rowid, name, author, expressions)
+                VALUES (new.id, new.name, new.author, new.expressions);
+            END;
+            """
+        )
+        return True
+
+    def scan(self, roots, workers=None, progress=None):
+        """
+        Bring the index up to date with the VRM files under the roots
+
+        Only new and changed files (by size and modification time) are
+        parsed, in a pool of `workers` processes (CPU count by default).
+        progress(done, total, failed) is called as files are parsed.
+        Returns counts, sizes and timings of the scan: "indexed" and
+        "failed" split the parsed files, files that disappeared before
+        they were parsed count as "removed", and the throughput figures
+        cover every parsed file.
+        """
+        start = time.perf_counter()
+        roots = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+
+        known = {
+            row["path"]: (row["size"], row["mtime_ns"])
+            for row in self.conn.execute("SELECT path, size, mtime_ns FROM avatars")
+        }
+
+        seen = set()
+        changed = []
+        changed_bytes = 0
+        for path, size, mtime_ns in find_vrm_files(roots):
+            seen.add(path)
+            if known.get(path) != (size, mtime_ns):
+                changed.append(path)
+                changed_bytes += size
+
+        # Indexed files under these roots that are gone now
+        removed = [
+            path
+            for path in known
+            if path not in seen
+            and any(path == root or path.startswith(root + os.sep) for root in roots)
+        ]
+        walk_seconds = time.perf_counter() - start
+
+        indexed = failed = vanished = 0
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM avatars WHERE path = ?", ((path,) for path in removed)
+            )
+            for done, (path, size, mtime_ns, fields, error) in enumerate(
+                self._index_files(changed, workers), 1
+            ):
+                if size is None:
+                    vanished += 1
+                    self.conn.execute("DELETE FROM avatars WHERE path = ?", (path,))
+                else:
+                    indexed += error is None
+                    failed += error is not None
+                    self._save(path, size, mtime_ns, fields, error)
+                if progress:
+                    progress(done, len(changed), failed)
+
+        seconds = time.perf_counter() - start
+        parse_seconds = seconds - walk_seconds
+        return {
+            "files": len(seen) - vanished,
+            "indexed": indexed,
+            "unchanged": len(seen) - len(changed),
+            "removed": len(removed) + vanished,
+            "failed": failed,
+            "parsed_mb": changed_bytes / 1024**2,
+            "seconds": seconds,
+            "walk_seconds": walk_seconds,
+            "files_per_second": len(changed) / parse_seconds if changed else 0.0,
+            "mb_per_second": (
+                changed_bytes / 1024**2 / parse_seconds if changed else 0.0
+            ),
+        }
+
+    @staticmethod
+    def _index_files(paths, workers):
+        """Index rows of the paths, in a process pool when there are many"""
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(paths) < MIN_PARALLEL_FILES:
+            yield from map(index_file, paths)
+            return
+
+        # Several files per task keeps the pickling overhead small
+        chunksize = max(1, len(paths) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            yield from pool.map(index_file, paths, chunksize=chunksize)
+
+    def _save(self, path, size, mtime_ns, fields, error):
+        """Insert or replace an avatar's row (failed files are kept too)"""
+        fields = fields or {}
+        values = [fields.get(name) for name in self.FIELDS]
+        columns = ", ".join(self.FIELDS)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in self.FIELDS)
+        self.conn.execute(
+            f"""
+            INSERT INTO avatars (path, size, mtime_ns, {columns}, error)
+            VALUES (?, ?, ?, {", ".join("?" * len(self.FIELDS))}, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns,
+                {updates}, error = excluded.error
+            """,
+            [path, size, mtime_ns, *values, error],
+        )
+
+    @staticmethod
+    def _fts_query(text):
+        """Turn user input into an FTS5 query matching all words as prefixes"""
+        words = re.findall(r"\w+", text)
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, text=None, limit=50, **flags):
+        """
+        Avatars matching words in their name, author or expressions
+
+        Flags filter on license booleans, e.g. commercial=True or
+        redistribution=False. Files that failed to parse are left out.
+        """
+        conditions = ["error IS NULL"]
+        params = []
+
+        query = self._fts_query(text) if text else ""
+        if query and self.has_fts:
+            conditions.append(
+                "id IN (SELECT rowid FROM avatars_fts WHERE avatars_fts MATCH ?)"
+            )
+            params.append(query)
+        elif text:
+            for word in re.findall(r"\w+", text):
+                conditions.append(
+                    "(name LIKE ? OR author LIKE ? OR expressions LIKE ?)"
+                )
+                params += [f"%{word}%"] * 3
+
+        for flag, value in flags.items():
+            if flag not in FLAG_COLUMNS:
+                raise ValueError(f"Unknown flag: {flag}")
+            if value is not None:
+                conditions.append(f"{flag} = ?")
+                params.append(int(bool(value)))
+
+        return self.conn.execute(
+            f"""
+            SELECT * FROM avatars WHERE {" AND ".join(conditions)}
+            ORDER BY name COLLATE NOCASE LIMIT ?
+            """,
+            params + [limit],
+        ).fetchall()
+
+    def failures(self):
+        """Files that couldn't be parsed, with the reason"""
+        return self.conn.execute(
+            "SELECT path, error FROM avatars WHERE error IS NOT NULL ORDER BY path"
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,323 @@
+"""
+VRM Model - Workly Public Edition
+
+Reads VRM 0.x and VRM 1.0 avatars into one normalized model.
+The two versions store the same information differently:
+
+    VRM 0.x (extensions.VRM)          VRM 1.0 (extensions.VRMC_vrm)
+    meta.title / meta.author          meta.name / meta.authors[]
+    meta.violentUssageName "Allow"    meta.allowExcessivelyViolentUsage true
+    meta.commercialUssageName         meta.commercialUsage "corporation"
+    blendShapeMaster groups           expressions.preset / .custom
+    humanoid.humanBones [{bone,node}] humanoid.humanBones {bone: {node}}
+
+Only the parts of the glTF JSON that are needed are decoded: the VRM
+extension object and (for the skeleton) the nodes array are located in
+the JSON text and decoded on their own, skipping meshes, accessors and
+materials. If that fails the whole JSON is parsed as usual.
+
+Usage:
+    with GLBFile("avatar.vrm") as glb:
+        model = read_vrm(glb)
+    model.spec_version, model.meta.name, model.expressions, model.skeleton
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import json
+import re
+
+from skeleton import Skeleton
+
+# Key followed by the start of its value; checked after decoding
+EXTENSION_PATTERN = re.compile(r'"(VRMC_vrm|VRM)"\s*:\s*(?=\{)')
+NODES_PATTERN = re.compile(r'"nodes"\s*:\s*(?=\[)')
+
+VRM1_LICENSE_URL = "https://vrm.dev/licenses/1.0"
+
+# VRM 0.x licenseName values that allow sharing the file. Every Creative
+# Commons license does (with attribution, non-commercial or no-derivatives
+# terms); "Other" points to custom terms, so it isn't assumed to.
+VRM0_REDISTRIBUTABLE_LICENSES = {
+    "CC0",
+    "CC_BY",
+    "CC_BY_SA",
+    "CC_BY_NC",
+    "CC_BY_NC_SA",
+    "CC_BY_ND",
+    "CC_BY_NC_ND",
+}
+
+
+class VRMError(ValueError):
+    """Raised when a glTF file has no VRM extension"""
+
+
+class VRMMeta:
+    """Avatar information and usage permissions, normalized across versions"""
+
+    __slots__ = (
+        "name",
+        "version",
+        "authors",
+        "contact_information",
+        "references",
+        "allowed_users",
+        "violent_usage",
+        "sexual_usage",
+        "commercial_usage",
+        "redistribution",
+        "modification",
+        "license_name",
+        "license_url",
+    )
+
+    def __init__(
+        self,
+        name="Unknown",
+        version="",
+        authors=(),
+        contact_information="",
+        references=(),
+        allowed_users="Unknown",
+        violent_usage=False,
+        sexual_usage=False,
+        commercial_usage=False,
+        redistribution=False,
+        modification="Unknown",
+        license_name="Unknown",
+        license_url="",
+    ):
+        self.name = name
+        self.version = version
+        self.authors = tuple(authors)
+        self.contact_information = contact_information
+        self.references = tuple(references)
+        self.allowed_users = allowed_users
+        self.violent_usage = violent_usage
+        self.sexual_usage = sexual_usage
+        self.commercial_usage = commercial_usage
+        self.redistribution = redistribution
+        self.modification = modification
+        self.license_name = license_name
+        self.license_url = license_url
+
+    @property
+    def author(self):
+        return ", ".join(self.authors) or "Unknown"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class VRMModel:
+    """A VRM avatar: version, meta, expressions and humanoid skeleton"""
+
+    __slots__ = ("spec_version", "meta", "expressions", "human_bones", "skeleton")
+
+    def __init__(self, spec_version, meta, expressions, human_bones, skeleton=None):
+        self.spec_version = spec_version
+        self.meta = meta
+        self.expressions = tuple(expressions)
+        self.human_bones = human_bones
+        self.skeleton = skeleton
+
+    @property
+    def is_vrm1(self):
+        return self.spec_version.startswith("1")
+
+    def to_dict(self):
+        """Display data, in the shape load_vrm.py uses for sample data"""
+        meta = self.meta
+        allow = {True: "Allow", False: "Disallow"}
+        return {
+            "name": meta.name,
+            "version": meta.version,
+            "spec_version": self.spec_version,
+            "author": meta.author,
+            "contact_information": meta.contact_information,
+            "reference": ", ".join(meta.references),
+            "title": meta.name,
+            "allowed_user_name": meta.allowed_users,
+            "violent_usage": allow[meta.violent_usage],
+            "sexual_usage": allow[meta.sexual_usage],
+            "commercial_usage": allow[meta.commercial_usage],
+            "redistribution": allow[meta.redistribution],
+            "modification": meta.modification,
+            "license_type": meta.license_name,
+            "blendshapes": list(self.expressions),
+            "bones": (
+                list(self.skeleton.bone_names)
+                if self.skeleton is not None
+                else list(self.human_bones)
+            ),
+            "skeleton": self.skeleton,
+        }
+
+
+def _allowed(value):
+    """VRM 0.x "Allow"/"Disallow" strings to booleans"""
+    return str(value).lower() == "allow"
+
+
+def _extract_vrm0(extension):
+    """VRM 0.x: extensions.VRM"""
+    meta = extension.get("meta", {})
+    license_name = meta.get("licenseName", "Unknown")
+
+    vrm_meta = VRMMeta(
+        name=meta.get("title") or "Unknown",
+        version=meta.get("version", ""),
+        authors=[meta["author"]] if meta.get("author") else [],
+        contact_information=meta.get("contactInformation", ""),
+        references=[meta["reference"]] if meta.get("reference") else [],
+        allowed_users=meta.get("allowedUserName", "Unknown"),
+        # The 0.x schema really spells these "Ussage"
+        violent_usage=_allowed(meta.get("violentUssageName")),
+        sexual_usage=_allowed(meta.get("sexualUssageName")),
+        commercial_usage=_allowed(meta.get("commercialUssageName")),
+        redistribution=license_name in VRM0_REDISTRIBUTABLE_LICENSES,
+        modification="Unknown",
+        license_name=license_name,
+        license_url=meta.get("otherLicenseUrl", ""),
+    )
+
+    expressions = [
+        group.get("name", "Unknown")
+        for group in extension.get("blendShapeMaster", {}).get("blendShapeGroups", [])
+    ]
+    human_bones = {
+        bone["bone"]: bone["node"]
+        for bone in extension.get("humanoid", {}).get("humanBones", [])
+        if "bone" in bone and "node" in bone
+    }
+    return extension.get("specVersion", "0.0"), vrm_meta, expressions, human_bones
+
+
+def _extract_vrm1(extension):
+    """VRM 1.0: extensions.VRMC_vrm"""
+    meta = extension.get("meta", {})
+    license_url = meta.get("licenseUrl", "")
+
+    vrm_meta = VRMMeta(
+        name=meta.get("name") or "Unknown",
+        version=meta.get("version", ""),
+        authors=meta.get("authors", []),
+        contact_information=meta.get("contactInformation", ""),
+        references=meta.get("references", []),
+        allowed_users=meta.get("avatarPermission", "onlyAuthor"),
+        violent_usage=bool(meta.get("allowExcessivelyViolentUsage", False)),
+        sexual_usage=bool(meta.get("allowExcessivelySexualUsage", False)),
+        # personalNonProfit is the default and doesn't allow commercial use
+        commercial_usage=meta.get("commercialUsage", "personalNonProfit")
+        != "personalNonProfit",
+        redistribution=bool(meta.get("allowRedistribution", False)),
+        modification=meta.get("modification", "prohibited"),
+        license_name=(
+            "VRM Public License 1.0"
+            if license_url.rstrip("/") == VRM1_LICENSE_URL
+            else meta.get("otherLicenseUrl") or license_url or "Unknown"
+        ),
+        license_url=license_url,
+    )
+
+    expressions_data = extension.get("expressions", {})
+    expressions = list(expressions_data.get("preset", {})) + list(
+        expressions_data.get("custom", {})
+    )
+    human_bones = {
+        name: bone["node"]
+        for name, bone in extension.get("humanoid", {}).get("humanBones", {}).items()
+        if isinstance(bone, dict) and "node" in bone
+    }
+    return extension.get("specVersion", "1.0"), vrm_meta, expressions, human_bones
+
+
+# Extension name -> extractor, newest first
+EXTRACTORS = {
+    "VRMC_vrm": _extract_vrm1,
+    "VRM": _extract_vrm0,
+}
+
+
+def _decode_values(text, pattern, accept):
+    """Decode every value whose key matches pattern; return the first accepted"""
+    decoder = json.JSONDecoder()
+    for match in pattern.finditer(text):
+        try:
+            value, _ = decoder.raw_decode(text, match.end())
+        except json.JSONDecodeError:
+            continue
+        if accept(match, value):
+            return match, value
+    return None, None
+
+
+def find_vrm_extension(text):
+    """
+    (name, extension) of the VRM extension in glTF JSON text, or (None, None)
+
+    Only the extension object is decoded. A match must look like a VRM
+    extension (a dict with meta), so a "VRM" key elsewhere is skipped.
+    """
+    found = {}
+
+    def accept(match, value):
+        if isinstance(value, dict) and "meta" in value:
+            found.setdefault(match.group(1), value)
+        return False
+
+    _decode_values(text, EXTENSION_PATTERN, accept)
+    for name in EXTRACTORS:
+        if name in found:
+            return name, found[name]
+    return None, None
+
+
+def find_nodes(text):
+    """The top-level nodes array from glTF JSON text, or None"""
+    # scenes[].nodes holds indices; the node list holds objects
+    _, nodes = _decode_values(
+        text,
+        NODES_PATTERN,
+        lambda match, value: bool(value) and isinstance(value[0], dict),
+    )
+    return nodes
+
+
+def parse_vrm(json_bytes, skeleton=True):
+    """
+    Read a VRM 0.x or 1.0 avatar from the bytes of a GLB's JSON chunk
+
+    With skeleton=False the nodes aren't decoded and model.skeleton is
+    None. Raises VRMError if there is no VRM extension.
+    """
+    text = json_bytes.decode("utf-8")
+    name, extension = find_vrm_extension(text)
+    nodes = find_nodes(text) if skeleton and name else None
+
+    if name is None or (skeleton and nodes is None):
+        # Unusual layout: fall back to decoding everything
+        gltf = json.loads(text)
+        extensions = gltf.get("extensions", {})
+        name = next((key for key in EXTRACTORS if key in extensions), None)
+        if name is None:
+            raise VRMError("No VRM extension found in file")
+        extension = extensions[name]
+        nodes = gltf.get("nodes", [])
+
+    spec_version, meta, expressions, human_bones = EXTRACTORS[name](extension)
+    model = VRMModel(spec_version, meta, expressions, human_bones)
+    if skeleton:
+        model.skeleton = Skeleton.from_gltf({"nodes": nodes}, human_bones)
+    return model
+
+
+def read_vrm(glb, skeleton=True):
+    """Read a VRM 0.x or 1.0 avatar from a GLBFile (see parse_vrm)"""
+    return parse_vrm(glb.json_bytes(), skeleton)
@@ -0,0 +1,229 @@
+"""
+Inference Scheduler Benchmark - Workly Public Edition
+
+Simulates busy Discord traffic against the inference worker with a fake
+LLM, so no model or Discord connection is needed.
+
+One "noisy" guild floods the bot with questions while several quiet guilds
+ask one question each. With a single FIFO queue the quiet guilds wait
+behind the whole flood; with round-robin scheduling they are answered
+within a few generations. Also checks backpressure, per-user limits,
+duplicate dropping, queue positions and timeouts.
+
+Usage:
+    python benchmark_scheduler.py [--latency S] [--flood N] [--quiet-guilds N]
+
+Exits with status 1 if a check fails.
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from inference import DuplicateRequestError, InferenceBusyError, InferenceWorker
+
+
+class FakeLLM:
+    """Stands in for llama.cpp: each generation takes `latency` seconds"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, question, cancel):
+        """Sleep like a generation would, stopping early if cancelled"""
+        self.calls += 1
+        deadline = time.perf_counter() + self.latency
+        while time.perf_counter() < deadline:
+            if cancel.is_set():
+                return None
+            time.sleep(0.001)
+        return f"Answer to: {question}"
+
+
+def print_header(title):
+    """Print section header"""
+    print(f"\n{'=' * 60}")
+    print(f"  {title}")
+    print("=" * 60)
+
+
+def print_check(name, passed, details=""):
+    """Print a check result, return whether it passed"""
+    print(f"  {'✅' if passed else '❌'} {name}{f' — {details}' if details else ''}")
+    return passed
+
+
+async def run_traffic(llm, flood, quiet_guilds, fair):
+    """Flood from one guild, then one question per quiet guild; return waits"""
+    total = flood + quiet_guilds
+    worker = InferenceWorker(max_queue=total, timeout=60, max_per_user=total)
+    waits = {"noisy": [], "quiet": []}
+
+    async def ask(group, guild, user, question):
+        start = time.perf_counter()
+        # FIFO: everyone shares one queue key
+        key = (guild, user) if fair else None
+        await worker.submit(lambda cancel: llm.generate(question, cancel), key=key)
+        waits[group].append(time.perf_counter() - start)
+
+    tasks = [
+        asyncio.create_task(ask("noisy", "noisy", "spammer", f"question {i}"))
+        for i in range(flood)
+    ]
+    # Quiet guilds arrive just after the flood
+    await asyncio.sleep(0.001)
+    tasks += [
+        asyncio.create_task(ask("quiet", f"guild {g}", "user", "hello?"))
+        for g in range(quiet_guilds)
+    ]
+
+    await asyncio.gather(*tasks)
+    worker.shutdown()
+    return waits
+
+
+async def benchmark_fairness(args):
+    """Compare FIFO and round-robin waiting times"""
+    print_header(
+        f"Fairness: {args.flood} questions from one guild + "
+        f"{args.quiet_guilds} quiet guilds ({args.latency * 1000:.0f}ms/generation)"
+    )
+
+    results = {}
+    for label, fair in (("FIFO queue", False), ("Round-robin", True)):
+        waits = await run_traffic(
+            FakeLLM(args.latency), args.flood, args.quiet_guilds, fair
+        )
+        results[label] = waits
+        print(
+            f"  {label:<12} quiet guilds: avg {statistics.mean(waits['quiet']):.2f}s "
+            f"max {max(waits['quiet']):.2f}s • noisy guild: "
+            f"avg {statistics.mean(waits['noisy']):.2f}s"
+        )
+
+    fifo = max(results["FIFO queue"]["quiet"])
+    fair = max(results["Round-robin"]["quiet"])
+    # Round-robin: each quiet guild waits for at most one noisy job per turn
+    bound = (2 * args.quiet_guilds + 2) * args.latency
+    return print_check(
+        "Quiet guilds are not starved",
+        fair < fifo and fair <= bound * 1.5,
+        f"worst wait {fair:.2f}s vs {fifo:.2f}s FIFO",
+    )
+
+
+async def check_limits(args):
+    """Backpressure, per-user limit, duplicates, positions and timeouts"""
+    print_header("Limits and duplicates")
+    llm = FakeLLM(args.latency)
+    worker = InferenceWorker(max_queue=4, timeout=60, max_per_user=2)
+    passed = True
+
+    def job(question):
+        return lambda cancel: llm.generate(question, cancel)
+
+    positions = []
+
+    async def on_queued(position):
+        positions.append(position)
+
+    # Occupy the worker so later requests have to wait
+    running = asyncio.create_task(worker.submit(job("first"), key=("a", "u1")))
+    await asyncio.sleep(args.latency / 5)
+
+    waiting = [
+        asyncio.create_task(
+            worker.submit(
+                job(f"q{i}"),
+                key=(guild, user),
+                dedup_key=(guild, f"q{i}"),
+                on_queued=on_queued,
+            )
+        )
+        for i, (guild, user) in enumerate([("a", "u1"), ("a", "u1"), ("b", "u2")])
+    ]
+    # Let each request reach the queue
+    await asyncio.sleep(0)
+
+    try:
+        await worker.submit(job("q0"), key=("a", "u3"), dedup_key=("a", "q0"))
+        duplicate = False
+    except DuplicateRequestError:
+        duplicate = True
+    passed &= print_check("Duplicate in-flight question dropped", duplicate)
+
+    try:
+        await worker.submit(job("q9"), key=("a", "u1"))
+        per_user = False
+    except InferenceBusyError as e:
+        per_user = e.per_user
+    passed &= print_check("Per-user limit enforced", per_user)
+
+    # Guild b arrives last but goes ahead of user u1's second question
+    passed &= print_check(
+        "Queue positions reported in round-robin order",
+        positions == [1, 2, 2],
+        f"positions {positions}",
+    )
+
+    filler = asyncio.create_task(worker.submit(job("fill"), key=("c", "u4")))
+    await asyncio.sleep(0)
+    try:
+        await worker.submit(job("overflow"), key=("d", "u5"))
+        busy = False
+    except InferenceBusyError as e:
+        busy = not e.per_user and e.queue_depth == 4
+    passed &= print_check("Full queue rejects new requests", busy)
+
+    await asyncio.gather(running, *waiting, filler)
+
+    # A request that can't finish in time is cancelled and leaves the queue
+    slow = InferenceWorker(max_queue=4, timeout=args.latency / 2)
+    try:
+        await slow.submit(job("slow"))
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    stats = slow.stats()
+    slow.shutdown()
+    passed &= print_check(
+        "Timed-out request cancelled",
+        timed_out and stats["timeouts"] == 1 and stats["queue_depth"] == 0,
+    )
+
+    worker.shutdown()
+    return passed
+
+
+async def main_async(args):
+    passed = await benchmark_fairness(args)
+    passed &= await check_limits(args)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference scheduler benchmark")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per fake generation"
+    )
+    parser.add_argument(
+        "--flood", type=int, default=20, help="Questions from the noisy guild"
+    )
+    parser.add_argument(
+        "--quiet-guilds", type=int, default=5, help="Guilds asking one question"
+    )
+    args = parser.parse_args()
+
+    passed = asyncio.run(main_async(args))
+    print(f"\n{'✅ All checks passed' if passed else '❌ Some checks failed'}\n")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,24 @@ Author: WorklyHQ
 License: See LICENSE file
 """
 
+import asyncio
 import json
 import os
+import sys
+import time
+from collections import OrderedDict
 from pathlib import Path
 
+from inference import DuplicateRequestError, InferenceBusyError, InferenceWorker
+from streaming import StreamingReply, split_message
+
+# Prompt building is shared with the chatbot demo
+sys.path.append(str(Path(__file__).parent.parent / "01_basic_chatbot"))
+from conversation_context import DEFAULT_SYSTEM_PROMPT, ConversationContext
+from model_manager import shared_manager
+from response_cache import ResponseCache
+from state_cache import StateCache, model_fingerprint
+
 try:
     import discord
     from discord.ext import commands
@@ -44,57 +58,198 @@ def load_config():
     return config
 
 
-def load_ai_model(config):
-    """Load AI model if enabled"""
+def load_ai_model(config, then=None):
+    """
+    Start loading the AI model in the background if enabled
+
+    Returns a concurrent.futures.Future (see ModelManager.load_in_background),
+    or None when AI is off or there is no model. The model is shared
+    through the model manager and warmed up with one tiny eval.
+    """
     if not config.get("use_ai", False):
         return None
 
-    model_path = config.get("model_path")
+    manager = shared_manager(config)
+    settings = manager.spec()
+    model_path = settings["model_path"]
 
     if not model_path or not os.path.exists(model_path):
         print("⚠️ AI model not found, using simple responses")
         return None
 
+    # Caches and prompts read the active model's settings from config
+    config["model_path"] = model_path
+    config["n_ctx"] = settings["n_ctx"]
+
+    print(
+        f"📦 Loading AI model in the background: {model_path} "
+        f"({settings['n_threads']} threads)"
+    )
+    loading = manager.load_in_background(then=then)
+
+    def report(future):
+        error = future.exception()
+        if isinstance(error, ImportError):
+            print("⚠️ llama-cpp-python not installed, using simple responses")
+        elif error is not None:
+            print(f"⚠️ Error loading AI model: {error}")
+
+    loading.add_done_callback(report)
+    return loading
+
+
+def load_memory(config):
+    """Open the conversation memory database if enabled"""
+    if not config.get("use_memory", False):
+        return None
+
+    # The memory system lives in the memory demo folder
+    sys.path.append(str(Path(__file__).parent.parent / "04_memory_system"))
+
     try:
-        from llama_cpp import Llama
+        from async_memory import AsyncMemorySystem
 
-        print(f"📦 Loading AI model: {model_path}")
-        llm = Llama(model_path=model_path, n_ctx=2048, n_threads=4, verbose=False)
-        print("✅ AI model loaded!")
-        return llm
+        db_path = config.get("memory_db", "workly_memory.db")
+        print(f"🧠 Opening conversation memory: {db_path}")
+        # WAL lets history reads run while answers are being saved
+        return AsyncMemorySystem(db_path, wal=True)
 
     except ImportError:
-        print("⚠️ llama-cpp-python not installed, using simple responses")
+        print("⚠️ Memory system not found (demos/04_memory_system), memory disabled")
         return None
 
     except Exception as e:
-        print(f"⚠️ Error loading AI model: {e}")
+        print(f"⚠️ Error opening memory database: {e}")
         return None
 
 
-def generate_ai_response(llm, question, config):
-    """Generate AI-powered response"""
-    if llm is None:
+def load_state_cache(config, llm):
+    """Open the prompt state cache and get the persona prompt evaluated"""
+    if llm is None or not config.get("state_cache", True):
         return None
 
     try:
+        cache = StateCache(
+            config.get("state_cache_dir", "state_cache"),
+            config["model_path"],
+            n_ctx=config.get("n_ctx", 2048),
+            max_bytes=config.get("state_cache_mb", 1024) * 1024 * 1024,
+        )
+    except OSError as e:
+        print(f"⚠️ State cache disabled: {e}")
+        return None
+
+    # Every channel's prompt starts with the persona
+    persona = ConversationContext(
+        llm, system_prompt=config.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
+    ).prefix()
+
+    start = time.perf_counter()
+    if cache.warm(llm, persona):
+        print(
+            f"⚡ Persona state loaded from disk in {time.perf_counter() - start:.2f}s"
+        )
+    else:
+        print(f"💾 Persona evaluated in {time.perf_counter() - start:.2f}s (cached)")
+    return cache
+
+
+def load_response_cache(config, llm):
+    """
+    Open the response cache if answers are reusable
+
+    With temperature 0 a prompt always gets the same answer, so caching is
+    on automatically; otherwise only if response_cache is set.
+    """
+    if llm is None:
+        return None
+    if config.get("temperature", 0.7) != 0 and not config.get("response_cache", False):
+        return None
+
+    return ResponseCache(
+        max_entries=config.get("response_cache_size", 256),
+        ttl=config.get("response_cache_ttl", 3600),
+        db_path=config.get("response_cache_db"),
+        faq=config.get("response_cache_faq"),
+    )
+
+
+def completion_args(question, config, cancel=None, context=None):
+    """Build the llm() arguments shared by normal and streaming generation"""
+    if context is not None:
+        prompt = context.prepare(question)
+    else:
         prompt = f"User: {question}\nAssistant:"
 
-        response = llm(
-            prompt,
-            max_tokens=config.get("max_tokens", 256),
-            temperature=0.7,
-            stop=["User:", "\n\n"],
-            echo=False,
+    args = {
+        "prompt": prompt,
+        "max_tokens": config.get("max_tokens", 256),
+        "temperature": config.get("temperature", 0.7),
+        "stop": ["User:", "\n\n"],
+        "echo": False,
+    }
+
+    if cancel is not None:
+        from llama_cpp import StoppingCriteriaList
+
+        # Stop generating as soon as the request has timed out
+        args["stopping_criteria"] = StoppingCriteriaList(
+            [lambda input_ids, logits: cancel.is_set()]
         )
 
-        return response["choices"][0]["text"].strip()
+    return args
+
+
+def generate_ai_response(llm, question, config, cancel=None, context=None):
+    """Generate AI-powered response (blocking; run it on the inference worker)"""
+    if llm is None:
+        return None
+
+    try:
+        response = llm(**completion_args(question, config, cancel, context))
+        text = response["choices"][0]["text"].strip()
+
+        if context is not None and text:
+            context.add_turn(question, text)
+        return text
 
     except Exception as e:
         print(f"❌ AI generation error: {e}")
         return None
 
 
+def stream_ai_response(llm, question, config, on_text, cancel=None, context=None):
+    """
+    Generate a response token by token, passing each piece to on_text
+
+    Stop sequences are handled by llama.cpp, which holds back text that
+    could be the start of one. Returns the full response text.
+    """
+    if llm is None:
+        return None
+
+    parts = []
+    start = time.perf_counter()
+    try:
+        args = completion_args(question, config, cancel, context)
+        for chunk in llm(**args, stream=True):
+            text = chunk["choices"][0]["text"]
+            if text:
+                if not parts and context is not None:
+                    # Time to first token is (almost all) prompt evaluation
+                    context.record_prompt_eval(time.perf_counter() - start)
+                parts.append(text)
+                on_text(text)
+
+    except Exception as e:
+        print(f"❌ AI generation error: {e}")
+
+    response = "".join(parts).strip()
+    if context is not None and response:
+        context.add_turn(question, response)
+    return response or None
+
+
 def get_simple_response(question):
     """Get predefined response (fallback when AI is disabled)"""
     question_lower = question.lower()
@@ -118,6 +273,7 @@ def get_simple_response(question):
 
 def main():
     """Main bot function"""
+    started = time.perf_counter()
     print("=" * 60)
     print("🤖 Workly Discord Bot Demo")
     print("=" * 60)
@@ -155,15 +311,244 @@ def main():
         help_command=None,
     )
 
-    # Load AI model
-    llm = load_ai_model(config)
+    # Generation runs on one worker thread so commands never block the bot
+    inference = InferenceWorker(
+        max_queue=config.get("inference_queue_size", 8),
+        timeout=config.get("inference_timeout", 60),
+        max_per_user=config.get("inference_max_per_user", 2),
+    )
+
+    # The AI model loads in the background while the bot connects; until
+    # it is ready, questions get simple responses
+    llm = None
+    state_cache = None
+    session_states = False
+    response_cache = None
+    model_id = None
+
+    def prepare_model(loaded):
+        """Set up the caches on the loading thread, then start using the model"""
+        nonlocal llm, state_cache, session_states, response_cache, model_id
+
+        # Skip re-evaluating the persona prompt on every restart
+        state_cache = load_state_cache(config, loaded)
+        session_states = state_cache is not None and config.get(
+            "state_cache_sessions", False
+        )
+
+        # Repeated questions are answered without running the model
+        response_cache = load_response_cache(config, loaded)
+        model_id = model_fingerprint(config["model_path"]) if response_cache else None
+
+        # Set last: nothing touches the model before it is fully prepared
+        llm = loaded
+        timings = shared_manager(config).timings()
+        print(
+            f"✅ AI model ready {time.perf_counter() - started:.2f}s after start "
+            f"(load {timings['load_seconds']:.2f}s, "
+            f"warm-up {timings['warmup_seconds']:.2f}s)"
+        )
+        return loaded
+
+    model_loading = load_ai_model(config, then=prepare_model)
+
+    def response_key(context, question):
+        """
+        Response cache key: conversation so far, question, model, settings
+
+        Common questions ("help", "who are you") leave out the conversation,
+        so they hit in any channel at any point, not only as its first turn.
+        """
+        if response_cache.is_faq(question):
+            history = context.system_prompt
+        else:
+            history = context.prefix()
+        return response_cache.make_key(
+            f"{history}User: {question}\nAssistant:",
+            model_id,
+            temperature=config.get("temperature", 0.7),
+            max_tokens=config.get("max_tokens", 256),
+        )
+
+    def answer_job(context, question, generate):
+        """
+        Wrap a generation job with per-channel state swapping and caching
+
+        The KV cache holds one conversation at a time. With
+        state_cache_sessions, each channel's state is saved after its answer
+        and loaded back before its next one, so channels taking turns don't
+        re-evaluate each other's history. Complete answers are stored in the
+        response cache under the prompt they were generated from.
+        """
+
+        def job(cancel):
+            key = response_key(context, question) if response_cache else None
+            if session_states:
+                state_cache.load(llm, context.prefix(), min_new_tokens=32)
+
+            response = generate(cancel)
+
+            if session_states and response:
+                state_cache.save(llm, context.prefix())
+            # A timed-out answer is incomplete; don't reuse it
+            if key and response and not cancel.is_set():
+                response_cache.put(key, response)
+            return response
+
+        return job
+
+    # Time from question to first visible text of streamed answers, and
+    # how much prompt evaluation the KV cache saved
+    stream_stats = {
+        "replies": 0,
+        "total_seconds": 0.0,
+        "last_seconds": 0.0,
+        "prompt_tokens": 0,
+        "reused_tokens": 0,
+        "saved_seconds": 0.0,
+    }
+
+    # One rolling conversation per channel, least recently used dropped
+    # first. The dict is only changed on the event loop; prompts are built
+    # from a context on the inference thread.
+    contexts = OrderedDict()
+
+    def get_context(channel_id):
+        """Get (or start) the conversation context of a channel"""
+        context = contexts.pop(channel_id, None)
+        if context is None:
+            context = ConversationContext(
+                llm,
+                n_ctx=config.get("n_ctx", 2048),
+                max_tokens=config.get("max_tokens", 256),
+                system_prompt=config.get("system_prompt", DEFAULT_SYSTEM_PROMPT),
+                summarize=config.get("summarize_history", False),
+            )
+        contexts[channel_id] = context
+
+        while len(contexts) > config.get("max_conversations", 100):
+            contexts.popitem(last=False)
+        return context
+
+    def queue_args(ctx, question):
+        """
+        Scheduling options for a question: guilds and users take turns, the
+        same question isn't queued twice in a channel, and the asker is told
+        their place in line when the generator is busy
+        """
+
+        async def on_queued(position):
+            await ctx.send(f"⏳ Busy right now — you are #{position} in queue")
+
+        return {
+            "key": (ctx.guild.id if ctx.guild else ctx.channel.id, ctx.author.id),
+            "dedup_key": (ctx.channel.id, ResponseCache.normalize(question)),
+            "on_queued": on_queued,
+        }
+
+    # Open conversation memory (saves never block the event loop)
+    memory = load_memory(config)
+
+    async def cached_answer(ctx, question):
+        """Send a cached answer if there is one; return it (or None)"""
+        context = get_context(ctx.channel.id)
+        key = response_key(context, question)
+        if response_cache.conn is None:
+            response = response_cache.get(key)
+        else:
+            # The SQLite tier reads and commits; keep that off the event loop
+            response = await asyncio.to_thread(response_cache.get, key)
+        if not response:
+            return None
+
+        for page in split_message(response):
+            await ctx.send(page)
+
+        # Appending a turn is a single list append, safe next to the worker
+        context.add_turn(question, response)
+        return response
+
+    async def stream_answer(ctx, question):
+        """Generate an answer into a reply that is edited as tokens arrive"""
+        loop = asyncio.get_running_loop()
+        reply = StreamingReply(
+            ctx, edit_interval=config.get("stream_edit_interval", 1.0)
+        )
+
+        context = get_context(ctx.channel.id)
+
+        def on_text(text):
+            # Runs on the inference thread; hand tokens to the event loop
+            loop.call_soon_threadsafe(reply.push, text)
+
+        try:
+            await inference.submit(
+                answer_job(
+                    context,
+                    question,
+                    lambda cancel: stream_ai_response(
+                        llm, question, config, on_text, cancel, context
+                    ),
+                ),
+                **queue_args(ctx, question),
+            )
+            stream_stats["prompt_tokens"] += context.last_prompt_tokens
+            stream_stats["reused_tokens"] += context.last_reused_tokens
+            stream_stats["saved_seconds"] += context.last_saved_seconds
+        except asyncio.TimeoutError:
+            # Keep whatever was generated before the timeout
+            print(f"⚠️ AI response timed out after {inference.timeout}s")
+
+        response = await reply.finish()
+
+        if reply.first_visible_seconds is not None:
+            stream_stats["replies"] += 1
+            stream_stats["total_seconds"] += reply.first_visible_seconds
+            stream_stats["last_seconds"] = reply.first_visible_seconds
+
+        return response
+
+    async def ai_answer(ctx, question):
+        """Answer with the AI (from the cache if possible) and send it"""
+        if response_cache:
+            # Skips the queue entirely
+            response = await cached_answer(ctx, question)
+            if response:
+                return response
+
+        if config.get("stream_responses", True):
+            # Sent while it is generated
+            return await stream_answer(ctx, question)
+
+        context = get_context(ctx.channel.id)
+        response = await inference.submit(
+            answer_job(
+                context,
+                question,
+                lambda cancel: generate_ai_response(
+                    llm, question, config, cancel, context
+                ),
+            ),
+            **queue_args(ctx, question),
+        )
+        for page in split_message(response or ""):
+            await ctx.send(page)
+        return response
 
     @bot.event
     async def on_ready():
         """Bot startup event"""
         print(f"✅ Bot connected as {bot.user}")
         print(f"📊 Serving {len(bot.guilds)} server(s)")
-        print(f"🤖 AI Mode: {'Enabled' if llm else 'Simple responses'}")
+        if llm:
+            ai_mode = "Enabled"
+        elif model_loading and not model_loading.done():
+            ai_mode = "Loading in the background (simple responses until ready)"
+        else:
+            ai_mode = "Simple responses"
+        print(f"⏱️ Connected {time.perf_counter() - started:.2f}s after start")
+        print(f"🤖 AI Mode: {ai_mode}")
+        print(f"🧠 Memory: {'Enabled' if memory else 'Disabled'}")
         print("\n🎉 Bot is ready!\n")
 
     @bot.command(name="hello")
@@ -176,15 +561,65 @@ def main():
         """Ask a question"""
         async with ctx.typing():
             # Try AI response first
-            if llm:
-                response = generate_ai_response(llm, question, config)
-                if response:
-                    await ctx.send(response)
-                    return
+            response = None
+            try:
+                if llm:
+                    response = await ai_answer(ctx, question)
+
+            except InferenceBusyError as e:
+                if e.per_user:
+                    await ctx.send(
+                        f"⏳ You already have {e.queue_depth} questions waiting, "
+                        "let me answer those first!"
+                    )
+                else:
+                    await ctx.send(
+                        f"⏳ I'm busy answering {e.queue_depth} other questions, "
+                        "please try again in a moment!"
+                    )
+                return
+
+            except DuplicateRequestError:
+                await ctx.send("👀 Already working on that question, hang on!")
+                return
+
+            except asyncio.TimeoutError:
+                print(f"⚠️ AI response timed out after {inference.timeout}s")
 
             # Fallback to simple response
-            response = get_simple_response(question)
-            await ctx.send(response)
+            if not response:
+                response = get_simple_response(question)
+                if model_loading and not model_loading.done():
+                    response += "\n*(My AI is still warming up, ask me again soon!)*"
+                await ctx.send(response)
+
+        if memory:
+            # One memory session per channel
+            session_id = f"discord:{ctx.channel.id}"
+            await memory.save_message(
+                "user", question, session_id, {"author": str(ctx.author)}
+            )
+            await memory.save_message("assistant", response, session_id)
+
+    @bot.command(name="history")
+    async def history(ctx):
+        """Show recent questions and answers in this channel"""
+        if not memory:
+            await ctx.send("🧠 Memory is disabled (set use_memory in config.json)")
+            return
+
+        messages = await memory.get_recent_messages(
+            limit=6, session_id=f"discord:{ctx.channel.id}"
+        )
+        if not messages:
+            await ctx.send("🧠 No conversation history in this channel yet.")
+            return
+
+        lines = [
+            f"{'👤' if msg['role'] == 'user' else '🤖'} {msg['message'][:150]}"
+            for msg in reversed(messages)
+        ]
+        await ctx.send("\n".join(lines))
 
     @bot.command(name="joke")
     async def joke(ctx):
@@ -204,6 +639,66 @@ def main():
         latency = round(bot.latency * 1000)
         await ctx.send(f"🏓 Pong! Latency: {latency}ms")
 
+    @bot.command(name="queue")
+    async def queue_status(ctx):
+        """Show inference queue depth and wait times"""
+        stats = inference.stats()
+        status = f"busy for {stats['busy_seconds']}s" if stats["busy"] else "idle"
+        await ctx.send(
+            f"🧮 Generator: {status}\n"
+            f"📥 Waiting: {stats['queue_depth']}/{stats['max_queue']} "
+            f"from {stats['guilds_waiting']} server(s)\n"
+            f"⏱️ Avg wait: {stats['avg_wait_seconds']}s "
+            f"(last {stats['last_wait_seconds']}s)\n"
+            f"✅ Answered: {stats['completed']} • "
+            f"⌛ Timed out: {stats['timeouts']} • "
+            f"🚫 Rejected: {stats['rejected']} • "
+            f"👀 Duplicates: {stats['duplicates']}"
+        )
+
+        if stream_stats["replies"]:
+            average = stream_stats["total_seconds"] / stream_stats["replies"]
+            reused = stream_stats["reused_tokens"] / max(
+                stream_stats["prompt_tokens"], 1
+            )
+            await ctx.send(
+                f"⚡ Time to first token: {average:.2f}s avg "
+                f"(last {stream_stats['last_seconds']:.2f}s)\n"
+                f"♻️ Prompt tokens reused from cache: {reused:.0%} "
+                f"(~{stream_stats['saved_seconds']:.1f}s of prompt eval saved)"
+            )
+
+    @bot.command(name="stats")
+    async def cache_stats(ctx):
+        """Show response and prompt state cache counters"""
+        if not response_cache and not state_cache:
+            await ctx.send("💨 No caches enabled (see response_cache / state_cache)")
+            return
+
+        lines = []
+        if response_cache:
+            cache = response_cache.get_stats()
+            stored = f"{cache['entries']} in memory"
+            if cache["db_entries"] is not None:
+                stored += f", {cache['db_entries']} on disk"
+            lines.append(
+                f"💨 Response cache: {cache['hits']} hits • {cache['misses']} misses "
+                f"({cache['hit_rate']:.0%}) • {stored}"
+            )
+        if state_cache:
+            cache = state_cache.get_stats()
+            lines.append(
+                f"💾 Saved states: {cache['entries']} ({cache['size_mb']} MB) • "
+                f"loaded {cache['hits']}× • missed {cache['misses']}×"
+            )
+        await ctx.send("\n".join(lines))
+
+    @bot.command(name="reset")
+    async def reset(ctx):
+        """Start a fresh AI conversation in this channel"""
+        contexts.pop(ctx.channel.id, None)
+        await ctx.send("🧹 Conversation context cleared for this channel.")
+
     @bot.command(name="help")
     async def help_command(ctx):
         """Show help"""
@@ -220,7 +715,21 @@ def main():
             name=f"{prefix}ask <question>", value="Ask a question", inline=False
         )
         embed.add_field(name=f"{prefix}joke", value="Get a random joke", inline=False)
+        embed.add_field(
+            name=f"{prefix}history", value="Show recent conversation", inline=False
+        )
         embed.add_field(name=f"{prefix}ping", value="Check bot latency", inline=False)
+        embed.add_field(
+            name=f"{prefix}queue", value="Show AI request queue", inline=False
+        )
+        embed.add_field(
+            name=f"{prefix}stats", value="Show AI cache statistics", inline=False
+        )
+        embed.add_field(
+            name=f"{prefix}reset",
+            value="Forget this channel's AI context",
+            inline=False,
+        )
 
         embed.set_footer(text="Workly Public Edition • WorklyHQ")
 
@@ -246,6 +755,10 @@ def main():
         print("\n👋 Bot stopped by user")
     except Exception as e:
         print(f"\n❌ Error: {e}")
+    finally:
+        inference.shutdown()
+        if memory:
+            memory.shutdown()
 
 
 if __name__ == "__main__":
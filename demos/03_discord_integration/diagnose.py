@@ -5,6 +5,7 @@ Helps diagnose common Discord bot issues.
 Run this before launching the bot to check your configuration.
 """
 
+import importlib.util
 import json
 import os
 from pathlib import Path
@@ -107,12 +108,11 @@ def check_dependencies():
         )
         return False
 
-    # Check llama-cpp-python (optional)
-    try:
-        import llama_cpp
-
+    # Check llama-cpp-python (optional). Only look it up: importing it is
+    # slow, and the bot does that in the background when loading the model
+    if importlib.util.find_spec("llama_cpp") is not None:
         print_status("llama-cpp-python installed", True, "AI mode available")
-    except ImportError:
+    else:
         print_status(
             "llama-cpp-python installed", False, "Not required, but needed for AI mode"
         )
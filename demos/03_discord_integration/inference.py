@@ -0,0 +1,277 @@
+"""
+Inference Worker - Workly Public Edition
+
+Runs blocking LLM calls off the Discord event loop.
+llama.cpp generation can take many seconds; calling it directly inside an
+async command freezes every other command and the gateway heartbeat. The
+worker runs one generation at a time on its own thread (a Llama instance
+is not thread-safe), with a timeout per request.
+
+Waiting requests are kept per guild and per user and served round-robin:
+one busy guild (or one user asking ten questions) can't make everyone
+else wait behind its whole backlog. The queue is bounded in total and per
+user, and a question already waiting in the same channel isn't queued
+twice.
+
+Usage:
+    worker = InferenceWorker(max_queue=8, timeout=60)
+    text = await worker.submit(
+        lambda cancel: generate(..., cancel), key=(guild_id, user_id)
+    )
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class InferenceBusyError(Exception):
+    """Raised when the queue (or the user's share of it) is full"""
+
+    def __init__(self, queue_depth, per_user=False):
+        if per_user:
+            message = f"Too many questions waiting for this user ({queue_depth})"
+        else:
+            message = f"Inference queue is full ({queue_depth} waiting)"
+        super().__init__(message)
+        self.queue_depth = queue_depth
+        self.per_user = per_user
+
+
+class DuplicateRequestError(Exception):
+    """Raised when the same request is already queued or running"""
+
+
+class InferenceJob:
+    """One queued generation"""
+
+    __slots__ = ("fn", "future", "cancel", "enqueued_at", "key", "dedup_key")
+
+    def __init__(self, fn, key, dedup_key=None):
+        self.fn = fn
+        self.future = concurrent.futures.Future()
+        # Set on timeout; generation code can poll it to stop early
+        self.cancel = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.key = key
+        self.dedup_key = dedup_key
+
+
+class InferenceWorker:
+    """Single inference thread with fair, bounded queues and timeouts"""
+
+    def __init__(self, max_queue=8, timeout=60.0, max_per_user=2):
+        """
+        At most max_queue requests wait in total, and max_per_user per
+        (guild, user) key. Requests time out after timeout seconds.
+        """
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.timeout = timeout
+
+        # guild -> user -> waiting jobs; dict order is the round-robin order
+        self._guilds = OrderedDict()
+        self._queued = 0
+        self._in_flight = {}
+        self._running = None
+        self._stopping = False
+        self._lock = threading.Condition()
+
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._duplicates = 0
+        self._total_wait = 0.0
+        self._last_wait = 0.0
+        self._busy_since = None
+
+        self._thread = threading.Thread(
+            target=self._run, name="inference-worker", daemon=True
+        )
+        self._thread.start()
+
+    async def submit(self, fn, timeout=None, key=None, dedup_key=None, on_queued=None):
+        """
+        Run fn(cancel_event) on the worker thread and return its result
+
+        key is a (guild, user) pair used for fair scheduling. If dedup_key
+        is given and a request with the same dedup_key is still waiting or
+        running, DuplicateRequestError is raised. If the request has to
+        wait, the coroutine function on_queued(position) is awaited first.
+
+        Raises InferenceBusyError if the queue is full and
+        asyncio.TimeoutError if the request (waiting + running) takes longer
+        than timeout seconds. On timeout the cancel event is set: a queued
+        request is removed, a running one can check the event to stop.
+        """
+        guild, user = key or (None, None)
+        job = InferenceJob(fn, (guild, user), dedup_key)
+
+        with self._lock:
+            if dedup_key is not None and dedup_key in self._in_flight:
+                self._duplicates += 1
+                raise DuplicateRequestError(dedup_key)
+
+            users = self._guilds.get(guild, {})
+            waiting_for_user = len(users.get(user, ()))
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise InferenceBusyError(self._queued)
+            if waiting_for_user >= self.max_per_user:
+                self._rejected += 1
+                raise InferenceBusyError(waiting_for_user, per_user=True)
+
+            self._guilds.setdefault(guild, OrderedDict()).setdefault(
+                user, deque()
+            ).append(job)
+            self._queued += 1
+            if dedup_key is not None:
+                self._in_flight[dedup_key] = job
+
+            position = self._position(job)
+            # Something runs or waits ahead of it
+            behind = self._running is not None or position > 1
+            self._lock.notify()
+
+        try:
+            if behind and on_queued is not None:
+                await on_queued(position)
+
+            return await asyncio.wait_for(
+                asyncio.wrap_future(job.future), timeout or self.timeout
+            )
+        except BaseException as e:
+            # Timed out or cancelled: drop the job if it is still waiting
+            job.cancel.set()
+            with self._lock:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._timeouts += 1
+                self._remove(job)
+            raise
+
+    def _pop_next(self, guilds):
+        """Take the next job in round-robin order from a guild -> user map"""
+        guild, users = next(iter(guilds.items()))
+        user, jobs = next(iter(users.items()))
+        job = jobs.popleft()
+
+        # Served user and guild go to the back of the line
+        if jobs:
+            users.move_to_end(user)
+        else:
+            del users[user]
+        if users:
+            guilds.move_to_end(guild)
+        else:
+            del guilds[guild]
+        return job
+
+    def _position(self, job):
+        """1-based place of a waiting job in the order jobs will run"""
+        guilds = OrderedDict(
+            (guild, OrderedDict((user, deque(jobs)) for user, jobs in users.items()))
+            for guild, users in self._guilds.items()
+        )
+        position = 1
+        while guilds:
+            if self._pop_next(guilds) is job:
+                return position
+            position += 1
+        return 0
+
+    def _remove(self, job):
+        """Take a job out of the queue if it is still waiting"""
+        guild, user = job.key
+        jobs = self._guilds.get(guild, {}).get(user)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            self._queued -= 1
+            if not jobs:
+                del self._guilds[guild][user]
+                if not self._guilds[guild]:
+                    del self._guilds[guild]
+        if job.dedup_key is not None and self._in_flight.get(job.dedup_key) is job:
+            del self._in_flight[job.dedup_key]
+
+    def _run(self):
+        """Worker loop: one job at a time, round-robin over guilds and users"""
+        while True:
+            with self._lock:
+                while not self._queued and not self._stopping:
+                    self._lock.wait()
+                if self._stopping:
+                    return
+
+                job = self._pop_next(self._guilds)
+                self._queued -= 1
+
+                # Skip jobs whose caller already gave up
+                if job.cancel.is_set() or not job.future.set_running_or_notify_cancel():
+                    self._remove(job)
+                    continue
+
+                wait = time.perf_counter() - job.enqueued_at
+                self._total_wait += wait
+                self._last_wait = wait
+                self._running = job
+                self._busy_since = time.perf_counter()
+
+            try:
+                job.future.set_result(job.fn(job.cancel))
+                succeeded = True
+            except Exception as e:
+                job.future.set_exception(e)
+                succeeded = False
+
+            with self._lock:
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._running = None
+                self._busy_since = None
+                self._remove(job)
+
+    def stats(self):
+        """Get queue depth, wait times and counters"""
+        with self._lock:
+            started = self._completed + self._failed
+            busy_for = (
+                time.perf_counter() - self._busy_since if self._busy_since else 0.0
+            )
+            return {
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "guilds_waiting": len(self._guilds),
+                "busy": self._busy_since is not None,
+                "busy_seconds": round(busy_for, 2),
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "duplicates": self._duplicates,
+                "avg_wait_seconds": (
+                    round(self._total_wait / started, 3) if started else 0.0
+                ),
+                "last_wait_seconds": round(self._last_wait, 3),
+            }
+
+    def shutdown(self):
+        """Stop the worker after the current job, cancelling waiting ones"""
+        with self._lock:
+            self._stopping = True
+            for users in self._guilds.values():
+                for jobs in users.values():
+                    for job in jobs:
+                        job.cancel.set()
+                        job.future.cancel()
+            self._guilds.clear()
+            self._queued = 0
+            self._lock.notify()
+        self._thread.join()
@@ -0,0 +1,101 @@
+"""
+Streaming Replies - Workly Public Edition
+
+Shows an AI answer in Discord while it is being generated.
+Tokens are pushed in as they arrive; the reply message is edited with
+everything received so far, at most once per edit interval, so a burst
+of tokens becomes a single edit and the bot stays within Discord's edit
+rate limits. Answers longer than one message continue in a new one.
+
+Usage:
+    reply = StreamingReply(ctx, edit_interval=1.0)
+    reply.push(" Hello")       # From the event loop, as tokens arrive
+    await reply.finish()
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import asyncio
+import time
+
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+def split_message(text, limit=DISCORD_MESSAGE_LIMIT):
+    """Split text into pages of at most limit characters, at whitespace if possible"""
+    pages = []
+    while len(text) > limit:
+        cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit))
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pages.append(text)
+    return pages
+
+
+class StreamingReply:
+    """A Discord reply that grows as tokens are pushed into it"""
+
+    def __init__(self, channel, edit_interval=1.0, limit=DISCORD_MESSAGE_LIMIT):
+        """channel is anything with send() (a command context or a channel)"""
+        self.channel = channel
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.text = ""
+        self.messages = []
+        self.edits = 0
+        self.started_at = time.perf_counter()
+        self.first_visible_seconds = None
+
+        self._shown = []
+        self._last_update = 0.0
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        self._finished = False
+
+    def push(self, text):
+        """Add generated text; the message is updated shortly after"""
+        if self._finished or not text:
+            return
+        self.text += text
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        """Wait out the edit interval, then show everything pushed so far"""
+        delay = self._last_update + self.edit_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._flush_task = None
+        await self._update()
+
+    async def _update(self):
+        """Edit or send messages so Discord shows the current text"""
+        async with self._lock:
+            pages = split_message(self.text.strip(), self.limit)
+
+            for index, page in enumerate(pages):
+                if index < len(self.messages):
+                    if self._shown[index] != page:
+                        await self.messages[index].edit(content=page)
+                        self._shown[index] = page
+                        self.edits += 1
+                else:
+                    self.messages.append(await self.channel.send(page))
+                    self._shown.append(page)
+
+            if pages and self.first_visible_seconds is None:
+                self.first_visible_seconds = time.perf_counter() - self.started_at
+            self._last_update = time.monotonic()
+
+    async def finish(self):
+        """Show the final text; later pushes are ignored"""
+        self._finished = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._update()
+        return self.text.strip()
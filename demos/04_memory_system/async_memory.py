@@ -0,0 +1,182 @@
+"""
+Async Memory System - Workly Public Edition
+
+asyncio wrapper around MemorySystem for use inside an event loop
+(for example a Discord bot). SQLite calls block, so all database work
+runs on one dedicated thread fed by a request queue; coroutines only
+wait for their result. Saves that arrive together (say, from many guild
+commands at once) are written in a single transaction. A save resolves
+with its ID once that transaction is committed, or with the error if it
+failed, in which case none of its messages were stored.
+
+Usage:
+    memory = AsyncMemorySystem("workly_memory.db")
+    msg_id = await memory.save_message("user", "Hello!", session_id)
+    history = await memory.get_recent_messages(limit=10, session_id=session_id)
+    await memory.close()
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import asyncio
+import queue
+import threading
+
+from memory_demo import MemorySystem
+
+
+class AsyncMemorySystem:
+    """Non-blocking MemorySystem: database work runs on a worker thread"""
+
+    def __init__(self, db_path="workly_memory.db", max_batch=256, **memory_options):
+        """
+        Up to max_batch queued requests are handled per round; all saves in
+        a round share one transaction. Extra keyword arguments go to
+        MemorySystem (e.g. wal=True).
+        """
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._memory_options = memory_options
+        self._requests = queue.SimpleQueue()
+        self._memory = None
+        self._startup_error = None
+        self._ready = threading.Event()
+
+        self._thread = threading.Thread(
+            target=self._run, name="async-memory", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+        if self._startup_error:
+            raise self._startup_error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def save_message(self, role, message, session_id=None, metadata=None):
+        """Save a message, return its ID once it is committed"""
+        return await self._submit("save", role, message, session_id, metadata)
+
+    async def get_recent_messages(self, limit=10, session_id=None):
+        """Get recent messages"""
+        return await self._submit("call", "get_recent_messages", limit, session_id)
+
+    async def search_messages(self, keyword, limit=50, offset=0):
+        """Search messages by keyword, best matches first"""
+        return await self._submit("call", "search_messages", keyword, limit, offset)
+
+    async def get_statistics(self):
+        """Get database statistics"""
+        return await self._submit("call", "get_statistics")
+
+    async def run(self, method, *args):
+        """Call any other MemorySystem method on the worker thread"""
+        return await self._submit("call", method, *args)
+
+    async def close(self):
+        """Write pending messages and stop the worker thread"""
+        await asyncio.to_thread(self.shutdown)
+
+    def shutdown(self):
+        """Blocking close(), for use after the event loop has stopped"""
+        if self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join()
+
+    def _submit(self, kind, *args):
+        """Queue a request and return a future for its result"""
+        if not self._thread.is_alive():
+            raise RuntimeError("AsyncMemorySystem is closed")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests.put((kind, args, loop, future))
+        return future
+
+    @staticmethod
+    def _resolve(loop, future, result=None, error=None):
+        """Hand a result back to the event loop that is waiting for it"""
+
+        def set_result():
+            if future.cancelled():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        loop.call_soon_threadsafe(set_result)
+
+    def _run(self):
+        """Worker loop: own the MemorySystem and serve queued requests"""
+        try:
+            # Saves are batched by the request loop, not write-behind, so
+            # each ID comes from the database when the rows are committed
+            self._memory = MemorySystem(self.db_path, **self._memory_options)
+        except Exception as e:
+            self._startup_error = e
+            self._ready.set()
+            return
+
+        self._ready.set()
+
+        while True:
+            request = self._requests.get()
+            batch = [request]
+
+            # Take whatever else is already waiting, up to max_batch
+            while request is not None and len(batch) < self.max_batch:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+
+            stopping = batch[-1] is None
+            self._handle_batch([item for item in batch if item is not None])
+
+            if stopping:
+                self._memory.close()
+                return
+
+    def _handle_batch(self, batch):
+        """Serve one round of requests in order, committing saves together"""
+        saves = []
+
+        for kind, args, loop, future in batch:
+            if kind == "save":
+                saves.append((args, loop, future))
+                continue
+
+            # Reads see every save queued before them
+            self._save_all(saves)
+            saves = []
+            method, *method_args = args
+            try:
+                result = getattr(self._memory, method)(*method_args)
+                self._resolve(loop, future, result)
+            except Exception as e:
+                self._resolve(loop, future, error=e)
+
+        self._save_all(saves)
+
+    def _save_all(self, saves):
+        """Insert saves in one transaction and hand each caller its ID"""
+        if not saves:
+            return
+
+        try:
+            ids = self._memory.save_messages([args for args, _, _ in saves])
+        except Exception as e:
+            # Rolled back: none of these messages were stored
+            for _, loop, future in saves:
+                self._resolve(loop, future, error=e)
+            return
+
+        for (_, loop, future), message_id in zip(saves, ids):
+            self._resolve(loop, future, message_id)
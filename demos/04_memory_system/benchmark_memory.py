@@ -0,0 +1,256 @@
+"""
+Memory System Benchmark - Workly Public Edition
+
+Measures conversation memory throughput on a throwaway database.
+
+Benchmarks:
+    writes      - per-message commit vs batched write-behind mode
+    concurrent  - multi-threaded readers + writers, rollback journal vs WAL
+    search      - FTS5 ranked search vs LIKE '%keyword%' table scan
+
+Requirements:
+    - Python 3.11+
+    - No external dependencies (uses SQLite from standard library)
+
+Usage:
+    python benchmark_memory.py writes [--messages N] [--batch-size N]
+    python benchmark_memory.py concurrent [--seconds S] [--writers N] [--readers N]
+    python benchmark_memory.py search [--rows N] [--queries N]
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from memory_demo import MemorySystem
+
+
+def print_header(title):
+    """Print section header"""
+    print(f"\n{'=' * 60}")
+    print(f"  {title}")
+    print("=" * 60)
+
+
+def print_result(label, count, elapsed):
+    """Print a throughput line"""
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"  {label:<28} {count:>8} msgs  {elapsed:>8.3f}s  {rate:>10.0f} msgs/s")
+    return rate
+
+
+def time_writes(db_path, messages, **memory_options):
+    """Save `messages` messages and return the elapsed time including close()"""
+    memory = MemorySystem(db_path, **memory_options)
+
+    start = time.perf_counter()
+    for i in range(messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        memory.save_message(role, f"Benchmark message number {i}", "bench")
+    memory.close()
+
+    return time.perf_counter() - start
+
+
+def benchmark_writes(args):
+    """Compare per-message commits with write-behind batching"""
+    print_header("✍️  Write throughput")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        direct = time_writes(Path(tmp) / "direct.db", args.messages)
+        batched = time_writes(
+            Path(tmp) / "batched.db",
+            args.messages,
+            write_behind=True,
+            batch_size=args.batch_size,
+        )
+
+    direct_rate = print_result("Per-message commit", args.messages, direct)
+    batched_rate = print_result(
+        f"Write-behind (batch {args.batch_size})", args.messages, batched
+    )
+    print(f"\n  Speedup: {batched_rate / direct_rate:.1f}x")
+
+
+def seed_messages(db_path, count):
+    """Fill the database so reads have something to scan"""
+    memory = MemorySystem(db_path, write_behind=True, batch_size=1000)
+    for i in range(count):
+        memory.save_message("user", f"Seed message {i} about python", f"s{i % 50}")
+    memory.close()
+
+
+def run_stress(db_path, args, **memory_options):
+    """Run writer and reader threads against one MemorySystem for args.seconds"""
+    seed_messages(db_path, args.seed)
+    memory = MemorySystem(db_path, **memory_options)
+
+    stop = threading.Event()
+    writes = [0] * args.writers
+    read_latencies = [[] for _ in range(args.readers)]
+
+    def writer(n):
+        while not stop.is_set():
+            memory.save_message("user", f"Writer {n} says hello", f"w{n}")
+            writes[n] += 1
+
+    def reader(n):
+        while not stop.is_set():
+            start = time.perf_counter()
+            if n % 2:
+                memory.search_messages("python")
+            else:
+                memory.get_recent_messages(limit=50)
+            read_latencies[n].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    memory.close()
+
+    latencies = sorted(t for per_reader in read_latencies for t in per_reader)
+    return sum(writes), latencies
+
+
+def benchmark_concurrent(args):
+    """Compare concurrent read/write throughput with and without WAL"""
+    print_header("🔀 Concurrent read/write stress")
+    print(
+        f"  {args.writers} writer(s), {args.readers} reader(s), "
+        f"{args.seed} seed rows, {args.seconds}s per mode\n"
+    )
+
+    modes = [
+        ("Rollback journal", {}),
+        ("WAL + reader pool", {"wal": True, "reader_pool_size": args.readers}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, options in modes:
+            db_path = Path(tmp) / f"{label.split()[0].lower()}.db"
+            writes, latencies = run_stress(db_path, args, **options)
+
+            print(f"  {label}:")
+            print(f"    Writes:          {writes / args.seconds:>10.0f} msgs/s")
+            print(
+                f"    Reads:           {len(latencies) / args.seconds:>10.0f} queries/s"
+            )
+            if latencies:
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                print(
+                    f"    Read latency:    p50 {statistics.median(latencies) * 1000:.2f} ms, "
+                    f"p95 {p95 * 1000:.2f} ms"
+                )
+            print()
+
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "so", "ta", "vi", "ze", "po"]
+
+# 1000 distinct six-letter words, none a prefix of another
+VOCABULARY = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+
+
+def time_queries(run_query, keywords):
+    """Run one query per keyword and return sorted latencies in seconds"""
+    latencies = []
+    for keyword in keywords:
+        start = time.perf_counter()
+        run_query(keyword)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def benchmark_search(args):
+    """Compare FTS5 search latency with a LIKE table scan"""
+    print_header("🔍 Search latency")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "search.db"
+
+        print(f"  Seeding {args.rows} messages...")
+        memory = MemorySystem(db_path, write_behind=True, batch_size=5000)
+        for i in range(args.rows):
+            words = " ".join(VOCABULARY[(i * k) % len(VOCABULARY)] for k in (1, 7, 31))
+            memory.save_message("user", f"Message {i} talks about {words}", "bench")
+        memory.close()
+
+        memory = MemorySystem(db_path)
+        keywords = [VOCABULARY[(i * 37) % len(VOCABULARY)] for i in range(args.queries)]
+
+        def like_scan(keyword):
+            # The pre-FTS search query
+            memory.cursor.execute(
+                """
+                SELECT * FROM conversations
+                WHERE message LIKE ?
+                ORDER BY timestamp DESC
+            """,
+                (f"%{keyword}%",),
+            )
+            return [dict(row) for row in memory.cursor.fetchall()]
+
+        results = [
+            ("LIKE '%keyword%'", time_queries(like_scan, keywords)),
+            (
+                "FTS5 + bm25",
+                time_queries(
+                    lambda keyword: memory.search_messages(keyword, limit=args.limit),
+                    keywords,
+                ),
+            ),
+        ]
+        memory.close()
+
+    print()
+    for label, latencies in results:
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"  {label:<20} p50 {statistics.median(latencies) * 1000:>8.2f} ms   "
+            f"p95 {p95 * 1000:>8.2f} ms"
+        )
+
+
+def main():
+    """Parse arguments and run the selected benchmark"""
+    parser = argparse.ArgumentParser(description="Workly memory system benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    writes = subparsers.add_parser("writes", help="Per-message vs batched writes")
+    writes.add_argument("--messages", type=int, default=2000)
+    writes.add_argument("--batch-size", type=int, default=100)
+    writes.set_defaults(func=benchmark_writes)
+
+    concurrent = subparsers.add_parser(
+        "concurrent", help="Multi-threaded read/write stress test"
+    )
+    concurrent.add_argument("--seconds", type=float, default=3.0)
+    concurrent.add_argument("--writers", type=int, default=2)
+    concurrent.add_argument("--readers", type=int, default=4)
+    concurrent.add_argument("--seed", type=int, default=20000)
+    concurrent.set_defaults(func=benchmark_concurrent)
+
+    search = subparsers.add_parser("search", help="FTS5 vs LIKE search latency")
+    search.add_argument("--rows", type=int, default=200000)
+    search.add_argument("--queries", type=int, default=50)
+    search.add_argument("--limit", type=int, default=50)
+    search.set_defaults(func=benchmark_search)
+
+    args = parser.parse_args()
+    args.func(args)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Semantic Search Check - Workly Public Edition
+
+Checks SemanticIndex against a temporary database using the offline
+HashingEmbedder, so no model or network is needed: embeddings are
+deterministic, similar messages rank first, session filters hold, and
+deleted or archived messages never take result slots.
+
+Usage:
+    python check_semantic.py
+
+Exits with status 1 if a check fails.
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import math
+import sys
+import tempfile
+from pathlib import Path
+
+import semantic_memory
+from diagnose import print_header, print_status
+from memory_demo import MemorySystem
+from semantic_memory import HashingEmbedder, SemanticIndex
+
+MESSAGES = [
+    ("s1", "I love eating pizza with extra cheese"),
+    ("s1", "My favourite food is spicy ramen"),
+    ("s1", "The weather is sunny and warm today"),
+    ("s2", "Python is my favourite programming language"),
+    ("s2", "I am learning to play the guitar"),
+    ("s2", "Pizza night with friends on Friday"),
+]
+
+
+def seed(memory):
+    """Save the sample messages, return their IDs"""
+    return [
+        memory.save_message("user", text, session_id) for session_id, text in MESSAGES
+    ]
+
+
+def check_embedder():
+    """Deterministic, unit-length vectors of the configured size"""
+    embedder = HashingEmbedder(dim=64)
+    first = embedder.embed("Hello there, Workly!")
+    second = embedder.embed_batch(["Hello there, Workly!"])[0]
+
+    results = [
+        ("Same text, same vector", first == second),
+        ("Vector size matches dim", len(first) == 64),
+        ("Unit length", abs(math.sqrt(sum(x * x for x in first)) - 1) < 1e-6),
+        ("Empty text gives a zero vector", not any(embedder.embed(""))),
+    ]
+    for description, passed in results:
+        print_status(description, passed)
+    return all(passed for _, passed in results)
+
+
+def check_search(memory, ids):
+    """Ranking, session filter and reloading stored vectors"""
+    index = SemanticIndex(memory)
+    added = index.update()
+
+    pizza = index.search("pizza with cheese", k=2)
+    ramen = index.search("favourite food", k=1, session_id="s1")
+    in_s2 = index.search("pizza", k=5, session_id="s2")
+    reloaded = SemanticIndex(memory)
+
+    results = [
+        ("All messages embedded", added == len(ids), f"{added} of {len(ids)}"),
+        (
+            "Closest message ranks first",
+            bool(pizza) and pizza[0]["id"] == ids[0],
+            ", ".join(str(message["id"]) for message in pizza),
+        ),
+        ("Session filter", bool(ramen) and ramen[0]["id"] == ids[1], ""),
+        (
+            "Only the requested session",
+            bool(in_s2) and all(m["session_id"] == "s2" for m in in_s2),
+            "",
+        ),
+        (
+            "Stored vectors reload",
+            len(reloaded) == len(ids) and reloaded.update() == 0,
+            f"{len(reloaded)} vectors",
+        ),
+    ]
+    for description, passed, message in results:
+        print_status(description, passed, message)
+    return all(passed for _, passed, _ in results)
+
+
+def check_deleted(memory, ids):
+    """Archived and cleared messages don't take result slots"""
+    index = SemanticIndex(memory)
+
+    # Archive two messages behind the index's back
+    memory.archive_messages(ids[:2])
+    after_archive = index.search("pizza food", k=4)
+    archive_ok = len(after_archive) == 4 and not {m["id"] for m in after_archive} & set(
+        ids[:2]
+    )
+    print_status(
+        "k results after archiving",
+        archive_ok,
+        f"{len(after_archive)} results, index has {len(index)} vectors",
+    )
+
+    memory.clear_all()
+    new_id = memory.save_message("user", "Pizza is back on the menu", "s1")
+    index.update()
+    after_clear = index.search("pizza", k=5)
+    clear_ok = [m["id"] for m in after_clear] == [new_id] and len(index) == 1
+    print_status(
+        "Cleared messages are dropped",
+        clear_ok,
+        f"{len(after_clear)} results, index has {len(index)} vectors",
+    )
+    return archive_ok and clear_ok
+
+
+def check_fallbacks(memory, ids):
+    """IVF and the pure-Python path agree with the exact NumPy search"""
+    query = "favourite programming language"
+    exact = [m["id"] for m in SemanticIndex(memory).search(query, k=3)]
+    all_ok = True
+
+    if semantic_memory.np is not None:
+        index = SemanticIndex(memory)
+        index.build_ivf(n_lists=2)
+        index.n_probe = 2
+        ivf = [m["id"] for m in index.search(query, k=3)]
+        passed = ivf == exact
+        print_status("IVF search (all clusters probed)", passed, str(ivf))
+        all_ok = all_ok and passed
+
+    saved_np = semantic_memory.np
+    semantic_memory.np = None
+    try:
+        python = [m["id"] for m in SemanticIndex(memory).search(query, k=3)]
+    finally:
+        semantic_memory.np = saved_np
+    passed = python == exact
+    print_status("Pure-Python search", passed, str(python))
+    return all_ok and passed
+
+
+def main():
+    print("\n" + "=" * 60)
+    print("  🧭 Semantic Search Check")
+    print("=" * 60)
+
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        print_header("1️⃣  Hashing Embedder")
+        passed &= check_embedder()
+
+        memory = MemorySystem(Path(tmp) / "search.db")
+        ids = seed(memory)
+
+        print_header("2️⃣  Search")
+        passed &= check_search(memory, ids)
+
+        print_header("3️⃣  Fallbacks")
+        passed &= check_fallbacks(memory, ids)
+
+        print_header("4️⃣  Deleted Messages")
+        passed &= check_deleted(memory, ids)
+        memory.close()
+
+    print(f"\n{'✅ All checks passed' if passed else '❌ Some checks failed'}\n")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Summarizer Check - Workly Public Edition
+
+Checks ConversationSummarizer against a temporary database with a stub
+LLM, so no model is needed. The stub counts words as tokens and, like
+llama.cpp, refuses prompts that don't fit its context window. Checks that
+summarization prompts stay within the window (also for a single turn
+longer than the whole window), that re-running summarizes nothing twice,
+and that build_context stays within its token budget.
+
+Usage:
+    python check_summarizer.py
+
+Exits with status 1 if a check fails.
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from diagnose import print_header, print_status
+from memory_demo import MemorySystem
+from memory_summarizer import ConversationSummarizer
+
+N_CTX = 128
+
+
+class StubLLM:
+    """Llama-like callable: one token per word, records every prompt"""
+
+    def __init__(self, n_ctx=N_CTX):
+        self._n_ctx = n_ctx
+        self.prompts = []
+        self.words = []
+        self.ids = {}
+
+    def n_ctx(self):
+        return self._n_ctx
+
+    def tokenize(self, text, add_bos=True):
+        tokens = [self.ids.setdefault(word, len(self.ids)) for word in text.split()]
+        if len(self.words) < len(self.ids):
+            self.words = sorted(self.ids, key=self.ids.get)
+        return [-1] + tokens if add_bos else tokens
+
+    def detokenize(self, tokens):
+        return b" ".join(self.words[token] for token in tokens if token >= 0)
+
+    def __call__(self, prompt, max_tokens=16, **kwargs):
+        size = len(self.tokenize(prompt.encode("utf-8")))
+        if size + max_tokens > self._n_ctx:
+            raise ValueError(
+                f"Requested tokens ({size} + {max_tokens}) exceed context "
+                f"window of {self._n_ctx}"
+            )
+        self.prompts.append(size)
+        return {"choices": [{"text": f"Summary number {len(self.prompts)}."}]}
+
+
+def seed(memory, session_id, count, words=6, start=0):
+    """Save count turns of words words, alternating user/assistant"""
+    for i in range(start, start + count):
+        role = "user" if i % 2 == 0 else "assistant"
+        text = " ".join(f"w{i}x{j}" for j in range(words))
+        memory.save_message(role, text, session_id)
+
+
+def check_budget(memory):
+    """Many turns are split into prompts that fit the context window"""
+    llm = StubLLM()
+    summarizer = ConversationSummarizer(
+        memory, llm, keep_recent=4, min_batch=4, summary_tokens=32
+    )
+    seed(memory, "budget", 60)
+
+    summarized = summarizer.summarize_session("budget")
+    summary = memory.get_summary("budget")
+    biggest = max(llm.prompts, default=0)
+
+    results = [
+        ("Old turns summarized", summarized == 56, f"{summarized} of 56"),
+        (
+            "Prompts fit n_ctx",
+            biggest + summarizer.summary_tokens <= N_CTX,
+            f"{len(llm.prompts)} prompts, largest {biggest} tokens",
+        ),
+        (
+            "Summary covers the old turns",
+            summary is not None and summary["message_count"] == 56,
+            "",
+        ),
+    ]
+    for description, passed, message in results:
+        print_status(description, passed, message)
+    return all(passed for _, passed, _ in results)
+
+
+def check_oversized(memory):
+    """A single turn longer than the whole window is truncated"""
+    llm = StubLLM()
+    summarizer = ConversationSummarizer(
+        memory, llm, keep_recent=2, min_batch=1, summary_tokens=32
+    )
+    memory.save_message("user", " ".join(f"long{i}" for i in range(500)), "huge")
+    seed(memory, "huge", 2)
+
+    try:
+        summarized = summarizer.summarize_session("huge")
+        error = ""
+    except ValueError as e:
+        summarized, error = 0, str(e)
+
+    passed = summarized == 1 and max(llm.prompts) + 32 <= N_CTX
+    print_status(
+        "500-word turn in a 128-token window",
+        passed,
+        error or f"prompt of {max(llm.prompts)} tokens",
+    )
+
+    cut = summarizer.truncate("one two three four five six", 4)
+    cut_ok = cut.startswith("one two") and summarizer.count_tokens(cut) <= 4
+    print_status("truncate() respects max_tokens", cut_ok, repr(cut))
+    return passed and cut_ok
+
+
+def check_idempotent(memory):
+    """Running again summarizes nothing; new turns are added once"""
+    llm = StubLLM()
+    summarizer = ConversationSummarizer(
+        memory, llm, keep_recent=4, min_batch=4, summary_tokens=32
+    )
+    seed(memory, "again", 12)
+
+    first = summarizer.summarize_session("again")
+    calls = len(llm.prompts)
+    second = summarizer.summarize_session("again")
+    repeat_ok = first == 8 and second == 0 and len(llm.prompts) == calls
+    print_status("Re-running does nothing", repeat_ok, f"{first} then {second}")
+
+    seed(memory, "again", 4, start=12)
+    third = summarizer.summarize_session("again")
+    summary = memory.get_summary("again")
+    newest = memory.get_recent_messages(4, "again")
+    more_ok = (
+        third == 4
+        and summary["message_count"] == 12
+        and summary["upto_message_id"] < min(msg["id"] for msg in newest)
+    )
+    print_status("New old turns added once", more_ok, f"{third} more")
+    return repeat_ok and more_ok
+
+
+def check_context(memory):
+    """build_context: summary plus recent turns, within max_tokens"""
+    llm = StubLLM()
+    summarizer = ConversationSummarizer(
+        memory, llm, keep_recent=4, min_batch=4, summary_tokens=32
+    )
+    context = summarizer.build_context("again", max_tokens=40)
+    summary = memory.get_summary("again")
+
+    results = [
+        ("Within max_tokens", summarizer.count_tokens(context) <= 40, ""),
+        ("Starts with the summary", summary["summary"] in context, ""),
+        (
+            "No summarized turns repeated",
+            "w11x0" not in context and "w12x0" in context,
+            f"{len(context.splitlines())} lines",
+        ),
+    ]
+    for description, passed, message in results:
+        print_status(description, passed, message)
+    return all(passed for _, passed, _ in results)
+
+
+def main():
+    print("\n" + "=" * 60)
+    print("  📝 Summarizer Check")
+    print("=" * 60)
+
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = MemorySystem(Path(tmp) / "summaries.db")
+
+        print_header("1️⃣  Token Budget")
+        passed &= check_budget(memory)
+
+        print_header("2️⃣  Oversized Turns")
+        passed &= check_oversized(memory)
+
+        print_header("3️⃣  Idempotence")
+        passed &= check_idempotent(memory)
+
+        print_header("4️⃣  Prompt Context")
+        passed &= check_context(memory)
+        memory.close()
+
+    print(f"\n{'✅ All checks passed' if passed else '❌ Some checks failed'}\n")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Memory System Diagnostic Tool
+
+Checks the conversation database schema and query plans.
+Run this after changing queries or indexes in memory_demo.py: it exits
+with a non-zero status if a query falls back to a full table scan or a
+temporary sort that an index should have avoided.
+
+Usage:
+    python diagnose.py              # Check a fresh temporary database
+    python diagnose.py path/to.db   # Also migrate and check an existing one
+"""
+
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from memory_demo import SCHEMA_VERSION, MemorySystem
+
+# Plan details that mean "no usable index"
+FULL_SCAN = "SCAN conversations"
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+def print_header(title, silent=False):
+    """Print section header"""
+    if silent:
+        return
+    print(f"\n{'=' * 60}")
+    print(f"  {title}")
+    print("=" * 60)
+
+
+def print_status(check, passed, message="", silent=False):
+    """Print check status"""
+    if silent:
+        return
+    icon = "✅" if passed else "❌"
+    status = "PASS" if passed else "FAIL"
+    print(f"{icon} [{status}] {check}")
+    if message:
+        print(f"   → {message}")
+
+
+def capture_queries(memory, action):
+    """Run action() and return the SELECT statements it sent to SQLite"""
+    statements = []
+
+    def trace(sql):
+        if sql.lstrip().upper().startswith("SELECT"):
+            statements.append(sql)
+
+    memory.conn.set_trace_callback(trace)
+    try:
+        action()
+    finally:
+        memory.conn.set_trace_callback(None)
+
+    return statements
+
+
+def query_plan(memory, sql):
+    """Get the EXPLAIN QUERY PLAN detail lines for a statement"""
+    memory.cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+    return [row["detail"] for row in memory.cursor.fetchall()]
+
+
+def plan_is_ok(plan, forbidden):
+    """Check that no plan line shows a forbidden operation"""
+    for detail in plan:
+        if FULL_SCAN in forbidden and detail.strip() == FULL_SCAN:
+            return False
+        if TEMP_SORT in forbidden and detail.startswith(TEMP_SORT):
+            return False
+    return True
+
+
+def seed(memory):
+    """Add a few messages so every query has rows to work with"""
+    for i in range(20):
+        memory.save_message(
+            "user" if i % 2 else "assistant", f"Message {i} about python", "s1"
+        )
+
+
+def check_schema(memory, silent=False):
+    """Check schema version and indexes"""
+    print_header("1️⃣  Schema Check", silent)
+
+    version = memory.get_schema_version()
+    version_ok = version == SCHEMA_VERSION
+    print_status(
+        "Schema version",
+        version_ok,
+        f"Found {version}, expected {SCHEMA_VERSION}",
+        silent,
+    )
+
+    memory.cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    )
+    indexes = {row["name"] for row in memory.cursor.fetchall()}
+
+    expected_ok = {"idx_session_timestamp", "idx_timestamp"} <= indexes
+    print_status(
+        "Composite indexes present", expected_ok, ", ".join(sorted(indexes)), silent
+    )
+
+    dropped_ok = not indexes & {"idx_role", "idx_session"}
+    print_status("Redundant indexes dropped", dropped_ok, silent=silent)
+
+    print_status("Full-text index", memory.fts_enabled, silent=silent)
+
+    # Trigger-maintained counters must agree with a real count
+    stats = memory.get_statistics()
+    memory.cursor.execute("SELECT COUNT(*) AS count FROM conversations")
+    actual = memory.cursor.fetchone()["count"]
+    counters_ok = stats["total_messages"] == actual
+    print_status(
+        "Message counters",
+        counters_ok,
+        f"Counter {stats['total_messages']}, rows {actual}",
+        silent,
+    )
+
+    return version_ok and expected_ok and dropped_ok and counters_ok
+
+
+def check_query_plans(memory, silent=False):
+    """Check that each access pattern uses an index"""
+    print_header("2️⃣  Query Plan Check", silent)
+
+    # (description, action, plan operations that must not appear)
+    history = {FULL_SCAN, TEMP_SORT}
+    checks = [
+        ("Recent messages", lambda: memory.get_recent_messages(10), history),
+        (
+            "Recent messages by session",
+            lambda: memory.get_recent_messages(10, session_id="s1"),
+            history,
+        ),
+        (
+            "Stream history (keyset pages)",
+            lambda: list(memory.iter_messages(chunk_size=5)),
+            history,
+        ),
+        (
+            "Stream session history (keyset pages)",
+            lambda: list(memory.iter_messages(session_id="s1", chunk_size=5)),
+            history,
+        ),
+        (
+            "Stream oldest first",
+            lambda: list(memory.iter_messages(chunk_size=5, oldest_first=True)),
+            history,
+        ),
+        ("Statistics", memory.get_statistics, {FULL_SCAN}),
+        (
+            "Summarizer: session turns",
+            lambda: memory.get_session_messages("s1", after_id=2, before_id=15),
+            history,
+        ),
+        (
+            "Retention: expired messages",
+            lambda: memory.get_oldest_message_ids(5, before="9999"),
+            history,
+        ),
+        (
+            "Retention: oldest in session",
+            lambda: memory.get_oldest_message_ids(5, session_id="s1"),
+            history,
+        ),
+        (
+            "Messages to embed",
+            lambda: memory.get_unembedded_messages(limit=5),
+            history,
+        ),
+        # Ranking needs a sort over the matches, but never a table scan
+        ("Ranked search", lambda: memory.search_messages("python"), {FULL_SCAN}),
+        (
+            "Streamed search",
+            lambda: list(memory.iter_search("python", chunk_size=5)),
+            {FULL_SCAN},
+        ),
+    ]
+
+    all_ok = True
+    for description, action, forbidden in checks:
+        statements = capture_queries(memory, action)
+        bad_plans = [
+            plan
+            for plan in (query_plan(memory, sql) for sql in statements)
+            if not plan_is_ok(plan, forbidden)
+        ]
+
+        passed = bool(statements) and not bad_plans
+        message = " | ".join(bad_plans[0]) if bad_plans else ""
+        print_status(description, passed, message, silent)
+        all_ok = all_ok and passed
+
+    return all_ok
+
+
+def run_diagnostics(db_path=None, silent=False):
+    """Run all checks and return True if they pass (silent: print nothing)"""
+    if not silent:
+        print("\n" + "=" * 60)
+        print("  🧠 Memory System Diagnostic Tool")
+        print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if db_path:
+            # Work on a copy so migrations never touch the original
+            check_path = Path(tmp) / Path(db_path).name
+            shutil.copy(db_path, check_path)
+        else:
+            check_path = Path(tmp) / "diagnose.db"
+
+        memory = MemorySystem(check_path)
+        seed(memory)
+
+        schema_ok = check_schema(memory, silent)
+        plans_ok = check_query_plans(memory, silent)
+        memory.close()
+
+    return schema_ok and plans_ok
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else None
+    sys.exit(0 if run_diagnostics(db_path) else 1)
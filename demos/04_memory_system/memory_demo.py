@@ -10,29 +10,226 @@ License: See LICENSE file
 
 import sqlite3
 import json
+import queue
+import re
+import threading
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from semantic_memory import SemanticIndex
+
+
+# Bumped whenever a migration is added to MemorySystem._migrations()
+SCHEMA_VERSION = 8
+
+# Default for get_oldest_message_ids(): don't filter by session
+ANY_SESSION = object()
+
+MESSAGE_COLUMNS = "id, timestamp, role, message, session_id, metadata"
+
+
+class MessageRecord:
+    """Lightweight message row (no per-row dict)"""
+
+    __slots__ = ("id", "timestamp", "role", "message", "session_id", "metadata")
+
+    def __init__(self, id, timestamp, role, message, session_id, metadata):
+        self.id = id
+        self.timestamp = timestamp
+        self.role = role
+        self.message = message
+        self.session_id = session_id
+        self.metadata = metadata
+
+    def __getitem__(self, key):
+        """Allow record["message"] like the dict rows"""
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"MessageRecord(id={self.id}, role={self.role!r})"
+
+
+ROW_FACTORIES = {
+    "dict": dict,
+    "tuple": tuple,
+    "record": lambda row: MessageRecord(*row),
+}
+
 
 class MemorySystem:
     """Simple conversation memory system using SQLite"""
 
-    def __init__(self, db_path="workly_memory.db"):
-        """Initialize memory system"""
+    def __init__(
+        self,
+        db_path="workly_memory.db",
+        write_behind=False,
+        batch_size=100,
+        flush_interval=1.0,
+        wal=False,
+        reader_pool_size=4,
+    ):
+        """
+        Initialize memory system
+
+        With write_behind=True, save_message() buffers messages in memory and
+        writes them in a single transaction when batch_size messages are
+        pending, every flush_interval seconds, or on close(). Row IDs are
+        assigned up front, so this mode assumes this object is the only
+        writer to the database. flush_interval=None disables the timer and
+        leaves flushing to the caller.
+
+        With wal=True, the database uses write-ahead logging: one writer
+        connection handles inserts while up to reader_pool_size read-only
+        connections serve history, search and stats queries in parallel.
+        """
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.wal = wal and db_path != ":memory:"
+        self.reader_pool_size = reader_pool_size
+        self._readers = None
+        self._readers_closed = False
+        self.fts_enabled = False
+        self._lock = threading.RLock()
+        self._pending = []
+        self._next_id = None
+        self._flusher = None
+        self._stop_flusher = threading.Event()
         self._connect()
-        self._create_tables()
+        self._migrate()
+
+        if self.write_behind:
+            self._next_id = self._last_row_id() + 1
+            if self.flush_interval:
+                self._start_flusher()
 
     def _connect(self):
         """Connect to SQLite database"""
-        self.conn = sqlite3.connect(self.db_path)
+        # The background flusher shares this connection, guarded by self._lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
 
+        # Lets retention free disk space in small steps instead of a full
+        # VACUUM. Only takes effect on new databases (see
+        # enable_incremental_vacuum() for existing ones)
+        self.cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+        if self.wal:
+            # Readers never block the writer (and vice versa) in WAL mode
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+
+            # Bounded pool: empty slots are opened on first use
+            self._readers = queue.LifoQueue(maxsize=self.reader_pool_size)
+            for _ in range(self.reader_pool_size):
+                self._readers.put(None)
+
+    def _open_reader(self):
+        """Open a read-only connection for the reader pool"""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _reading(self):
+        """Yield a cursor for read queries, flushing pending writes first"""
+        if self._readers is None:
+            with self._lock:
+                self.flush()
+                yield self.cursor
+        else:
+            self.flush()
+
+            # Keep the pool even if close() runs while this reader is out
+            readers = self._readers
+
+            # Blocks while every pooled reader is busy
+            conn = readers.get()
+            if self._readers_closed:
+                readers.put(conn)
+                self._close_readers(readers)
+                raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+            if conn is None:
+                conn = self._open_reader()
+
+            try:
+                yield conn.cursor()
+            finally:
+                readers.put(conn)
+                if self._readers_closed:
+                    # close() already ran: close it now that it is back
+                    self._close_readers(readers)
+
+    @staticmethod
+    def _close_readers(readers):
+        """Close the idle connections in a reader pool"""
+        while True:
+            try:
+                conn = readers.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+
+        # Wakes a thread waiting for a reader, which then sees the pool closed
+        try:
+            readers.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _migrations(self):
+        """Schema migrations in order; migration N upgrades user_version N-1 to N"""
+        return [
+            self._create_tables,
+            self._create_search_index,
+            self._create_composite_indexes,
+            self._create_counters,
+            self._create_embeddings_table,
+            self._create_archive_table,
+            self._create_summaries_table,
+            self._recount_sessions,
+        ]
+
+    def _migrate(self):
+        """Apply pending schema migrations, each in its own transaction"""
+        self.cursor.execute("PRAGMA user_version")
+        current = self.cursor.fetchone()[0]
+
+        for version, migration in enumerate(self._migrations(), start=1):
+            if version <= current:
+                continue
+
+            self.cursor.execute("BEGIN")
+            try:
+                migration()
+                self.cursor.execute(f"PRAGMA user_version = {version}")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+        self.fts_enabled = self._table_exists("conversations_fts")
+
+    def _table_exists(self, name):
+        """Check whether a table (or virtual table) exists"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+        return self.cursor.fetchone() is not None
+
+    def get_schema_version(self):
+        """Get the schema version stored in the database"""
+        with self._lock:
+            self.cursor.execute("PRAGMA user_version")
+            return self.cursor.fetchone()[0]
+
     def _create_tables(self):
-        """Create database tables if they don't exist"""
+        """Migration 1: create the conversations table"""
         self.cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS conversations (
@@ -46,7 +243,17 @@ class MemorySystem:
         """
         )
 
-        # Create indexes for faster queries
+    def _create_composite_indexes(self):
+        """Migration 3: index the real access patterns, drop unhelpful indexes"""
+        # Every index implicitly ends with the rowid, so these cover the
+        # (timestamp, id) keyset used for ordering and pagination
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_session_timestamp
+            ON conversations(session_id, timestamp)
+        """
+        )
+
         self.cursor.execute(
             """
             CREATE INDEX IF NOT EXISTS idx_timestamp
@@ -54,112 +261,919 @@ class MemorySystem:
         """
         )
 
+        # idx_session is a prefix of idx_session_timestamp; idx_role has only
+        # a handful of distinct values and is never worth using
+        self.cursor.execute("DROP INDEX IF EXISTS idx_session")
+        self.cursor.execute("DROP INDEX IF EXISTS idx_role")
+
+    def _create_counters(self):
+        """Migration 4: per-role and per-session message counters"""
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_counts (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (scope, key)
+            ) WITHOUT ROWID
+        """
+        )
+
+        # Keep the counters up to date on every write path
+        self.cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS conversation_counts_insert
+            AFTER INSERT ON conversations BEGIN
+                {self._count_sql("new", 1)}
+            END
+        """
+        )
+
+        self.cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS conversation_counts_delete
+            AFTER DELETE ON conversations BEGIN
+                {self._count_sql("old", -1)}
+            END
+        """
+        )
+
+        self.cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS conversation_counts_update
+            AFTER UPDATE OF role, session_id ON conversations BEGIN
+                {self._count_sql("old", -1)}
+                {self._count_sql("new", 1)}
+            END
+        """
+        )
+
+        # Count messages saved before the counters existed
+        self.cursor.execute(
+            """
+            INSERT INTO conversation_counts (scope, key, count)
+            SELECT 'total', 'messages', COUNT(*) FROM conversations
+        """
+        )
+
+        self.cursor.execute(
+            """
+            INSERT INTO conversation_counts (scope, key, count)
+            SELECT 'role', role, COUNT(*) FROM conversations GROUP BY role
+        """
+        )
+
+        self.cursor.execute(
+            """
+            INSERT INTO conversation_counts (scope, key, count)
+            SELECT 'session', session_id, COUNT(*)
+            FROM conversations WHERE session_id IS NOT NULL GROUP BY session_id
+        """
+        )
+
+        self.cursor.execute(
+            """
+            INSERT INTO conversation_counts (scope, key, count)
+            SELECT 'total', 'sessions', COUNT(*)
+            FROM conversation_counts WHERE scope = 'session'
+        """
+        )
+
+    def _create_embeddings_table(self):
+        """Migration 5: message embeddings for semantic search"""
+        # Vectors are packed float32 BLOBs (4 bytes per dimension)
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_embeddings (
+                message_id INTEGER PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        """
+        )
+
+        self.cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS conversation_embeddings_delete
+            AFTER DELETE ON conversations BEGIN
+                DELETE FROM conversation_embeddings WHERE message_id = old.id;
+            END
+        """
+        )
+
+    def _create_archive_table(self):
+        """Migration 6: compressed archive for messages removed by retention"""
+        # Each row holds one batch of messages as zlib-compressed JSON
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_archive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                archived_at TEXT NOT NULL,
+                first_timestamp TEXT NOT NULL,
+                last_timestamp TEXT NOT NULL,
+                message_count INTEGER NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """
+        )
+
+    def _create_summaries_table(self):
+        """Migration 7: rolling per-session conversation summaries"""
+        # summary covers every message in the session up to upto_message_id
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                session_id TEXT PRIMARY KEY,
+                upto_message_id INTEGER NOT NULL,
+                message_count INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """
+        )
+
+    def _recount_sessions(self):
+        """Migration 8: stop counting messages without a session as a session"""
+        # Older counters lumped NULL and '' sessions together under ''
+        for trigger in ("insert", "delete", "update"):
+            self.cursor.execute(f"DROP TRIGGER IF EXISTS conversation_counts_{trigger}")
+        self.cursor.execute("DELETE FROM conversation_counts")
+        self._create_counters()
+
+    @staticmethod
+    def _count_sql(row, delta):
+        """Trigger statements adding delta (+1/-1) to the counters for a row"""
+        # Messages without a session (NULL) aren't counted as a session
+        session = f"{row}.session_id"
+        counters = [
+            ("total", "'messages'"),
+            ("role", f"{row}.role"),
+            ("session", session),
+        ]
+
+        if delta > 0:
+            # The first message of a session also adds to the session total
+            statements = [
+                f"""
+                INSERT INTO conversation_counts (scope, key, count)
+                SELECT 'total', 'sessions', 1
+                WHERE {session} IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM conversation_counts
+                    WHERE scope = 'session' AND key = {session}
+                )
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+            """
+            ]
+            statements += [
+                f"""
+                INSERT INTO conversation_counts (scope, key, count)
+                SELECT '{scope}', {key}, 1 WHERE {key} IS NOT NULL
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+            """
+                for scope, key in counters
+            ]
+            return "".join(statements)
+
+        statements = [
+            f"""
+            UPDATE conversation_counts SET count = count - 1
+            WHERE scope = '{scope}' AND key = {key};
+        """
+            for scope, key in counters
+        ]
+        # Removing the last message of a session also removes the session
+        statements.append(
+            f"""
+            UPDATE conversation_counts SET count = count - 1
+            WHERE scope = 'total' AND key = 'sessions' AND EXISTS (
+                SELECT 1 FROM conversation_counts
+                WHERE scope = 'session' AND key = {session} AND count = 0
+            );
+            DELETE FROM conversation_counts
+            WHERE count = 0 AND (
+                (scope = 'role' AND key = {row}.role)
+                OR (scope = 'session' AND key = {session})
+            );
+        """
+        )
+        return "".join(statements)
+
+    def _create_search_index(self):
+        """Migration 2: create the FTS5 full-text index, backfilling messages"""
+        index_exists = self._table_exists("conversations_fts")
+
+        try:
+            # External-content table: stores only the index, not a copy of messages
+            self.cursor.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts
+                USING fts5(message, content='conversations', content_rowid='id')
+            """
+            )
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            print("⚠️  FTS5 not available, using slower keyword search")
+            return
+
+        # Keep the index in sync with the conversations table
         self.cursor.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_role
-            ON conversations(role)
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_insert
+            AFTER INSERT ON conversations BEGIN
+                INSERT INTO conversations_fts (rowid, message)
+                VALUES (new.id, new.message);
+            END
         """
         )
 
         self.cursor.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_session
-            ON conversations(session_id)
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_delete
+            AFTER DELETE ON conversations BEGIN
+                INSERT INTO conversations_fts (conversations_fts, rowid, message)
+                VALUES ('delete', old.id, old.message);
+            END
         """
         )
 
-        self.conn.commit()
+        self.cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_update
+            AFTER UPDATE OF message ON conversations BEGIN
+                INSERT INTO conversations_fts (conversations_fts, rowid, message)
+                VALUES ('delete', old.id, old.message);
+                INSERT INTO conversations_fts (rowid, message)
+                VALUES (new.id, new.message);
+            END
+        """
+        )
+
+        if not index_exists:
+            # Index messages saved before the index existed
+            self.cursor.execute(
+                "INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')"
+            )
+
+    @staticmethod
+    def _fts_query(keyword):
+        """Turn user input into an FTS5 query matching all words as prefixes"""
+        words = re.findall(r"\w+", keyword)
+        return " ".join(f'"{word}"*' for word in words)
+
+    def _last_row_id(self):
+        """Get the highest row ID ever handed out (including deleted rows)"""
+        self.cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'conversations'"
+        )
+        row = self.cursor.fetchone()
+        last_seq = row["seq"] if row else 0
+
+        self.cursor.execute("SELECT MAX(id) AS max_id FROM conversations")
+        max_id = self.cursor.fetchone()["max_id"] or 0
+
+        return max(last_seq, max_id)
+
+    def _start_flusher(self):
+        """Start the background thread that flushes on a time interval"""
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name="memory-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        """Flush pending messages every flush_interval seconds"""
+        while not self._stop_flusher.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️  Background flush failed: {e}")
 
     def save_message(self, role, message, session_id=None, metadata=None):
         """Save a message to the database"""
         timestamp = datetime.now().isoformat()
         metadata_json = json.dumps(metadata) if metadata else None
 
-        self.cursor.execute(
-            """
-            INSERT INTO conversations (timestamp, role, message, session_id, metadata)
-            VALUES (?, ?, ?, ?, ?)
-        """,
-            (timestamp, role, message, session_id, metadata_json),
-        )
+        with self._lock:
+            if self.write_behind:
+                # Buffer the row and hand back its pre-assigned ID
+                row_id = self._next_id
+                self._next_id += 1
+                self._pending.append(
+                    (row_id, timestamp, role, message, session_id, metadata_json)
+                )
 
-        self.conn.commit()
-        return self.cursor.lastrowid
+                if len(self._pending) >= self.batch_size:
+                    self.flush()
+
+                return row_id
 
-    def get_recent_messages(self, limit=10, session_id=None):
-        """Get recent messages"""
-        if session_id:
             self.cursor.execute(
                 """
-                SELECT * FROM conversations
-                WHERE session_id = ?
-                ORDER BY timestamp DESC
-                LIMIT ?
+                INSERT INTO conversations (timestamp, role, message, session_id, metadata)
+                VALUES (?, ?, ?, ?, ?)
             """,
-                (session_id, limit),
+                (timestamp, role, message, session_id, metadata_json),
             )
+
+            self.conn.commit()
+            return self.cursor.lastrowid
+
+    def save_messages(self, messages):
+        """
+        Save (role, message, session_id, metadata) tuples in one transaction
+
+        Returns their IDs once committed. Nothing is saved if it fails.
+        """
+        timestamp = datetime.now().isoformat()
+        with self._lock:
+            # Buffered write-behind rows go first, keeping IDs in order
+            self.flush()
+
+            ids = []
+            with self.conn:
+                for role, message, session_id, metadata in messages:
+                    self.cursor.execute(
+                        """
+                        INSERT INTO conversations
+                            (timestamp, role, message, session_id, metadata)
+                        VALUES (?, ?, ?, ?, ?)
+                    """,
+                        (
+                            timestamp,
+                            role,
+                            message,
+                            session_id,
+                            json.dumps(metadata) if metadata else None,
+                        ),
+                    )
+                    ids.append(self.cursor.lastrowid)
+            return ids
+
+    def flush(self):
+        """Write buffered messages in one transaction, return how many were written"""
+        with self._lock:
+            if not self._pending:
+                return 0
+
+            rows = self._pending
+            self._pending = []
+
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        """
+                        INSERT INTO conversations
+                            (id, timestamp, role, message, session_id, metadata)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                        rows,
+                    )
+            except sqlite3.Error:
+                # Keep the batch so a later flush can retry it
+                self._pending[:0] = rows
+                raise
+
+            return len(rows)
+
+    def get_recent_messages(self, limit=10, session_id=None):
+        """Get recent messages"""
+        with self._reading() as cursor:
+            if session_id:
+                cursor.execute(
+                    """
+                    SELECT * FROM conversations
+                    WHERE session_id = ?
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """,
+                    (session_id, limit),
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT * FROM conversations
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """,
+                    (limit,),
+                )
+
+            return [dict(row) for row in cursor.fetchall()]
+
+    def search_messages(self, keyword, limit=50, offset=0):
+        """Search messages by keyword, best matches first"""
+        with self._reading() as cursor:
+            if self.fts_enabled:
+                query = self._fts_query(keyword)
+                if not query:
+                    return []
+
+                cursor.execute(
+                    """
+                    SELECT conversations.* FROM conversations_fts
+                    JOIN conversations ON conversations.id = conversations_fts.rowid
+                    WHERE conversations_fts MATCH ?
+                    ORDER BY bm25(conversations_fts), conversations.id DESC
+                    LIMIT ? OFFSET ?
+                """,
+                    (query, limit, offset),
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT * FROM conversations
+                    WHERE message LIKE ?
+                    ORDER BY timestamp DESC
+                    LIMIT ? OFFSET ?
+                """,
+                    (f"%{keyword}%", limit, offset),
+                )
+
+            return [dict(row) for row in cursor.fetchall()]
+
+    def iter_messages(
+        self, session_id=None, chunk_size=500, row_type="dict", oldest_first=False
+    ):
+        """
+        Stream messages in (timestamp, id) order, chunk_size rows at a time
+
+        Uses keyset pagination, so each chunk is an index range lookup no
+        matter how deep into the history it is, and no connection or lock
+        is held between chunks. row_type is "dict", "tuple" (fields in
+        MESSAGE_COLUMNS order) or "record" (MessageRecord).
+        """
+        conditions = ["session_id = ?"] if session_id else []
+        params = [session_id] if session_id else []
+        return self._iter_keyset(conditions, params, chunk_size, row_type, oldest_first)
+
+    def iter_search(self, keyword, chunk_size=500, row_type="dict"):
+        """
+        Stream every message matching keyword, newest first
+
+        Unlike search_messages() results are not ranked, so matches can be
+        shown before the whole result set is known.
+        """
+        if self.fts_enabled:
+            query = self._fts_query(keyword)
+            if not query:
+                return iter(())
+
+            conditions = [
+                "id IN (SELECT rowid FROM conversations_fts "
+                "WHERE conversations_fts MATCH ?)"
+            ]
+            params = [query]
         else:
-            self.cursor.execute(
+            conditions = ["message LIKE ?"]
+            params = [f"%{keyword}%"]
+
+        return self._iter_keyset(conditions, params, chunk_size, row_type, False)
+
+    def _iter_keyset(self, conditions, params, chunk_size, row_type, oldest_first):
+        """Yield rows matching conditions, one keyset page at a time"""
+        make_row = ROW_FACTORIES[row_type]
+        direction, compare = ("ASC", ">") if oldest_first else ("DESC", "<")
+        last_key = None
+
+        while True:
+            where = list(conditions)
+            page_params = list(params)
+            if last_key:
+                where.append(f"(timestamp, id) {compare} (?, ?)")
+                page_params.extend(last_key)
+
+            sql = f"SELECT {MESSAGE_COLUMNS} FROM conversations"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += f" ORDER BY timestamp {direction}, id {direction} LIMIT ?"
+
+            with self._reading() as cursor:
+                cursor.execute(sql, page_params + [chunk_size])
+                rows = cursor.fetchall()
+
+            for row in rows:
+                yield make_row(row)
+
+            if len(rows) < chunk_size:
+                return
+
+            last_key = (rows[-1]["timestamp"], rows[-1]["id"])
+
+    def get_messages_by_ids(self, message_ids):
+        """Get messages by ID, in the order the IDs were given"""
+        if not message_ids:
+            return []
+
+        placeholders = ", ".join("?" for _ in message_ids)
+        with self._reading() as cursor:
+            cursor.execute(
+                f"SELECT * FROM conversations WHERE id IN ({placeholders})",
+                list(message_ids),
+            )
+            by_id = {row["id"]: dict(row) for row in cursor.fetchall()}
+
+        return [by_id[message_id] for message_id in message_ids if message_id in by_id]
+
+    def get_unembedded_messages(self, limit=500):
+        """Get (id, message, session_id) for messages not embedded yet"""
+        with self._reading() as cursor:
+            cursor.execute(
                 """
-                SELECT * FROM conversations
-                ORDER BY timestamp DESC
+                SELECT id, message, session_id FROM conversations
+                WHERE id > (
+                    SELECT COALESCE(MAX(message_id), 0) FROM conversation_embeddings
+                )
+                ORDER BY id
                 LIMIT ?
             """,
                 (limit,),
             )
+            return [tuple(row) for row in cursor.fetchall()]
 
-        return [dict(row) for row in self.cursor.fetchall()]
+    def save_embeddings(self, rows):
+        """Store (message_id, vector_blob) pairs in one transaction"""
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO conversation_embeddings (message_id, vector)
+                    VALUES (?, ?)
+                """,
+                    rows,
+                )
 
-    def search_messages(self, keyword):
-        """Search messages by keyword"""
-        self.cursor.execute(
-            """
-            SELECT * FROM conversations
-            WHERE message LIKE ?
-            ORDER BY timestamp DESC
-        """,
-            (f"%{keyword}%",),
-        )
+    def iter_embeddings(self, chunk_size=5000):
+        """Stream (message_id, session_id, vector_blob) in message ID order"""
+        last_id = 0
+        while True:
+            with self._reading() as cursor:
+                cursor.execute(
+                    """
+                    SELECT e.message_id, c.session_id, e.vector
+                    FROM conversation_embeddings e
+                    JOIN conversations c ON c.id = e.message_id
+                    WHERE e.message_id > ?
+                    ORDER BY e.message_id
+                    LIMIT ?
+                """,
+                    (last_id, chunk_size),
+                )
+                rows = [tuple(row) for row in cursor.fetchall()]
+
+            yield from rows
+
+            if len(rows) < chunk_size:
+                return
 
-        return [dict(row) for row in self.cursor.fetchall()]
+            last_id = rows[-1][0]
 
     def get_statistics(self):
         """Get database statistics"""
-        # Total messages
-        self.cursor.execute("SELECT COUNT(*) as count FROM conversations")
-        total = self.cursor.fetchone()["count"]
-
-        # Messages by role
-        self.cursor.execute(
+        with self._reading() as cursor:
+            # Counters are maintained by triggers, so no table scan is needed
+            cursor.execute(
+                """
+                SELECT scope, key, count FROM conversation_counts
+                WHERE scope IN ('total', 'role')
             """
-            SELECT role, COUNT(*) as count
-            FROM conversations
-            GROUP BY role
-        """
-        )
-        by_role = {row["role"]: row["count"] for row in self.cursor.fetchall()}
+            )
+            counts = {"total": {}, "role": {}}
+            for row in cursor.fetchall():
+                counts[row["scope"]][row["key"]] = row["count"]
 
-        # Database size
-        db_size = (
-            Path(self.db_path).stat().st_size if Path(self.db_path).exists() else 0
-        )
+            # Database size: pages in use plus the write-ahead log
+            cursor.execute("PRAGMA page_count")
+            page_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+
+        wal_path = Path(f"{self.db_path}-wal")
+        wal_size = wal_path.stat().st_size if wal_path.exists() else 0
+        db_size = page_count * page_size + wal_size
 
         return {
-            "total_messages": total,
-            "by_role": by_role,
+            "total_messages": counts["total"].get("messages", 0),
+            "total_sessions": counts["total"].get("sessions", 0),
+            "by_role": counts["role"],
             "db_size_bytes": db_size,
             "db_size_kb": round(db_size / 1024, 2),
+            "wal_size_bytes": wal_size,
         }
 
+    def get_session_message_count(self, session_id):
+        """Get the number of messages in a session"""
+        with self._reading() as cursor:
+            cursor.execute(
+                """
+                SELECT count FROM conversation_counts
+                WHERE scope = 'session' AND key = ?
+            """,
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            return row["count"] if row else 0
+
+    def get_session_messages(self, session_id, after_id=0, before_id=None):
+        """Get a session's messages with after_id < id < before_id, oldest first"""
+        conditions = ["session_id = ?", "id > ?"]
+        params = [session_id, after_id]
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+
+        with self._reading() as cursor:
+            cursor.execute(
+                f"""
+                SELECT * FROM conversations
+                WHERE {" AND ".join(conditions)}
+                ORDER BY timestamp, id
+            """,
+                params,
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_summary(self, session_id):
+        """Get the stored summary row for a session, or None"""
+        with self._reading() as cursor:
+            cursor.execute(
+                "SELECT * FROM conversation_summaries WHERE session_id = ?",
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def save_summary(self, session_id, summary, upto_message_id, message_count):
+        """Store (or replace) the summary for a session"""
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    """
+                    INSERT OR REPLACE INTO conversation_summaries
+                        (session_id, upto_message_id, message_count, summary,
+                         updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (
+                        session_id,
+                        upto_message_id,
+                        message_count,
+                        summary,
+                        datetime.now().isoformat(),
+                    ),
+                )
+
+    def get_oldest_message_ids(self, limit, before=None, session_id=ANY_SESSION):
+        """
+        Get IDs of the oldest messages, oldest first
+
+        Optionally only messages with a timestamp before `before` and/or
+        in one session (session_id=None means messages without a session).
+        """
+        conditions, params = [], []
+        if before is not None:
+            conditions.append("timestamp < ?")
+            params.append(before)
+        if session_id is not ANY_SESSION:
+            conditions.append("session_id IS ?")
+            params.append(session_id)
+
+        sql = "SELECT id FROM conversations"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp, id LIMIT ?"
+
+        with self._reading() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_sessions_over(self, max_messages):
+        """Get (session_id, count) for sessions with more than max_messages"""
+        with self._reading() as cursor:
+            cursor.execute(
+                """
+                SELECT key, count FROM conversation_counts
+                WHERE scope = 'session' AND count > ?
+            """,
+                (max_messages,),
+            )
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def archive_messages(self, message_ids):
+        """
+        Move messages into the compressed archive in one short transaction
+
+        Returns the compressed size in bytes. Search index, counters and
+        embeddings are updated by the delete triggers.
+        """
+        if not message_ids:
+            return 0
+
+        placeholders = ", ".join("?" for _ in message_ids)
+        with self._lock:
+            self.flush()
+            with self.conn:
+                self.cursor.execute(
+                    f"""
+                    SELECT * FROM conversations WHERE id IN ({placeholders})
+                    ORDER BY timestamp, id
+                """,
+                    list(message_ids),
+                )
+                messages = [dict(row) for row in self.cursor.fetchall()]
+                if not messages:
+                    return 0
+
+                payload = zlib.compress(json.dumps(messages).encode("utf-8"))
+                self.cursor.execute(
+                    """
+                    INSERT INTO conversation_archive
+                        (archived_at, first_timestamp, last_timestamp,
+                         message_count, payload)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (
+                        datetime.now().isoformat(),
+                        messages[0]["timestamp"],
+                        messages[-1]["timestamp"],
+                        len(messages),
+                        payload,
+                    ),
+                )
+                self.cursor.execute(
+                    f"DELETE FROM conversations WHERE id IN ({placeholders})",
+                    list(message_ids),
+                )
+
+            return len(payload)
+
+    def trim_archive(self, max_bytes):
+        """Drop the oldest archive batches until the archive fits max_bytes"""
+        with self._lock:
+            self.cursor.execute(
+                "SELECT id, length(payload) AS size FROM conversation_archive "
+                "ORDER BY id DESC"
+            )
+            kept_bytes = 0
+            drop_ids = []
+            for row in self.cursor.fetchall():
+                kept_bytes += row["size"]
+                if kept_bytes > max_bytes:
+                    drop_ids.append(row["id"])
+
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM conversation_archive WHERE id = ?",
+                    [(archive_id,) for archive_id in drop_ids],
+                )
+
+            return len(drop_ids)
+
+    def iter_archived_messages(self):
+        """Stream archived messages (oldest batch first) as dicts"""
+        last_id = 0
+        while True:
+            with self._reading() as cursor:
+                cursor.execute(
+                    """
+                    SELECT id, payload FROM conversation_archive
+                    WHERE id > ? ORDER BY id LIMIT 1
+                """,
+                    (last_id,),
+                )
+                row = cursor.fetchone()
+
+            if row is None:
+                return
+
+            last_id = row["id"]
+            yield from json.loads(zlib.decompress(row["payload"]))
+
+    def get_used_bytes(self):
+        """Get bytes used by live database pages (excluding free pages)"""
+        with self._reading() as cursor:
+            cursor.execute("PRAGMA page_count")
+            page_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA freelist_count")
+            free_pages = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def get_live_bytes(self):
+        """
+        Get bytes used by live data: every table and index except the archive
+
+        get_used_bytes() also counts the archive, which archiving moves rows
+        into. Uses the dbstat table when SQLite has it; otherwise subtracts
+        the archived payload sizes (nearly all of the archive's pages).
+        """
+        with self._reading() as cursor:
+            try:
+                cursor.execute(
+                    """
+                    SELECT COALESCE(SUM(pgsize), 0) FROM dbstat
+                    WHERE name NOT LIKE 'sqlite_%' AND name != 'conversation_archive'
+                """
+                )
+                return cursor.fetchone()[0]
+            except sqlite3.OperationalError:
+                cursor.execute(
+                    "SELECT COALESCE(SUM(length(payload)), 0) FROM conversation_archive"
+                )
+                archive_bytes = cursor.fetchone()[0]
+        return max(self.get_used_bytes() - archive_bytes, 0)
+
+    def merge_search_index(self, pages=None):
+        """
+        Merge full-text index segments, dropping entries of deleted messages
+
+        FTS5 records deletes as tombstones until segments are merged. With
+        pages, merges up to about that many pages ('merge', even when there
+        are few segments); without, rewrites the whole index ('optimize').
+        Returns False once there was nothing left to merge.
+        """
+        if not self.fts_enabled:
+            return False
+
+        with self._lock:
+            before = self.conn.total_changes
+            with self.conn:
+                if pages is None:
+                    self.cursor.execute(
+                        "INSERT INTO conversations_fts (conversations_fts) "
+                        "VALUES ('optimize')"
+                    )
+                else:
+                    self.cursor.execute(
+                        "INSERT INTO conversations_fts (conversations_fts, rank) "
+                        "VALUES ('merge', ?)",
+                        # Negative: merge even below the usual segment count
+                        (-int(pages),),
+                    )
+            # The merge command writes nothing when there is no work left;
+            # the INSERT itself counts as one change
+            return self.conn.total_changes - before > 1
+
+    def incremental_vacuum(self, pages=256):
+        """
+        Return up to `pages` free pages to the OS, return how many remain free
+
+        Returns None if the database doesn't use incremental auto-vacuum
+        (created before it was the default; see enable_incremental_vacuum).
+        """
+        with self._lock:
+            self.cursor.execute("PRAGMA auto_vacuum")
+            if self.cursor.fetchone()[0] != 2:
+                return None
+            # executescript() steps the pragma to completion; execute() would
+            # stop after the first step and free a single page
+            self.conn.commit()
+            self.cursor.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            self.cursor.execute("PRAGMA freelist_count")
+            return self.cursor.fetchone()[0]
+
+    def enable_incremental_vacuum(self):
+        """
+        Switch an existing database to incremental auto-vacuum
+
+        Needs one full VACUUM, which locks and rewrites the whole database,
+        so run it during maintenance. Returns False if already enabled.
+        """
+        with self._lock:
+            self.cursor.execute("PRAGMA auto_vacuum")
+            if self.cursor.fetchone()[0] == 2:
+                return False
+
+            self.flush()
+            self.cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.cursor.execute("VACUUM")
+            return True
+
     def clear_all(self):
         """Clear all messages (use with caution!)"""
-        self.cursor.execute("DELETE FROM conversations")
-        self.conn.commit()
+        with self._lock:
+            self._pending = []
+            self.cursor.execute("DELETE FROM conversations")
+            self.cursor.execute("DELETE FROM conversation_summaries")
+            self.conn.commit()
 
     def close(self):
-        """Close database connection"""
+        """Flush pending messages and close database connection"""
+        if self._flusher:
+            self._stop_flusher.set()
+            self._flusher.join()
+            self._flusher = None
+
+        if self._readers is not None:
+            # Readers checked out by other threads are closed when returned
+            self._readers_closed = True
+            self._close_readers(self._readers)
+            self._readers = None
+
         if self.conn:
-            self.conn.close()
+            with self._lock:
+                self.flush()
+                self.conn.close()
+                self.conn = None
 
 
 def print_header():
@@ -174,22 +1188,34 @@ def print_commands():
     print("Available commands:")
     print("  - Type a message to save it")
     print("  - 'search <keyword>' to search messages")
+    print("  - 'recall <text>' to find similar messages (semantic search)")
     print("  - 'history' to view recent messages")
     print("  - 'stats' to see database statistics")
+    print("  - 'export <file>' to export all messages as JSON lines")
     print("  - 'clear' to clear all messages")
     print("  - 'quit' to exit")
     print()
 
 
-def display_messages(messages, title="Messages"):
-    """Display list of messages"""
-    if not messages:
-        print("  No messages found.")
-        return
+def display_messages(messages, title="Messages", reverse=True):
+    """
+    Display messages as they arrive
+
+    Lists from get_recent_messages() are newest first and get reversed so
+    the newest message ends up at the bottom. Pass reverse=False for
+    iterators from iter_messages()/iter_search() to print without
+    collecting them first.
+    """
+    if reverse:
+        messages = reversed(list(messages))
+
+    shown = 0
+    for msg in messages:
+        if not shown:
+            print(f"\n{title}:")
+            print("━" * 60)
+        shown += 1
 
-    print(f"\n{title}:")
-    print("━" * 60)
-    for msg in reversed(messages):
         timestamp = datetime.fromisoformat(msg["timestamp"]).strftime(
             "%Y-%m-%d %H:%M:%S"
         )
@@ -199,14 +1225,30 @@ def display_messages(messages, title="Messages"):
         print(
             f"  {role_emoji} [{timestamp}] {msg['message'][:60]}{'...' if len(msg['message']) > 60 else ''}"
         )
+
+    if not shown:
+        print("  No messages found.")
+        return
+
     print()
 
 
+def export_messages(memory, path):
+    """Stream all messages (oldest first) to a JSON lines file"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for msg in memory.iter_messages(oldest_first=True):
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
 def display_stats(stats):
     """Display database statistics"""
     print("\n📊 Database Statistics:")
     print("━" * 60)
     print(f"  Total messages:   {stats['total_messages']}")
+    print(f"  Sessions:         {stats['total_sessions']}")
     print(f"  Database size:    {stats['db_size_kb']} KB")
     print(f"\n  Messages by role:")
     for role, count in stats["by_role"].items():
@@ -223,6 +1265,9 @@ def main():
     memory = MemorySystem("workly_memory.db")
     print(f"📊 Database: workly_memory.db\n")
 
+    # Load stored embeddings; new messages are embedded on each recall
+    semantic = SemanticIndex(memory)
+
     # Print commands
     print_commands()
 
@@ -255,10 +1300,24 @@ def main():
                 )
                 if confirm.lower() == "y":
                     memory.clear_all()
+                    semantic = SemanticIndex(memory)
                     print("✅ All messages cleared!\n")
                 else:
                     print("❌ Cancelled\n")
 
+            elif user_input.lower().startswith("export "):
+                export_path = user_input[7:].strip()
+                count = export_messages(memory, export_path)
+                print(f"✅ Exported {count} message(s) to {export_path}\n")
+
+            elif user_input.lower().startswith("recall "):
+                text = user_input[7:].strip()
+                semantic.update()
+                messages = semantic.search(text, k=5)
+                display_messages(
+                    messages, f"🧭 Messages similar to '{text}'", reverse=False
+                )
+
             elif user_input.lower().startswith("search "):
                 keyword = user_input[7:].strip()
                 if keyword:
@@ -0,0 +1,219 @@
+"""
+Memory Retention - Workly Public Edition
+
+Keeps the conversation database from growing without bound.
+Old messages are moved into a compressed, size-bounded archive table in
+small batches, then freed pages are returned to the OS with incremental
+VACUUM, so the write lock is only ever held for a moment.
+
+Usage:
+    from memory_retention import RetentionPolicy, RetentionManager
+
+    policy = RetentionPolicy(max_age_days=90, max_rows_per_session=5000)
+    manager = RetentionManager(memory, policy)
+    manager.start(interval=3600)   # Or call manager.run_once() yourself
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Upper bound on merge and vacuum steps per run, in case one never finishes
+MAX_STEPS = 10000
+
+
+class RetentionPolicy:
+    """Limits for live conversation data (None disables a limit)"""
+
+    def __init__(
+        self,
+        max_age_days=None,
+        max_rows_per_session=None,
+        max_db_bytes=None,
+        max_archive_bytes=50 * 1024 * 1024,
+    ):
+        self.max_age_days = max_age_days
+        self.max_rows_per_session = max_rows_per_session
+        self.max_db_bytes = max_db_bytes
+        self.max_archive_bytes = max_archive_bytes
+
+
+class RetentionManager:
+    """Applies a RetentionPolicy in small batches, optionally on a schedule"""
+
+    def __init__(
+        self,
+        memory,
+        policy,
+        batch_size=500,
+        vacuum_pages=256,
+        merge_pages=512,
+        pause=0.01,
+    ):
+        """
+        batch_size messages are archived per transaction, merge_pages pages
+        of the search index merged after each batch and vacuum_pages pages
+        freed per incremental VACUUM step, sleeping `pause` seconds between
+        steps so other writers get the lock.
+        """
+        self.memory = memory
+        self.policy = policy
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.merge_pages = merge_pages
+        self.pause = pause
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _archive(self, message_ids, report):
+        """Archive one batch and record it in the report"""
+        report["archived"] += len(message_ids)
+        report["archive_bytes"] += self.memory.archive_messages(message_ids)
+        time.sleep(self.pause)
+
+    def _expire_old(self, report):
+        """Archive messages older than max_age_days"""
+        cutoff = (datetime.now() - timedelta(days=self.policy.max_age_days)).isoformat()
+
+        while True:
+            ids = self.memory.get_oldest_message_ids(self.batch_size, before=cutoff)
+            if not ids:
+                return
+            self._archive(ids, report)
+
+    def _trim_sessions(self, report):
+        """Archive the oldest messages of sessions over max_rows_per_session"""
+        limit = self.policy.max_rows_per_session
+
+        for session_id, count in self.memory.get_sessions_over(limit):
+            excess = count - limit
+            while excess > 0:
+                ids = self.memory.get_oldest_message_ids(
+                    min(self.batch_size, excess), session_id=session_id
+                )
+                if not ids:
+                    break
+                self._archive(ids, report)
+                excess -= len(ids)
+
+    def _shrink_to_budget(self, report):
+        """
+        Archive the oldest messages until live data fits max_db_bytes
+
+        Live data excludes the archive itself. Stops early if a batch
+        doesn't make live data any smaller, rather than archiving everything.
+        """
+        size = self.memory.get_live_bytes()
+        while size > self.policy.max_db_bytes:
+            ids = self.memory.get_oldest_message_ids(self.batch_size)
+            if not ids:
+                report["budget_reached"] = False
+                return
+
+            self._archive(ids, report)
+            self.memory.merge_search_index(self.merge_pages)
+            if self.policy.max_archive_bytes is not None:
+                report["archive_batches_dropped"] += self.memory.trim_archive(
+                    self.policy.max_archive_bytes
+                )
+
+            previous, size = size, self.memory.get_live_bytes()
+            if size >= previous:
+                report["budget_reached"] = False
+                return
+
+    def _merge_index(self, report):
+        """Merge the search index a few pages at a time until nothing is left"""
+        while report["merge_steps"] < MAX_STEPS and not self._stop.is_set():
+            report["merge_steps"] += 1
+            if not self.memory.merge_search_index(self.merge_pages):
+                return
+            time.sleep(self.pause)
+
+    def _vacuum(self, report):
+        """Free pages a few at a time until none are left"""
+        previous = None
+        while report["vacuum_steps"] < MAX_STEPS:
+            remaining = self.memory.incremental_vacuum(self.vacuum_pages)
+            if remaining is None:
+                # auto_vacuum is off: pages can't be freed incrementally
+                report["vacuum_available"] = False
+                return
+
+            report["vacuum_steps"] += 1
+            if remaining == 0 or self._stop.is_set():
+                return
+            if previous is not None and remaining >= previous:
+                return
+            previous = remaining
+            time.sleep(self.pause)
+
+    def run_once(self):
+        """Apply the policy once and return a report of what was done"""
+        start = time.perf_counter()
+        report = {
+            "archived": 0,
+            "archive_bytes": 0,
+            "archive_batches_dropped": 0,
+            "merge_steps": 0,
+            "vacuum_steps": 0,
+            "vacuum_available": True,
+            "budget_reached": True,
+        }
+
+        if self.policy.max_age_days is not None:
+            self._expire_old(report)
+
+        if self.policy.max_rows_per_session is not None:
+            self._trim_sessions(report)
+
+        if self.policy.max_db_bytes is not None:
+            self._shrink_to_budget(report)
+
+        if self.policy.max_archive_bytes is not None:
+            report["archive_batches_dropped"] += self.memory.trim_archive(
+                self.policy.max_archive_bytes
+            )
+
+        if report["archived"]:
+            # Drop the search index entries of everything archived, in
+            # small steps like the archiving itself
+            self._merge_index(report)
+
+        self._vacuum(report)
+
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        return report
+
+    def start(self, interval=3600):
+        """Run the policy every `interval` seconds in a background thread"""
+        if self._thread:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_periodically,
+            args=(interval,),
+            name="memory-retention",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run_periodically(self, interval):
+        """Background loop for start()"""
+        while not self._stop.wait(interval):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"⚠️  Retention run failed: {e}")
+
+    def stop(self):
+        """Stop the background thread"""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
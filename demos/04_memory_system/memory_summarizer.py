@@ -0,0 +1,287 @@
+"""
+Conversation Summarizer - Workly Public Edition
+
+Keeps prompt context bounded by compacting old turns into summaries.
+Old messages of a session are summarized by the local LLM (the same
+llama_cpp.Llama call used by the chatbot demo) into one rolling summary
+row, so a prompt needs only that summary plus the most recent turns.
+
+Requirements:
+    - Python 3.11+
+    - llama-cpp-python (or any callable with the same interface)
+    - The chatbot demo's model_manager.py (for load_llm)
+
+Usage:
+    from memory_summarizer import ConversationSummarizer, load_llm
+
+    summarizer = ConversationSummarizer(memory, load_llm("model.gguf"))
+    summarizer.start()                 # Background worker
+    summarizer.request(session_id)     # After saving new messages
+    prompt = summarizer.build_context(session_id) + "User: hi\\nAssistant:"
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import queue
+import sys
+import threading
+from pathlib import Path
+
+# Models are loaded through the chatbot demo's model manager
+sys.path.append(str(Path(__file__).parent.parent / "01_basic_chatbot"))
+from model_manager import shared_manager
+
+ROLE_NAMES = {"user": "User", "assistant": "Assistant", "system": "System"}
+
+SUMMARY_PROMPT = """Summarize the conversation below in a few sentences.
+Keep names, facts, preferences and open questions. Write in third person.
+
+{previous}Conversation:
+{turns}
+
+Summary:"""
+
+
+def load_llm(model_path, n_ctx=2048, n_threads=None):
+    """
+    Get a llama.cpp model from the chatbot demo's shared model manager
+
+    A model the chatbot or the Discord bot already loaded is reused, and a
+    new one counts against the same RAM budget. n_threads defaults to the
+    physical CPU cores (see model_manager.detect_threads).
+    """
+    manager = shared_manager(
+        {"model_path": model_path, "n_ctx": n_ctx, "n_threads": n_threads}
+    )
+    return manager.get(manager.register(model_path, n_ctx=n_ctx, n_threads=n_threads))
+
+
+def format_turns(messages):
+    """Format messages as 'Role: text' lines"""
+    return "\n".join(
+        f"{ROLE_NAMES.get(msg['role'], msg['role'].capitalize())}: {msg['message']}"
+        for msg in messages
+    )
+
+
+class ConversationSummarizer:
+    """Maintains one rolling summary per session and assembles bounded prompts"""
+
+    def __init__(
+        self,
+        memory,
+        llm,
+        keep_recent=8,
+        min_batch=8,
+        summary_tokens=200,
+        context_tokens=None,
+    ):
+        """
+        Turns older than the newest keep_recent of a session are folded into
+        its summary once at least min_batch of them are waiting. Summaries
+        are at most summary_tokens long, and summarization prompts are kept
+        within context_tokens (defaults to the model's n_ctx).
+        """
+        self.memory = memory
+        self.llm = llm
+        self.keep_recent = keep_recent
+        self.min_batch = min_batch
+        self.summary_tokens = summary_tokens
+        if context_tokens is None:
+            context_tokens = llm.n_ctx() if hasattr(llm, "n_ctx") else 2048
+        self.context_tokens = context_tokens
+
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._thread = None
+
+    def count_tokens(self, text):
+        """Count tokens with the model's tokenizer (estimate if unavailable)"""
+        if hasattr(self.llm, "tokenize"):
+            return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+        return len(text) // 4 + 1
+
+    def _pending_messages(self, session_id):
+        """Get (summary row, old messages not yet in the summary)"""
+        summary = self.memory.get_summary(session_id)
+        after_id = summary["upto_message_id"] if summary else 0
+
+        recent = self.memory.get_recent_messages(self.keep_recent, session_id)
+        if len(recent) < self.keep_recent:
+            return summary, []
+
+        # Everything older than the recent window is eligible
+        oldest_recent_id = min(msg["id"] for msg in recent)
+        pending = self.memory.get_session_messages(
+            session_id, after_id=after_id, before_id=oldest_recent_id
+        )
+        return summary, pending
+
+    def truncate(self, text, max_tokens):
+        """Cut text to at most max_tokens tokens, marking the cut with '...'"""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+
+        keep = max_tokens - self.count_tokens("...")
+        tokens = None
+        if hasattr(self.llm, "tokenize") and hasattr(self.llm, "detokenize"):
+            tokens = self.llm.tokenize(text.encode("utf-8"), add_bos=False)
+        while keep > 0:
+            if tokens is not None:
+                cut = self.llm.detokenize(tokens[:keep]).decode("utf-8", "ignore")
+            else:
+                cut = text[: keep * 4]
+            cut = cut.rstrip() + "..."
+            # Tokens can merge differently across the cut: shorten until it fits
+            if self.count_tokens(cut) <= max_tokens:
+                return cut
+            keep -= 1
+        return ""
+
+    def _fit_batch(self, previous, pending):
+        """
+        Take the oldest pending messages that fit in one prompt
+
+        At least one message is taken; one too long for the prompt on its
+        own is truncated, so the prompt never exceeds the context window.
+        """
+        # One token for BOS, which llama.cpp adds when it runs the prompt
+        budget = self.context_tokens - self.summary_tokens - 1
+        used = self.count_tokens(SUMMARY_PROMPT.format(previous=previous, turns=""))
+
+        batch = []
+        for msg in pending:
+            tokens = self.count_tokens(format_turns([msg])) + 1
+            if used + tokens > budget:
+                if batch:
+                    break
+                msg = self._truncate_message(msg, budget - used - 1)
+                tokens = self.count_tokens(format_turns([msg])) + 1
+            used += tokens
+            batch.append(msg)
+        return batch
+
+    def _truncate_message(self, msg, max_tokens):
+        """Copy of msg whose 'Role: text' line fits in max_tokens"""
+        prefix = self.count_tokens(format_turns([{**msg, "message": ""}]))
+        text = self.truncate(msg["message"], max(0, max_tokens - prefix))
+        return {**msg, "message": text}
+
+    def summarize_session(self, session_id):
+        """
+        Fold old turns of a session into its summary
+
+        Returns the number of messages summarized. Running it again with no
+        new old turns does nothing, so it is safe to call repeatedly.
+        """
+        summary, pending = self._pending_messages(session_id)
+        if len(pending) < self.min_batch:
+            return 0
+
+        text = summary["summary"] if summary else ""
+        upto_id = summary["upto_message_id"] if summary else 0
+        count = summary["message_count"] if summary else 0
+        summarized = 0
+
+        while pending:
+            previous = f"Summary so far:\n{text}\n\n" if text else ""
+            batch = self._fit_batch(previous, pending)
+
+            response = self.llm(
+                SUMMARY_PROMPT.format(previous=previous, turns=format_turns(batch)),
+                max_tokens=self.summary_tokens,
+                temperature=0.2,
+                stop=["\n\n"],
+                echo=False,
+            )
+            text = response["choices"][0]["text"].strip()
+
+            upto_id = batch[-1]["id"]
+            count += len(batch)
+            summarized += len(batch)
+            # Save after every batch so an interrupted run resumes from here
+            self.memory.save_summary(session_id, text, upto_id, count)
+            pending = pending[len(batch) :]
+
+        return summarized
+
+    def build_context(self, session_id, recent_turns=None, max_tokens=None):
+        """
+        Build prompt context: the session summary plus recent turns
+
+        Recent turns are dropped oldest first until everything fits in
+        max_tokens (defaults to half the context window, leaving room for
+        the new question and the answer).
+        """
+        recent_turns = recent_turns or self.keep_recent
+        max_tokens = max_tokens or self.context_tokens // 2
+
+        summary = self.memory.get_summary(session_id)
+        header = (
+            f"Summary of earlier conversation: {summary['summary']}\n\n"
+            if summary
+            else ""
+        )
+
+        # Oldest first, without turns already covered by the summary
+        after_id = summary["upto_message_id"] if summary else 0
+        recent = [
+            msg
+            for msg in reversed(
+                self.memory.get_recent_messages(recent_turns, session_id)
+            )
+            if msg["id"] > after_id
+        ]
+
+        used = self.count_tokens(header)
+        kept = []
+        for msg in reversed(recent):
+            used += self.count_tokens(format_turns([msg])) + 1
+            if used > max_tokens:
+                break
+            kept.append(msg)
+
+        turns = format_turns(reversed(kept))
+        return header + (turns + "\n" if turns else "")
+
+    def request(self, session_id):
+        """Queue a session for background summarization (deduplicated)"""
+        with self._queued_lock:
+            if session_id in self._queued:
+                return
+            self._queued.add(session_id)
+        self._queue.put(session_id)
+
+    def start(self):
+        """Start the background summarization worker"""
+        if self._thread:
+            return
+
+        self._thread = threading.Thread(
+            target=self._work, name="memory-summarizer", daemon=True
+        )
+        self._thread.start()
+
+    def _work(self):
+        """Background loop: summarize queued sessions until stopped"""
+        while True:
+            session_id = self._queue.get()
+            if session_id is None:
+                return
+
+            with self._queued_lock:
+                self._queued.discard(session_id)
+
+            try:
+                self.summarize_session(session_id)
+            except Exception as e:
+                print(f"⚠️  Summarization failed for {session_id}: {e}")
+
+    def stop(self):
+        """Finish queued work and stop the worker"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
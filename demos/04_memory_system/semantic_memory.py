@@ -0,0 +1,322 @@
+"""
+Semantic Memory - Workly Public Edition
+
+Embedding-based retrieval on top of the SQLite memory system.
+Embeddings are stored as float32 BLOBs next to the conversations table
+and searched with a vectorized top-k cosine similarity scan.
+
+Requirements:
+    - Python 3.11+
+    - NumPy (optional, strongly recommended for large stores)
+
+Author: WorklyHQ
+License: See LICENSE file
+"""
+
+import hashlib
+import heapq
+import math
+import re
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder using the hashing trick
+
+    Needs no model or network, so it works offline and gives the same
+    vectors on every run. It only captures shared words, not meaning:
+    swap in a real embedding model for true semantic search.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _features(self, text):
+        """Lowercased words plus adjacent word pairs"""
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, text):
+        """Embed one text as a unit-length list of floats"""
+        vector = [0.0] * self.dim
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # Low bits pick the slot, the top bit picks the sign
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dim] += sign
+
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+    def embed_batch(self, texts):
+        """Embed several texts"""
+        return [self.embed(text) for text in texts]
+
+
+class LlamaEmbedder:
+    """Embedder backed by a llama_cpp.Llama model loaded with embedding=True"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.dim = llm.n_embd()
+
+    def embed_batch(self, texts):
+        """Embed several texts, normalized to unit length"""
+        vectors = []
+        for text in texts:
+            vector = self.llm.embed(text)
+            norm = math.sqrt(sum(x * x for x in vector))
+            vectors.append([x / norm for x in vector] if norm else vector)
+        return vectors
+
+
+class SemanticIndex:
+    """
+    In-memory vector index over a MemorySystem's stored embeddings
+
+    Vectors live in one contiguous float32 matrix, so a query is a single
+    matrix-vector product. For large stores, build_ivf() clusters the
+    vectors so queries only score the few closest clusters.
+    """
+
+    def __init__(self, memory, embedder=None, batch_size=256, n_probe=8):
+        self.memory = memory
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self.batch_size = batch_size
+        self.n_probe = n_probe
+
+        # Parallel per-row arrays; sessions are stored as small integer codes
+        self._ids = array("q")
+        self._session_codes = array("i")
+        self._session_lookup = {}
+        self._count = 0
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32) if np else []
+        self._centroids = None
+        self._assignments = None
+
+        self._load()
+
+    def _load(self, chunk_size=5000):
+        """Load stored embeddings in chunks"""
+        chunk = []
+        for row in self.memory.iter_embeddings(chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                self._append_stored(chunk)
+                chunk = []
+        self._append_stored(chunk)
+
+    def _append_stored(self, rows):
+        """Add (message_id, session_id, blob) rows read from the database"""
+        if rows:
+            self._append(
+                [row[0] for row in rows],
+                [row[1] for row in rows],
+                [self._from_blob(row[2]) for row in rows],
+            )
+
+    def _to_blob(self, vector):
+        """Pack a vector as float32 bytes"""
+        return array("f", vector).tobytes()
+
+    def _from_blob(self, blob):
+        """Unpack float32 bytes, checking the dimension matches the embedder"""
+        if len(blob) != self.dim * 4:
+            raise ValueError(
+                f"Stored embedding has {len(blob) // 4} dimensions, "
+                f"embedder produces {self.dim}"
+            )
+        return array("f", blob)
+
+    def _session_code(self, session_id):
+        """Get the integer code for a session ID"""
+        return self._session_lookup.setdefault(session_id, len(self._session_lookup))
+
+    def _append(self, message_ids, session_ids, vectors):
+        """Add vectors to the in-memory index"""
+        self._ids.extend(message_ids)
+        self._session_codes.extend(self._session_code(s) for s in session_ids)
+
+        if np is None:
+            self._matrix.extend(vectors)
+            self._count += len(vectors)
+            return
+
+        new_rows = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        needed = self._count + len(new_rows)
+
+        # Grow by doubling so repeated small updates stay cheap
+        if needed > len(self._matrix):
+            capacity = max(needed, 2 * len(self._matrix), 1024)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[: self._count] = self._matrix[: self._count]
+            self._matrix = grown
+
+        self._matrix[self._count : needed] = new_rows
+
+        if self._centroids is not None:
+            self._assignments = np.concatenate(
+                [self._assignments, self._nearest_centroids(new_rows)]
+            )
+
+        self._count = needed
+
+    def __len__(self):
+        return self._count
+
+    def remove(self, message_ids):
+        """Drop vectors of deleted or archived messages, return how many"""
+        removed = set(message_ids)
+        keep = [i for i in range(self._count) if self._ids[i] not in removed]
+        if len(keep) == self._count:
+            return 0
+
+        dropped = self._count - len(keep)
+        self._ids = array("q", (self._ids[i] for i in keep))
+        self._session_codes = array("i", (self._session_codes[i] for i in keep))
+        if np is None:
+            self._matrix = [self._matrix[i] for i in keep]
+        else:
+            self._matrix = self._matrix[keep]
+            if self._assignments is not None:
+                self._assignments = self._assignments[keep]
+        self._count = len(keep)
+        return dropped
+
+    def update(self):
+        """Embed messages saved since the last update, return how many"""
+        added = 0
+        while True:
+            rows = self.memory.get_unembedded_messages(limit=self.batch_size)
+            if not rows:
+                return added
+
+            message_ids = [row[0] for row in rows]
+            vectors = self.embedder.embed_batch([row[1] for row in rows])
+
+            self.memory.save_embeddings(
+                [
+                    (message_id, self._to_blob(v))
+                    for message_id, v in zip(message_ids, vectors)
+                ]
+            )
+            self._append(message_ids, [row[2] for row in rows], vectors)
+            added += len(rows)
+
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=50000, seed=0):
+        """
+        Cluster vectors into n_lists groups (an IVF index)
+
+        Searches then score only the n_probe closest clusters instead of
+        every vector, trading a little recall for much less work on large
+        stores. Vectors added later are assigned to their nearest cluster.
+        """
+        if np is None:
+            raise RuntimeError("IVF index requires NumPy (pip install numpy)")
+
+        vectors = self._matrix[: self._count]
+        n_lists = n_lists or max(1, int(math.sqrt(self._count)))
+        n_lists = min(n_lists, self._count)
+        if n_lists == 0:
+            return
+
+        # Spherical k-means on a sample: centroids are normalized mean vectors
+        rng = np.random.default_rng(seed)
+        sample = vectors[
+            rng.choice(self._count, min(sample_size, self._count), replace=False)
+        ]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the old centroid for clusters that received no vectors
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = self._nearest_centroids(vectors)
+
+    def _nearest_centroids(self, vectors, chunk_size=65536):
+        """Assign each vector to its closest centroid"""
+        return np.concatenate(
+            [
+                np.argmax(
+                    vectors[start : start + chunk_size] @ self._centroids.T, axis=1
+                )
+                for start in range(0, max(len(vectors), 1), chunk_size)
+            ]
+        )[: len(vectors)]
+
+    def search(self, text, k=5, session_id=None):
+        """Get the k most similar messages to text, each with a "score" """
+        if not self._count:
+            return []
+
+        query = self.embedder.embed_batch([text])[0]
+        if np is not None:
+            query = np.asarray(query, dtype=np.float32)
+
+        while True:
+            if np is None:
+                top = self._search_python(query, k, session_id)
+            else:
+                top = self._search_numpy(query, k, session_id)
+
+            scores = {self._ids[i]: score for i, score in top}
+            messages = self.memory.get_messages_by_ids(list(scores))
+            if len(messages) == len(scores):
+                break
+
+            # Messages deleted since they were indexed (clear_all, retention):
+            # drop their vectors and search again so k results come back
+            self.remove(set(scores) - {message["id"] for message in messages})
+
+        for message in messages:
+            message["score"] = round(scores[message["id"]], 4)
+        return messages
+
+    def _search_numpy(self, query, k, session_id):
+        """Vectorized top-k cosine similarity"""
+        if self._centroids is not None:
+            # Only score vectors in the closest clusters
+            probe = np.argsort(-(self._centroids @ query))[: self.n_probe]
+            candidates = np.flatnonzero(np.isin(self._assignments, probe))
+        else:
+            candidates = np.arange(self._count)
+
+        if session_id is not None:
+            if session_id not in self._session_lookup:
+                return []
+            codes = np.frombuffer(self._session_codes, dtype=np.int32)
+            candidates = candidates[
+                codes[candidates] == self._session_lookup[session_id]
+            ]
+
+        if not len(candidates):
+            return []
+
+        scores = self._matrix[candidates] @ query
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def _search_python(self, query, k, session_id):
+        """Pure-Python fallback when NumPy isn't installed"""
+        code = self._session_lookup.get(session_id)
+        scored = (
+            (i, sum(a * b for a, b in zip(vector, query)))
+            for i, vector in enumerate(self._matrix)
+            if session_id is None or self._session_codes[i] == code
+        )
+        return heapq.nlargest(k, scored, key=lambda item: item[1])